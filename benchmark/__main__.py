@@ -0,0 +1,100 @@
+import os
+import sys
+import argparse
+from typing import List, Dict
+
+from benchmark.suite import (STAGES, BenchmarkConfig, run_stages, run_scaling, scaling_exponent, compare,
+    measure_memory, save_baseline, load_baseline)
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='python -m benchmark', description='benchmarks of the calculator core')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='measure each stage and print the results')
+    save = commands.add_parser('save', help='measure each stage and store the results as baseline')
+    for p in (run, save):
+        p.add_argument('--seed', type=int, default=0, help='seed of the expression generator')
+        p.add_argument('--count', type=int, default=200, help='number of expressions')
+        p.add_argument('--size', type=int, default=32, help='operands of each expression')
+        p.add_argument('--rounds', type=int, default=5, help='repetitions, the fastest one is kept')
+
+    save.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file to write')
+
+    cmp = commands.add_parser('compare', help='rerun the baseline workload and fail when a stage got slower')
+    cmp.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file to compare with')
+    cmp.add_argument('--threshold', type=float, default=0.25,
+        help='allowed slowdown as a fraction of baseline time')
+
+    scaling = commands.add_parser('scaling', help='fail when a stage grows faster than linearly with expression size')
+    scaling.add_argument('--max-exponent', type=float, default=1.3,
+        help='maximum fitted exponent of time over expression size')
+
+    commands.add_parser('memory', help='measure memory used by tokens and expression tree nodes')
+
+    return parser.parse_args(argv)
+
+def _print_stages(results: Dict[str, float], baseline: Dict[str, float] = None, regressions: List[str] = ()):
+    if baseline is None:
+        print(f'{"stage":<14} {"us/expr":>10}')
+        for stage in STAGES:
+            print(f'{stage:<14} {results[stage] * 1e6:>10.2f}')
+    else:
+        print(f'{"stage":<14} {"baseline":>10} {"current":>10} {"change":>8}')
+        for stage in STAGES:
+            if stage not in baseline:
+                continue
+
+            change = results[stage] / baseline[stage] - 1
+            mark = '  REGRESSION' if stage in regressions else ''
+            print(f'{stage:<14} {baseline[stage] * 1e6:>10.2f} {results[stage] * 1e6:>10.2f} {change:>+8.1%}{mark}')
+
+def main(argv: List[str] = None) -> int:
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.command in ('run', 'save'):
+        config = BenchmarkConfig(args.seed, args.count, args.size, args.rounds)
+        results = run_stages(config)
+        _print_stages(results)
+
+        if args.command == 'save':
+            save_baseline(args.baseline, config, results)
+            print(f'baseline written to {args.baseline}')
+
+        return 0
+    elif args.command == 'compare':
+        baseline = load_baseline(args.baseline)
+        results = run_stages(BenchmarkConfig.from_dict(baseline['config']))
+        regressions = compare(results, baseline['stages'], args.threshold)
+        _print_stages(results, baseline['stages'], regressions)
+
+        return 1 if regressions else 0
+    elif args.command == 'memory':
+        for (kind, size) in measure_memory(BenchmarkConfig()).items():
+            print(f'{kind:<6} {size:>8.1f} bytes')
+
+        return 0
+    else:
+        config = BenchmarkConfig()
+        results = run_scaling(config)
+
+        failed = False
+        print(f'{"stage":<14} ' + ' '.join(f'{size:>9}' for size in config.scaling_sizes) + f' {"exponent":>9}')
+        for stage in STAGES:
+            exponent = scaling_exponent(config.scaling_sizes, results[stage])
+            mark = ''
+            if exponent > args.max_exponent:
+                failed = True
+                mark = '  SUPERLINEAR'
+
+            timings = ' '.join(f'{t * 1e6:>9.1f}' for t in results[stage])
+            print(f'{stage:<14} {timings} {exponent:>9.2f}{mark}')
+
+        return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import random
+from typing import Dict, Sequence, List, Tuple
+
+from calculator.core.constants import BinaryOperators, UnaryOperators, MATH_CONSTANTS
+from calculator.core.functions import PRO_FUNCTIONS
+
+
+__all__ = ['ExpressionGenerator', 'DEFAULT_OPERATORS', 'SAFE_FUNCTIONS']
+
+
+# binary operator -> relative frequency
+DEFAULT_OPERATORS = {
+    BinaryOperators.OP_ADD: 4,
+    BinaryOperators.OP_MINUS: 3,
+    BinaryOperators.OP_MULTIPLY: 2,
+    BinaryOperators.OP_DIVIDE: 1,
+    BinaryOperators.OP_MOD: 1
+}
+
+# operators whose right operand is always a non-zero literal
+DIVISION_OPERATORS = frozenset((BinaryOperators.OP_DIVIDE, BinaryOperators.OP_MOD))
+
+# functions of the scientific calculator defined for any finite input, so that generated
+# expressions rarely fail and evaluation benchmarks measure complete evaluations
+SAFE_FUNCTIONS = ('sin', 'cos', 'sind', 'cosd', 'abs', 'square', 'cube', 'degree', 'radians')
+
+
+class ExpressionGenerator(object):
+    """
+    seeded generator of random expressions accepted by the parser, generators created with the same
+    seed and options always give the same expressions
+
+    the size of an expression is its number of operands. operands are combined into a roughly balanced
+    tree, so that nesting grows with the logarithm of the size, and each operand is a literal, a constant,
+    a power or factorial of a literal, or a function call or negation nested up to `max_depth` levels.
+    divisors of `÷` and `%` are non-zero literals, so that generated expressions do not fail with zero
+    division and evaluation benchmarks measure the same work at any size
+    """
+
+    def __init__(self, seed: int = 0, max_depth: int = 2, operators: Dict[str, int] = None,
+            functions: Sequence[str] = SAFE_FUNCTIONS, function_rate: float = 0.2, unary_rate: float = 0.1,
+            power_rate: float = 0.05, constant_rate: float = 0.1):
+        """
+        :param max_depth: maximum nesting of function calls and unary operators in an operand
+        :param operators: binary operator -> relative frequency, defaults to `DEFAULT_OPERATORS`
+        :param functions: names of functions of the scientific calculator to call
+        :param function_rate: probability of an operand being a function call
+        :param unary_rate: probability of an operand being a negation or factorial
+        :param power_rate: probability of an operand being a literal raised to a small power
+        :param constant_rate: probability of a literal being a named constant
+        """
+
+        operators = DEFAULT_OPERATORS if operators is None else operators
+        unknown = [name for name in functions if name not in PRO_FUNCTIONS and name != 'ln']
+        if unknown:
+            raise ValueError(f"unknown functions: {', '.join(unknown)}")
+        elif not operators:
+            raise ValueError("at least one operator is required")
+
+        self.seed = seed
+        self.max_depth = max_depth
+        self.functions = tuple(functions)
+        self.function_rate = function_rate
+        self.unary_rate = unary_rate
+        self.power_rate = power_rate
+        self.constant_rate = constant_rate
+
+        self._operators = tuple(operators.keys())
+        self._weights = tuple(operators.values())
+        self._constants = tuple(sorted(MATH_CONSTANTS))
+        self._random = random.Random(seed)
+
+    def _literal(self) -> str:
+        rnd = self._random
+        if rnd.random() < self.constant_rate:
+            return rnd.choice(self._constants)
+        elif rnd.random() < 0.5:
+            return str(rnd.randint(1, 99))
+        else:
+            return f'{rnd.uniform(0.5, 99.5):.2f}'
+
+    def _operand(self, depth: int) -> Tuple[str, bool]:
+        """
+        generate an operand, return its text and whether it needs brackets when used with binary operators
+        """
+
+        rnd = self._random
+        r = rnd.random()
+
+        if depth > 0 and self.functions and r < self.function_rate:
+            text, _ = self._operand(depth - 1)
+            return f'{rnd.choice(self.functions)}({text})', False
+
+        r -= self.function_rate
+        if depth > 0 and r < self.unary_rate:
+            if rnd.random() < 0.2:
+                return f'{rnd.randint(2, 8)}{UnaryOperators.OP_FACTORIAL}', False
+            else:
+                text, compound = self._operand(depth - 1)
+                if compound or text.startswith(UnaryOperators.OP_NEGATIVE):
+                    text = f'({text})'
+                return f'{UnaryOperators.OP_NEGATIVE}{text}', True
+
+        r -= self.unary_rate
+        if r < self.power_rate:
+            return f'{self._literal()} {BinaryOperators.OP_POWER} {rnd.randint(2, 3)}', True
+
+        return self._literal(), False
+
+    def _tree(self, size: int) -> Tuple[str, bool]:
+        if size == 1:
+            return self._operand(self.max_depth)
+
+        op = self._random.choices(self._operators, self._weights)[0]
+        if op in DIVISION_OPERATORS:
+            left, left_compound = self._tree(size - 1)
+            right, right_compound = self._literal(), False
+        else:
+            # split operands around the middle, the jitter gives some imbalance while keeping depth logarithmic
+            jitter = size // 4
+            left_size = size // 2 + self._random.randint(-jitter, jitter)
+
+            left, left_compound = self._tree(left_size)
+            right, right_compound = self._tree(size - left_size)
+        if left_compound:
+            left = f'({left})'
+        if right_compound:
+            right = f'({right})'
+
+        return f'{left} {op} {right}', True
+
+    def expression(self, size: int) -> str:
+        """
+        generate an expression of `size` operands
+        """
+
+        if size < 1:
+            raise ValueError("size must be positive")
+
+        return self._tree(size)[0]
+
+    def expressions(self, count: int, size: int) -> List[str]:
+        """
+        generate `count` expressions of `size` operands each
+        """
+
+        return [self.expression(size) for _ in range(count)]
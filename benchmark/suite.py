@@ -0,0 +1,232 @@
+import gc
+import json
+import math
+import time
+import platform
+import tracemalloc
+from typing import Callable, Sequence, Dict, List, Any
+
+import calculator.core.parser as parser
+import calculator.core.vm as vm
+import calculator.core.nodes as nodes
+from calculator.core.evaluator import Evaluator
+from calculator.core.functions import proContext
+
+from benchmark.generator import ExpressionGenerator
+
+
+__all__ = ['STAGES', 'BenchmarkConfig', 'run_stages', 'run_scaling', 'scaling_exponent', 'compare',
+           'measure_memory', 'save_baseline', 'load_baseline']
+
+
+# benchmarked stages in pipeline order, each one is measured on the output of the previous one
+STAGES = ('tokenize', 'build_tree', 'evaluate_tree', 'assemble', 'execute_vm')
+
+BASELINE_VERSION = 1
+
+
+class BenchmarkConfig(object):
+    """
+    workload of a benchmark run, baselines store it so that comparisons rerun the same workload
+    """
+
+    def __init__(self, seed: int = 0, count: int = 200, size: int = 32, rounds: int = 5,
+            scaling_sizes: Sequence[int] = (64, 128, 256, 512, 1024), scaling_count: int = 20):
+        """
+        :param count: number of expressions of each stage benchmark
+        :param size: operands of each expression
+        :param rounds: repetitions of each measurement, the fastest one is kept
+        :param scaling_sizes: expression sizes of scaling runs
+        :param scaling_count: number of expressions of each size in scaling runs
+        """
+
+        self.seed = seed
+        self.count = count
+        self.size = size
+        self.rounds = rounds
+        self.scaling_sizes = tuple(scaling_sizes)
+        self.scaling_count = scaling_count
+
+    def to_dict(self) -> dict:
+        return {
+            'seed': self.seed,
+            'count': self.count,
+            'size': self.size,
+            'rounds': self.rounds,
+            'scaling_sizes': list(self.scaling_sizes),
+            'scaling_count': self.scaling_count
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BenchmarkConfig':
+        return cls(**data)
+
+def _measure(fun: Callable[[Any], Any], inputs: Sequence[Any], rounds: int) -> float:
+    """
+    run the function over all inputs `rounds` times, return seconds per input of the fastest round
+    """
+
+    best = math.inf
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for item in inputs:
+                fun(item)
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return best / len(inputs)
+
+def _stage_functions() -> Dict[str, Callable[[Any], Any]]:
+    context = proContext()
+    evaluator = Evaluator(context)
+
+    # generated expressions never fail, so that every stage measures complete evaluations,
+    # an evaluation error is a bug of the generator and is raised rather than timed
+    def evaluate_tree(tree):
+        evaluator.evaluate(tree)
+
+    def execute_vm(program):
+        vm.execute(program, context)
+
+    return {
+        'tokenize': parser.tokenize,
+        'build_tree': parser.build_expression_tree,
+        'evaluate_tree': evaluate_tree,
+        'assemble': vm.assemble,
+        'execute_vm': execute_vm
+    }
+
+def _measure_stages(expressions: List[str], rounds: int) -> Dict[str, float]:
+    functions = _stage_functions()
+    token_lists = [parser.tokenize(exp) for exp in expressions]
+    trees = [parser.build_expression_tree(t) for t in token_lists]
+    programs = [vm.assemble(tree) for tree in trees]
+
+    inputs = {
+        'tokenize': expressions,
+        'build_tree': token_lists,
+        'evaluate_tree': trees,
+        'assemble': trees,
+        'execute_vm': programs
+    }
+
+    return {stage: _measure(functions[stage], inputs[stage], rounds) for stage in STAGES}
+
+def run_stages(config: BenchmarkConfig) -> Dict[str, float]:
+    """
+    measure each stage on the same generated expressions, return stage -> seconds per expression
+    """
+
+    expressions = ExpressionGenerator(config.seed).expressions(config.count, config.size)
+    return _measure_stages(expressions, config.rounds)
+
+def run_scaling(config: BenchmarkConfig) -> Dict[str, List[float]]:
+    """
+    measure each stage with growing expression sizes, return stage -> seconds per expression of each size
+    """
+
+    results = {stage: [] for stage in STAGES}
+    for size in config.scaling_sizes:
+        expressions = ExpressionGenerator(config.seed).expressions(config.scaling_count, size)
+        for (stage, seconds) in _measure_stages(expressions, config.rounds).items():
+            results[stage].append(seconds)
+
+    return results
+
+def scaling_exponent(sizes: Sequence[int], times: Sequence[float]) -> float:
+    """
+    least-squares slope of log(time) over log(size), which is about 1 for linear growth and 2 for quadratic
+    """
+
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(t) for t in times]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+
+    num = sum((x - x_mean) * (y - y_mean) for (x, y) in zip(xs, ys))
+    den = sum((x - x_mean) ** 2 for x in xs)
+    return num / den
+
+def _count_nodes(root: nodes.ExpNode) -> int:
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+
+        cls = node.__class__
+        if cls is nodes.BinaryOpNode:
+            stack.append(node.left)
+            stack.append(node.right)
+        elif cls is nodes.UnaryOpNode:
+            stack.append(node.child)
+        elif cls is nodes.FuncCallNode:
+            stack.extend(node.args)
+
+    return count
+
+def measure_memory(config: BenchmarkConfig) -> Dict[str, float]:
+    """
+    measure memory allocated for tokens and expression trees of generated expressions, return bytes per token
+    and bytes per node, including containers holding them and number objects created for them
+    """
+
+    expressions = ExpressionGenerator(config.seed).expressions(config.count, config.size)
+
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        token_lists = [parser.tokenize(exp) for exp in expressions]
+        tokenized = tracemalloc.get_traced_memory()[0]
+        trees = [parser.build_expression_tree(t) for t in token_lists]
+        built = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    token_count = sum(len(t) for t in token_lists)
+    node_count = sum(_count_nodes(tree) for tree in trees)
+
+    return {
+        'token': (tokenized - start) / token_count,
+        'node': (built - tokenized) / node_count
+    }
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """
+    get names of stages that are slower than the baseline by more than `threshold`, a fraction of baseline time,
+    stages missing in either side are ignored
+    """
+
+    return [stage for stage in STAGES
+            if stage in current and stage in baseline and current[stage] > baseline[stage] * (1 + threshold)]
+
+def save_baseline(path: str, config: BenchmarkConfig, results: Dict[str, float]):
+    """
+    store stage results with the workload and environment they were measured with
+    """
+
+    data = {
+        'version': BASELINE_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': config.to_dict(),
+        'stages': results
+    }
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.write('\n')
+
+def load_baseline(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if data.get('version') != BASELINE_VERSION:
+        raise ValueError(f"unsupported baseline version {data.get('version')}")
+
+    return data
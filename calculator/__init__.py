@@ -1,18 +1,29 @@
+import os
 import sys
-import os.path
 
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtGui import QFont
-from PyQt5.QtCore import Qt
+import calculator.core.metrics as metrics
 
-import calculator.ui.uiresource as uiresource
-import calculator.ui.font as font
-from calculator.ui.main_window import CalculatorWindow
+
+# when set, performance metrics are collected and written into this file when the app quits
+METRICS_PATH_ENV = 'CALCULATOR_METRICS'
 
 
 def run():
+    # qt is imported here so that the headless mode works without PyQt5
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QFont
+
+    import calculator.ui.uiresource as uiresource
+    import calculator.ui.font as font
+    from calculator.ui.main_window import CalculatorWindow
+
     app = QApplication(sys.argv)
 
+    metricsPath = os.environ.get(METRICS_PATH_ENV)
+    if metricsPath:
+        metrics.REGISTRY.enabled = True
+        app.aboutToQuit.connect(lambda: metrics.REGISTRY.write(metricsPath))
+
     # load global stylesheet
     with open(uiresource.getResourcePath('main.qss'), 'r', encoding='utf-8') as inf:
         app.setStyleSheet(inf.read())
@@ -40,4 +51,4 @@ def run():
 
 
 if __name__ == '__main__':
-    run()
\ No newline at end of file
+    run()
@@ -0,0 +1,131 @@
+import sys
+import argparse
+from typing import Iterable, Iterator, TextIO, List
+
+import calculator.core.metrics as metrics
+from calculator.core.batch import BatchResult, evaluate_many, evaluate_file
+from calculator.core.evaluator import EvaluationBudget, ENGINE_TREE, ENGINE_VM
+from calculator.core.functions import proContext
+from calculator.core.formatting import formatNumber, formatError
+from calculator.core.exception import ParsingException
+
+
+__all__ = ['main', 'readExpressions', 'formatResult']
+
+
+# size of output buffer, results are flushed when it is full or input is interactive
+OUTPUT_BUFFER_SIZE = 64 * 1024
+
+
+def readExpressions(lines: Iterable[str]) -> Iterator[str]:
+    """
+    strip input lines, blank lines are skipped
+    """
+
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield line
+
+def formatResult(result: BatchResult) -> str:
+    """
+    convert an evaluation result into an output line, a value that cannot be
+    formatted turns the result into an error
+    """
+
+    if result.ok:
+        try:
+            return formatNumber(result.value, 16, 12)
+        except Exception as err:
+            result.error = err
+
+    return formatError(result.error)
+
+def _describeError(err: Exception) -> str:
+    if isinstance(err, ParsingException):
+        return f"{err.args[0]} at position {err.pos}"
+    else:
+        return str(err)
+
+def _parseArgs(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='main.py', description='evaluate expressions without the GUI')
+
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--eval', metavar='EXPR', dest='expression',
+        help="evaluate a single expression, or expressions from stdin when given '-'")
+    source.add_argument('--batch', metavar='FILE',
+        help="evaluate expressions from a file line by line, '-' for stdin")
+
+    parser.add_argument('--engine', choices=(ENGINE_TREE, ENGINE_VM), default=ENGINE_TREE,
+        help='evaluation engine')
+    parser.add_argument('--workers', type=int, default=1,
+        help='number of worker processes, expressions are evaluated in current process by default')
+
+    parser.add_argument('--max-digits', type=int, help='maximum digits of integer results')
+    parser.add_argument('--max-operations', type=int, help='maximum operations of each expression')
+    parser.add_argument('--timeout', type=float, help='time limit of each expression in seconds')
+
+    parser.add_argument('--metrics', metavar='FILE',
+        help='write performance metrics of current process into a file when done, as JSON for .json files '
+             'and Prometheus text format otherwise')
+
+    return parser.parse_args(argv)
+
+def main(argv: List[str] = None, stdin: TextIO = None, stdout: TextIO = None, stderr: TextIO = None) -> int:
+    """
+    run the headless calculator, one result line is written for each non-blank input line
+
+    the input is streamed, so memory usage doesn't depend on input size. exit code is 1 when any
+    expression fails
+    """
+
+    args = _parseArgs(sys.argv[1:] if argv is None else argv)
+
+    stderr = stderr or sys.stderr
+    if stdout is None:
+        stdout = open(sys.stdout.fileno(), 'w', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE, closefd=False)
+
+    if args.metrics is not None:
+        metrics.REGISTRY.enabled = True
+
+    context = proContext()
+    interactive = False
+
+    budget = None
+    if args.max_digits is not None or args.max_operations is not None or args.timeout is not None:
+        budget = EvaluationBudget(args.max_digits, args.max_operations, args.timeout)
+
+    if args.batch is not None and args.batch != '-':
+        # files are memory-mapped, workers read their own byte ranges
+        results = evaluate_file(args.batch, context, workers=args.workers, engine=args.engine, budget=budget)
+    else:
+        if args.expression is not None and args.expression != '-':
+            lines = [args.expression]
+        else:
+            lines = stdin or open(sys.stdin.fileno(), 'r', encoding='utf-8', closefd=False)
+            interactive = lines.isatty()
+
+        # small chunks keep latency low when evaluating in current process
+        chunksize = 1 if args.workers <= 1 else 256
+        results = evaluate_many(readExpressions(lines), context, workers=args.workers,
+            chunksize=chunksize, engine=args.engine, budget=budget)
+
+    errors = 0
+    try:
+        for result in results:
+            line = formatResult(result)
+            if not result.ok:
+                errors += 1
+                stderr.write(f"expression {result.index + 1}: {_describeError(result.error)}\n")
+
+            stdout.write(line)
+            stdout.write('\n')
+            if interactive:
+                stdout.flush()
+    finally:
+        stdout.flush()
+
+        if args.metrics is not None:
+            metrics.REGISTRY.write(args.metrics)
+
+    return 1 if errors > 0 else 0
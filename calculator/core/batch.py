@@ -0,0 +1,172 @@
+import os
+import itertools
+import concurrent.futures
+from collections import deque
+from typing import Iterable, Iterator, List, Tuple, Any, Optional
+
+from calculator.core.evaluator import Evaluator, EvaluatorContext, EvaluationBudget, ENGINE_TREE
+from calculator.core.cache import ParseCache
+from calculator.core.reader import read_records, byte_ranges
+
+
+__all__ = ['BatchResult', 'evaluate_many', 'evaluate_file']
+
+
+# evaluator of current worker process, created once by the pool initializer
+_worker_evaluator: Optional[Evaluator] = None
+
+
+class BatchResult(object):
+    """
+    outcome of evaluating a single expression of a batch
+    """
+
+    def __init__(self, index: int, value: Any = None, error: Exception = None):
+        """
+        :param index: position of the expression in the input
+        :param value: evaluated value, None when failed
+        :param error: `ParsingException`, `EvaluationException` or any other error raised by the expression
+        """
+
+        self.index = index
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __str__(self):
+        if self.error is None:
+            return f'BatchResult({self.index}, value={self.value})'
+        else:
+            return f'BatchResult({self.index}, error={self.error!r})'
+
+def _create_evaluator(context: EvaluatorContext, engine: str, cache_size: int, budget: EvaluationBudget) -> Evaluator:
+    parse_cache = ParseCache(cache_size) if cache_size > 0 else None
+    return Evaluator(context, parse_cache=parse_cache, engine=engine, budget=budget)
+
+def _init_worker(context: EvaluatorContext, engine: str, cache_size: int, budget: EvaluationBudget):
+    global _worker_evaluator
+    _worker_evaluator = _create_evaluator(context, engine, cache_size, budget)
+
+def _evaluate_chunk(evaluator: Evaluator, chunk: List[str]) -> List[Tuple[Any, Optional[Exception]]]:
+    results = []
+    for exp in chunk:
+        try:
+            results.append((evaluator.evaluate(exp), None))
+        except Exception as err:
+            results.append((None, err))
+
+    return results
+
+def _evaluate_chunk_in_worker(chunk: List[str]) -> List[Tuple[Any, Optional[Exception]]]:
+    return _evaluate_chunk(_worker_evaluator, chunk)
+
+def _evaluate_range(evaluator: Evaluator, path: str, start: int, end: int) -> List[Tuple[Any, Optional[Exception]]]:
+    records = (r.strip() for r in read_records(path, start, end))
+    return _evaluate_chunk(evaluator, [r for r in records if r])
+
+def _evaluate_range_in_worker(path: str, start: int, end: int) -> List[Tuple[Any, Optional[Exception]]]:
+    return _evaluate_range(_worker_evaluator, path, start, end)
+
+def _chunks(expressions: Iterable[str], chunksize: int) -> Iterator[List[str]]:
+    iterator = iter(expressions)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if chunk:
+            yield chunk
+        else:
+            return
+
+def evaluate_many(expressions: Iterable[str], context: EvaluatorContext = None, workers: int = None,
+        chunksize: int = 1000, engine: str = ENGINE_TREE, cache_size: int = 0,
+        budget: EvaluationBudget = None) -> Iterator[BatchResult]:
+    """
+    evaluate expressions across a pool of worker processes, results are yielded lazily in input order
+
+    a failing expression gives a result carrying the error instead of aborting the batch. the input is
+    consumed progressively with a bounded number of chunks in flight, so memory stays flat for large inputs
+
+    :param context: evaluation context, sent once to every worker, it must be picklable unless
+        processes are forked
+    :param workers: number of worker processes, defaults to cpu count, evaluate in the current
+        process when it is 1
+    :param chunksize: number of expressions sent to a worker at a time
+    :param engine: evaluation engine used by workers
+    :param cache_size: size of the parse cache of each worker, disabled when 0
+    :param budget: resource limits of each expression
+    """
+
+    if chunksize <= 0:
+        raise ValueError("chunksize must be positive")
+
+    if context is None:
+        context = EvaluatorContext()
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers <= 1:
+        evaluator = _create_evaluator(context, engine, cache_size, budget)
+        tasks = ((_evaluate_chunk, evaluator, chunk) for chunk in _chunks(expressions, chunksize))
+        return _collect(_run_in_process(tasks))
+    else:
+        tasks = ((_evaluate_chunk_in_worker, chunk) for chunk in _chunks(expressions, chunksize))
+        return _collect(_run_in_pool(tasks, context, workers, engine, cache_size, budget))
+
+def evaluate_file(path: str, context: EvaluatorContext = None, workers: int = None, chunk_bytes: int = 1 << 20,
+        engine: str = ENGINE_TREE, cache_size: int = 0, budget: EvaluationBudget = None) -> Iterator[BatchResult]:
+    """
+    evaluate expressions of a file, one for each non-blank line, results are yielded lazily in input order
+
+    the file is split into byte ranges, and each worker memory-maps its own range instead of
+    receiving expressions from the parent process, see `evaluate_many` for other parameters
+
+    :param chunk_bytes: size of byte range handled by a worker at a time
+    """
+
+    if context is None:
+        context = EvaluatorContext()
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    ranges = byte_ranges(path, chunk_bytes)
+
+    if workers <= 1:
+        evaluator = _create_evaluator(context, engine, cache_size, budget)
+        tasks = ((_evaluate_range, evaluator, path, start, end) for (start, end) in ranges)
+        return _collect(_run_in_process(tasks))
+    else:
+        tasks = ((_evaluate_range_in_worker, path, start, end) for (start, end) in ranges)
+        return _collect(_run_in_pool(tasks, context, workers, engine, cache_size, budget))
+
+def _collect(chunk_results: Iterator[List[Tuple[Any, Optional[Exception]]]]) -> Iterator[BatchResult]:
+    index = 0
+    for results in chunk_results:
+        for (value, error) in results:
+            yield BatchResult(index, value, error)
+            index += 1
+
+def _run_in_process(tasks: Iterator[tuple]) -> Iterator[list]:
+    for (fun, *args) in tasks:
+        yield fun(*args)
+
+def _run_in_pool(tasks: Iterator[tuple], context: EvaluatorContext, workers: int, engine: str,
+        cache_size: int, budget: EvaluationBudget) -> Iterator[list]:
+    initargs = (context, engine, cache_size, budget)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+        pending = deque()
+
+        # keep each worker busy with one extra task queued
+        for (fun, *args) in itertools.islice(tasks, workers * 2):
+            pending.append(executor.submit(fun, *args))
+
+        while pending:
+            results = pending.popleft().result()
+
+            for (fun, *args) in itertools.islice(tasks, 1):
+                pending.append(executor.submit(fun, *args))
+
+            yield results
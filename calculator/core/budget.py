@@ -0,0 +1,128 @@
+import math
+import time
+from typing import Optional
+
+from calculator.core.exception import BudgetExceededException
+
+
+__all__ = ['EvaluationBudget', 'BudgetMeter', 'estimate_power_digits', 'estimate_product_digits',
+    'estimate_factorial_digits']
+
+
+def _int_digits(n: int) -> float:
+    # math.log10 works on ints of any size without converting them to float
+    return math.log10(abs(n)) + 1 if n != 0 else 1
+
+def estimate_power_digits(base, exponent) -> Optional[float]:
+    """
+    estimate decimal digits of `base ^ exponent`, return None when the power is cheap regardless
+    of the operands, which is the case unless both are ints as float powers overflow immediately
+    """
+
+    if base.__class__ is not int or exponent.__class__ is not int or exponent <= 0:
+        return None
+    elif -1 <= base <= 1:
+        return 1
+
+    return exponent * math.log10(abs(base)) + 1
+
+def estimate_product_digits(a, b) -> Optional[float]:
+    """
+    estimate decimal digits of `a × b`, None unless both operands are ints
+    """
+
+    if a.__class__ is not int or b.__class__ is not int:
+        return None
+
+    return _int_digits(a) + _int_digits(b)
+
+def estimate_factorial_digits(n) -> Optional[float]:
+    """
+    estimate decimal digits of `n!` with log-gamma, None when the operand is not a valid factorial input
+    """
+
+    if n.__class__ is float and n.is_integer():
+        n = int(n)
+
+    if n.__class__ is not int or n < 0:
+        return None
+
+    return math.lgamma(n + 1) / math.log(10) + 1
+
+
+class EvaluationBudget(object):
+    """
+    resource limits of a single evaluation, None means unlimited
+    """
+
+    def __init__(self, max_digits: int = None, max_operations: int = None, timeout: float = None):
+        """
+        :param max_digits: maximum decimal digits of integer results of `^`, `×` and `!`, estimated before computing
+        :param max_operations: maximum number of operators and function calls evaluated
+        :param timeout: wall-clock limit in seconds, checked between operations
+        """
+
+        self.max_digits = max_digits
+        self.max_operations = max_operations
+        self.timeout = timeout
+
+    def start(self) -> 'BudgetMeter':
+        """
+        create a meter that tracks usage of one evaluation
+        """
+
+        return BudgetMeter(self)
+
+    def __str__(self):
+        return (f'EvaluationBudget(max_digits={self.max_digits}, max_operations={self.max_operations}, '
+                f'timeout={self.timeout})')
+
+class BudgetMeter(object):
+    """
+    usage of a budget during one evaluation
+    """
+
+    def __init__(self, budget: EvaluationBudget):
+        self.max_digits = budget.max_digits
+        self.max_operations = budget.max_operations
+        self.deadline = None if budget.timeout is None else time.monotonic() + budget.timeout
+        self.operations = 0
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        request the evaluation to stop at its next operation, can be called from another thread
+        """
+
+        self.cancelled = True
+
+    def tick(self, count: int = 1):
+        """
+        count operations and check operation and time limits
+        """
+
+        if self.cancelled:
+            raise BudgetExceededException("evaluation cancelled", 'cancelled')
+
+        self.operations += count
+        if self.max_operations is not None and self.operations > self.max_operations:
+            raise BudgetExceededException("too many operations", 'operations')
+
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceededException("evaluation timed out", 'timeout')
+
+    def check_digits(self, digits: Optional[float]):
+        if digits is not None and self.max_digits is not None and digits > self.max_digits:
+            raise BudgetExceededException("result too large", 'digits')
+
+    def check_power(self, base, exponent):
+        self.tick()
+        self.check_digits(estimate_power_digits(base, exponent))
+
+    def check_product(self, a, b):
+        self.tick()
+        self.check_digits(estimate_product_digits(a, b))
+
+    def check_factorial(self, n):
+        self.tick()
+        self.check_digits(estimate_factorial_digits(n))
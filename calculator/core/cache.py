@@ -0,0 +1,166 @@
+import threading
+from collections import OrderedDict
+from typing import Optional, Hashable, Any, Callable
+
+import calculator.core.nodes as nodes
+
+
+__all__ = ['CacheInfo', 'LRUCache', 'ParseCache', 'MemoizedFunction']
+
+
+class CacheInfo(object):
+    """
+    snapshot of cache statistics
+    """
+
+    def __init__(self, hits: int, misses: int, evictions: int, maxsize: int, currsize: int):
+        self.hits = hits
+        self.misses = misses
+        self.evictions = evictions
+        self.maxsize = maxsize
+        self.currsize = currsize
+
+    def __str__(self):
+        return (f'CacheInfo(hits={self.hits}, misses={self.misses}, evictions={self.evictions}, '
+                f'maxsize={self.maxsize}, currsize={self.currsize})')
+
+class LRUCache(object):
+    """
+    size-bounded mapping that discards the least recently used entry when full
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """
+        :param maxsize: maximum number of entries, must be positive
+        """
+
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+
+        self._maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable):
+        return key in self._data
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        get cached value of the key and mark it as recently used, return None when missing
+        """
+
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._data.move_to_end(key)
+
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """
+        add or replace an entry, evict least recently used entries when the cache is full
+        """
+
+        if value is None:
+            raise ValueError("cannot cache None")
+
+        with self._lock:
+            data = self._data
+            data[key] = value
+            data.move_to_end(key)
+
+            while len(data) > self._maxsize:
+                data.popitem(last=False)
+                self._evictions += 1
+
+    def resize(self, maxsize: int):
+        """
+        change the size limit, extra entries are evicted immediately
+        """
+
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+
+        with self._lock:
+            self._maxsize = maxsize
+
+            data = self._data
+            while len(data) > maxsize:
+                data.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self, reset_stats: bool = False):
+        """
+        remove all entries
+
+        :param reset_stats: also reset hit/miss/eviction counters
+        """
+
+        with self._lock:
+            self._data.clear()
+
+            if reset_stats:
+                self._hits = self._misses = self._evictions = 0
+
+    def info(self) -> CacheInfo:
+        """
+        get current statistics of the cache
+        """
+
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, self._maxsize, len(self._data))
+
+    def __reduce__(self):
+        # entries and the lock are not sent across processes, an empty cache of the same size is created
+        return (self.__class__, (self._maxsize,))
+
+class ParseCache(LRUCache):
+    """
+    cache of parsed expression trees keyed by expression text
+
+    cached trees are shared between callers, they must be treated as read-only,
+    evaluation never mutates a tree
+    """
+
+    def put(self, key: str, value: nodes.ExpNode):
+        if not isinstance(value, nodes.ExpNode):
+            raise TypeError("value must be an expression node")
+
+        super().put(key, value)
+
+class MemoizedFunction(object):
+    """
+    wrapper of a function that caches its results in a bounded LRU cache
+    """
+
+    def __init__(self, fun: Callable[..., Any], maxsize: int):
+        self.fun = fun
+        self.cache = LRUCache(maxsize)
+
+    def __call__(self, *args):
+        # arguments are keyed with their types, so that 1 and 1.0 are cached separately
+        key = tuple((a.__class__, a) for a in args)
+        value = self.cache.get(key)
+        if value is None:
+            value = self.fun(*args)
+            if value is not None:
+                self.cache.put(key, value)
+
+        return value
+
+    def cache_info(self) -> CacheInfo:
+        return self.cache.info()
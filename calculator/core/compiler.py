@@ -0,0 +1,212 @@
+import typing
+from typing import Callable, Union, Sequence, Dict
+
+import calculator.core.nodes as nodes
+from calculator.core.operators import OP_FUNCTIONS_BINARY, OP_FUNCTIONS_UNARY
+from calculator.core.exception import EvaluationException
+
+if typing.TYPE_CHECKING:
+    from calculator.core.evaluator import EvaluatorContext
+
+
+__all__ = ['compile_tree', 'PreparedExpression']
+
+
+TypeEvalResult = Union[int, float]
+TypeCompiled = Callable[[], TypeEvalResult]
+
+# compiled closures take a single argument, the sequence of parameter values
+TypeClosure = Callable[[Sequence[TypeEvalResult]], TypeEvalResult]
+
+
+def _raiser(msg: str) -> TypeClosure:
+    """
+    create a callable that raises evaluation error when called,
+    errors are deferred so that they are raised in the same order as tree-walking evaluation
+    """
+
+    def fail(env):
+        raise EvaluationException(msg)
+
+    return fail
+
+class _ClosureCompiler(object):
+    """
+    convert expression nodes into nested closures
+    """
+
+    def __init__(self, context: 'EvaluatorContext', params: Sequence[str] = ()):
+        self._context = context
+        self._params = {name: i for (i, name) in enumerate(params)}
+
+        self._compile_methods = {
+            nodes.NumberNode: self._compile_number,
+            nodes.NameConstantNode: self._compile_const,
+            nodes.BinaryOpNode: self._compile_binary,
+            nodes.UnaryOpNode: self._compile_unary,
+            nodes.FuncCallNode: self._compile_func_call
+        }
+
+    def _compile_number(self, node: nodes.NumberNode) -> TypeClosure:
+        num = node.num
+        return lambda env: num
+
+    def _compile_const(self, node: nodes.NameConstantNode) -> TypeClosure:
+        constants = self._context.constants
+        if node.name in self._params:
+            # parameters shadow constants of the context
+            index = self._params[node.name]
+            return lambda env: env[index]
+        elif node.name in constants:
+            value = constants[node.name]
+            return lambda env: value
+        else:
+            return _raiser(f"unknown constant '{node.name}'")
+
+    def _compile_unary(self, node: nodes.UnaryOpNode) -> TypeClosure:
+        fun = OP_FUNCTIONS_UNARY.get(node.op, None)
+        if fun is not None:
+            child = self.compile(node.child)
+            return lambda env: fun(child(env))
+        else:
+            return _raiser(f"unsupported unary operator '{node.op}'")
+
+    def _compile_binary(self, node: nodes.BinaryOpNode) -> TypeClosure:
+        fun = OP_FUNCTIONS_BINARY.get(node.op, None)
+        if fun is not None:
+            left = self.compile(node.left)
+            right = self.compile(node.right)
+
+            def binary(env):
+                result = fun(left(env), right(env))
+                if isinstance(result, complex):
+                    raise EvaluationException("invalid expression")
+                else:
+                    return result
+
+            return binary
+        else:
+            return _raiser(f"unsupported binary operator '{node.op}'")
+
+    def _compile_func_call(self, node: nodes.FuncCallNode) -> TypeClosure:
+        fun = self._context.functions.get(node.id, None)
+        if fun is not None:
+            signature = self._context.get_signature(node.id, fun)
+            if signature is None:
+                return _raiser(f"cannot resolve signature of function '{node.id}'")
+            elif signature.accepts(len(node.args)):
+                args = [self.compile(n) for n in node.args]
+
+                # specialize the most common argument counts to avoid building argument lists
+                if len(args) == 1:
+                    arg0 = args[0]
+                    return lambda env: fun(arg0(env))
+                elif len(args) == 2:
+                    arg0, arg1 = args
+                    return lambda env: fun(arg0(env), arg1(env))
+                else:
+                    return lambda env: fun(*[a(env) for a in args])
+            else:
+                return _raiser(f"incorrect number of arguments passed into function '{node.id}'")
+        else:
+            return _raiser(f"unsupported function '{node.id}'")
+
+    def compile(self, node: nodes.ExpNode) -> TypeClosure:
+        method = self._compile_methods.get(node.__class__)
+        if method is not None:
+            return method(node)
+        else:
+            return _raiser("invalid inputs")
+
+def _translate_errors(body: TypeClosure, env: Sequence[TypeEvalResult]) -> TypeEvalResult:
+    try:
+        return body(env)
+    except ZeroDivisionError as err:
+        raise EvaluationException("zero division", inner=err)
+    except ValueError as err:
+        raise EvaluationException("value error", inner=err)
+
+def compile_tree(node: nodes.ExpNode, context: 'EvaluatorContext') -> TypeCompiled:
+    """
+    compile an expression tree into a callable taking no argument
+
+    constants and functions are resolved from the context at compile time, later changes
+    of the context are not visible to the compiled callable
+    """
+
+    body = _ClosureCompiler(context).compile(node)
+    return lambda: _translate_errors(body, ())
+
+class PreparedExpression(object):
+    """
+    expression compiled once with free parameters, evaluated cheaply for different parameter values
+    """
+
+    def __init__(self, node: nodes.ExpNode, context: 'EvaluatorContext', params: Sequence[str]):
+        """
+        :param params: names of parameters, they shadow constants of the same name in the context
+        """
+
+        params = tuple(params)
+        if len(set(params)) != len(params):
+            raise ValueError("duplicated parameter names")
+
+        self.node = node
+        self.params = params
+
+        self._body = _ClosureCompiler(context, params).compile(node)
+        self._indexes = {name: i for (i, name) in enumerate(params)}
+        self._bound: Dict[str, TypeEvalResult] = {}
+
+    @property
+    def free_params(self) -> Sequence[str]:
+        """
+        parameters that are not bound yet, in declaration order
+        """
+
+        return tuple(p for p in self.params if p not in self._bound)
+
+    def _merge(self, args: Sequence[TypeEvalResult], kwargs: Dict[str, TypeEvalResult]) -> Dict[str, TypeEvalResult]:
+        values = dict(self._bound)
+
+        free = self.free_params
+        if len(args) > len(free):
+            raise TypeError(f"expected at most {len(free)} positional values, got {len(args)}")
+
+        values.update(zip(free, args))
+
+        for (name, value) in kwargs.items():
+            if name not in self._indexes:
+                raise TypeError(f"unknown parameter '{name}'")
+            elif name in values and name not in self._bound:
+                raise TypeError(f"multiple values for parameter '{name}'")
+            values[name] = value
+
+        return values
+
+    def bind(self, *args: TypeEvalResult, **kwargs: TypeEvalResult) -> 'PreparedExpression':
+        """
+        create a copy with some parameters fixed, positional values are assigned to free parameters in order
+        """
+
+        prepared = object.__new__(PreparedExpression)
+        prepared.__dict__.update(self.__dict__)
+        prepared._bound = self._merge(args, kwargs)
+
+        return prepared
+
+    def __call__(self, *args: TypeEvalResult, **kwargs: TypeEvalResult) -> TypeEvalResult:
+        """
+        evaluate with values of the remaining free parameters
+        """
+
+        if not kwargs and not self._bound and len(args) == len(self.params):
+            # fast path, all values given positionally
+            return _translate_errors(self._body, args)
+
+        values = self._merge(args, kwargs)
+        if len(values) < len(self.params):
+            missing = ', '.join(p for p in self.params if p not in values)
+            raise TypeError(f"missing values for parameters: {missing}")
+
+        return _translate_errors(self._body, [values[p] for p in self.params])
@@ -1,74 +1,318 @@
-import math
 import inspect
 import typing
-from typing import Dict, Callable, Union
+from typing import Dict, Callable, Union, Tuple, Optional, Sequence, FrozenSet
 
 import calculator.core.parser as parser
 import calculator.core.nodes as nodes
-from calculator.core.constants import MATH_CONSTANTS, BinaryOperators, UnaryOperators
+import calculator.core.vm as vm
+import calculator.core.flat as flat
+import calculator.core.metrics as metrics
+from calculator.core.constants import MATH_CONSTANTS
+from calculator.core.operators import OP_FUNCTIONS_BINARY, OP_FUNCTIONS_UNARY
+from calculator.core.compiler import compile_tree, PreparedExpression
+from calculator.core.vectorized import evaluate_vectorized
+from calculator.core.structs import FunctionSignature, FunctionInfo, VersionedDict, LayeredDict
 from calculator.core.exception import EvaluationException
+from calculator.core.cache import ParseCache, MemoizedFunction
+from calculator.core.budget import EvaluationBudget, BudgetMeter
+from calculator.core.memo import SubtreeMemo, evaluate_memoized
+from calculator.core.tracing import EvaluationTracer, Profiler, evaluate_traced
 
 
-__all__ = ['EvaluatorContext', 'Evaluator']
+__all__ = ['EvaluatorContext', 'Evaluator', 'EvaluationBudget', 'SubtreeMemo', 'EvaluationTracer', 'Profiler',
+           'ENGINE_TREE', 'ENGINE_VM']
 
 
 TypeEvalResult = Union[int, float]
+TypeArity = Union[int, Tuple[int, Optional[int]]]
 
+# evaluation engines
+ENGINE_TREE = 'tree'        # recursive tree walking
+ENGINE_VM = 'vm'            # assemble into a postfix program and run it on a stack machine
 
-OP_FUNCTIONS_BINARY = {
-    BinaryOperators.OP_ADD: lambda a, b: a + b,
-    BinaryOperators.OP_MINUS: lambda a, b: a - b,
-    BinaryOperators.OP_MULTIPLY: lambda a, b: a * b,
-    BinaryOperators.OP_DIVIDE: lambda a, b: a / b,
-    BinaryOperators.OP_POWER: lambda a, b: a ** b,
-    BinaryOperators.OP_MOD: lambda a, b: a % b
-}
+EVALUATE_SECONDS = metrics.REGISTRY.histogram('calculator_evaluate_seconds', 'time spent in Evaluator.evaluate, including parsing')
+EVALUATE_ERRORS = metrics.REGISTRY.counter('calculator_evaluate_errors_total', 'evaluations that raised an error')
 
-OP_FUNCTIONS_UNARY = {
-    UnaryOperators.OP_POSITIVE: lambda a: a,
-    UnaryOperators.OP_NEGATIVE: lambda a: -a,
-    UnaryOperators.OP_FACTORIAL: math.factorial
-}
+
+def resolve_signature(fun: Callable[..., typing.Any]) -> Optional[FunctionSignature]:
+    """
+    inspect accepted positional argument counts of a function, return None if it cannot be inspected
+    or cannot be called with positional arguments only
+    """
+
+    try:
+        params = inspect.signature(fun).parameters.values()
+    except (TypeError, ValueError):
+        return None
+
+    min_argc = 0
+    max_argc = 0
+    for param in params:
+        if param.kind == param.VAR_POSITIONAL:
+            max_argc = None
+        elif param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+            if param.default is param.empty:
+                min_argc += 1
+            if max_argc is not None:
+                max_argc += 1
+        elif param.kind == param.KEYWORD_ONLY and param.default is param.empty:
+            # expressions pass no keyword arguments, such functions need an explicit arity
+            return None
+
+    return FunctionSignature(min_argc, max_argc)
 
 
 class EvaluatorContext(object):
     """
     context for expression evaluation
+
+    contexts can be layered on top of a frozen parent context, which shares its constants and functions
+    without copying them, so that a large function library is built once and each caller adds a thin layer
+    of its own definitions. frozen contexts are hashable and compare by content, to be used as cache keys
     """
 
-    def __init__(self, *, constants: Dict[str, TypeEvalResult] = None, functions: Dict[str, Callable[..., typing.Any]] = None):
+    def __init__(self, *, constants: Dict[str, TypeEvalResult] = None, functions: Dict[str, Callable[..., typing.Any]] = None,
+            parent: 'EvaluatorContext' = None):
         """
         :param constants: add custom constants into context
         :param functions: add custom function into context
+        :param parent: frozen context whose constants, functions and their metadata are inherited
         """
 
-        self.constants = dict(MATH_CONSTANTS)
+        if parent is not None and not parent.frozen:
+            raise ValueError("parent context must be frozen")
+
+        self._parent = parent
+        self._frozen = False
+        self._key = None
+
+        self.constants = MATH_CONSTANTS if parent is None else {}
         self.functions = {}
 
+        # function name -> metadata, functions added to `functions` directly get default metadata on first use
+        self._infos = {}
+
         if constants is not None:
             self.constants.update(constants)
 
         if functions is not None:
             self.functions.update(functions)
 
+    @property
+    def constants(self) -> Dict[str, TypeEvalResult]:
+        return self._constants
+
+    @constants.setter
+    def constants(self, value: Dict[str, TypeEvalResult]):
+        # always hold a private copy so that modifications are tracked by `version`
+        self._constants = self._layer(value, 'constants')
+
+    @property
+    def functions(self) -> Dict[str, Callable[..., typing.Any]]:
+        return self._functions
+
+    @functions.setter
+    def functions(self, value: Dict[str, Callable[..., typing.Any]]):
+        self._functions = self._layer(value, 'functions')
+
+    def _layer(self, value: dict, attr: str) -> VersionedDict:
+        if self._frozen:
+            raise TypeError("cannot modify a frozen context")
+        elif self._parent is None:
+            return VersionedDict(value)
+        else:
+            return LayeredDict(getattr(self._parent, attr), value)
+
+    @property
+    def parent(self) -> Optional['EvaluatorContext']:
+        return self._parent
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def freeze(self) -> 'EvaluatorContext':
+        """
+        make the context immutable and hashable, return the context itself
+
+        modifying constants or functions of a frozen context raises `TypeError`
+        """
+
+        if not self._frozen:
+            self._constants.freeze()
+            self._functions.freeze()
+            self._frozen = True
+
+        return self
+
+    def derive(self, *, constants: Dict[str, TypeEvalResult] = None,
+            functions: Dict[str, Callable[..., typing.Any]] = None) -> 'EvaluatorContext':
+        """
+        create a context layered on top of this one, which must be frozen
+        """
+
+        return EvaluatorContext(constants=constants, functions=functions, parent=self)
+
+    def _content_key(self) -> tuple:
+        if self._key is None:
+            functions = []
+            for (name, fun) in self._functions.items():
+                info = self._get_info(name, fun)
+                functions.append((name, fun, info.pure, info.cost))
+
+            self._key = (frozenset(self._constants.items()), frozenset(functions))
+
+        return self._key
+
+    def __hash__(self):
+        if not self._frozen:
+            raise TypeError("unhashable context, freeze it first")
+
+        return hash(self._content_key())
+
+    def __eq__(self, other):
+        # contexts that are not frozen only equal to themselves
+        if self is other:
+            return True
+        elif isinstance(other, EvaluatorContext) and self._frozen and other._frozen:
+            return self._content_key() == other._content_key()
+        else:
+            return NotImplemented
+
+    def __getstate__(self):
+        # content key holds hashes of functions, which differ between processes
+        state = self.__dict__.copy()
+        state['_key'] = None
+        return state
+
+    @property
+    def version(self) -> Tuple[int, int]:
+        """
+        version of the context, it changes whenever constants or functions are modified or replaced
+        """
+
+        return (self._constants.version, self._functions.version)
+
+    def register_function(self, name: str, fun: Callable[..., typing.Any], arity: TypeArity = None, *,
+            pure: bool = False, cost: int = 1, vector: Callable[..., typing.Any] = None, memo_size: int = 0):
+        """
+        add a function into context with its metadata, the signature is resolved immediately
+
+        :param arity: explicit argument count, either an int or a (min, max) tuple where max can be None
+            for variadic functions, required for builtins that don't expose a signature like `math.log`
+        :param pure: whether the function always returns the same result for the same arguments, pure
+            functions are folded by the optimizer and memoized in subtree memos
+        :param cost: estimated cost of a call, counted in operations by evaluation budgets
+        :param vector: numpy implementation used by vectorized evaluation
+        :param memo_size: cache results of the latest calls when positive, only sensible for pure functions
+        """
+
+        if arity is None:
+            signature = resolve_signature(fun)
+            if signature is None:
+                raise ValueError(f"cannot resolve signature of function '{name}', arity must be given")
+        elif isinstance(arity, int):
+            signature = FunctionSignature(arity, arity)
+        else:
+            signature = FunctionSignature(*arity)
+
+        if memo_size > 0:
+            fun = MemoizedFunction(fun, memo_size)
+
+        self.functions[name] = fun
+        self._infos[name] = FunctionInfo(fun, signature, pure=pure, cost=cost, vector=vector)
+
+    def _get_info(self, name: str, fun: Callable[..., typing.Any]) -> FunctionInfo:
+        info = self._infos.get(name)
+        if info is None or info.fun is not fun:
+            parent = self._parent
+            if parent is not None and parent._functions.get(name) is fun:
+                info = parent._get_info(name, fun)
+            else:
+                # the function is new or was replaced through `functions`, its metadata is reset
+                info = FunctionInfo(fun, resolve_signature(fun))
+
+            self._infos[name] = info
+
+        return info
+
+    def get_function_info(self, name: str) -> Optional[FunctionInfo]:
+        """
+        get metadata of a function in context, return None if there's no such function
+        """
+
+        fun = self.functions.get(name)
+        return self._get_info(name, fun) if fun is not None else None
+
+    def get_signature(self, name: str, fun: Callable[..., typing.Any]) -> Optional[FunctionSignature]:
+        """
+        get signature of a function in context, functions added to `functions` directly are resolved on first use
+        """
+
+        return self._get_info(name, fun).signature
+
+    def pure_functions(self) -> FrozenSet[str]:
+        """
+        get names of functions registered as pure
+        """
+
+        return frozenset(name for name in self.functions if self.get_function_info(name).pure)
+
+    def vector_functions(self) -> Dict[str, Callable[..., typing.Any]]:
+        """
+        get numpy implementations of functions registered with one
+        """
+
+        result = {}
+        for name in self.functions:
+            info = self.get_function_info(name)
+            if info.vector is not None:
+                result[name] = info.vector
+
+        return result
+
 class Evaluator(object):
     """
     the evaluator that can take either string expression or expression tree and output their value
     """
 
-    def __init__(self, context: EvaluatorContext = None):
+    def __init__(self, context: EvaluatorContext = None, parse_cache: ParseCache = None, engine: str = ENGINE_TREE,
+            budget: EvaluationBudget = None, memo: SubtreeMemo = None, tracer: EvaluationTracer = None):
+        """
+        :param context: evaluation context, a default context is created when omitted
+        :param parse_cache: optional cache of parsed trees used when evaluating string expressions
+        :param engine: evaluation engine for node trees, either `ENGINE_TREE` or `ENGINE_VM`
+        :param budget: resource limits applied to each call of `evaluate`, budgeted evaluation always
+            runs on the VM engine which checks the budget between instructions
+        :param memo: cache of pure subtree results shared across evaluations, used instead of the
+            selected engine when no budget is given
+        :param tracer: hooks called around evaluation of each node, such as a `Profiler`. traced evaluation
+            walks the tree and takes precedence over the memo, but evaluations on the VM engine or with a
+            budget are not traced
+        """
+
+        if engine not in (ENGINE_TREE, ENGINE_VM):
+            raise ValueError(f"unknown engine '{engine}'")
+
+        self.parse_cache = parse_cache
+        self.engine = engine
+        self.budget = budget
+        self.memo = memo
+        self.tracer = tracer
+
         if context is not None:
             self._context = context
         else:
             self._context = EvaluatorContext()
 
-        self._eval_methods = (
-            (nodes.NumberNode, self._eval_number),
-            (nodes.NameConstantNode, self._eval_const),
-            (nodes.BinaryOpNode, self._eval_binary),
-            (nodes.UnaryOpNode, self._eval_unary),
-            (nodes.FuncCallNode, self._eval_func_call)
-        )
+        # node class -> evaluation method
+        self._eval_methods = {
+            nodes.NumberNode: self._eval_number,
+            nodes.NameConstantNode: self._eval_const,
+            nodes.BinaryOpNode: self._eval_binary,
+            nodes.UnaryOpNode: self._eval_unary,
+            nodes.FuncCallNode: self._eval_func_call
+        }
 
     def _eval_number(self, node: nodes.NumberNode) -> TypeEvalResult:
         return node.num
@@ -104,11 +348,10 @@ class Evaluator(object):
     def _eval_func_call(self, node: nodes.FuncCallNode) -> TypeEvalResult:
         fun = self._context.functions.get(node.id, None)
         if fun is not None:
-            # spec validation
-            spec = inspect.getfullargspec(fun)
-            max_argc = len(spec.args)
-            min_argc = max_argc - (0 if spec.defaults is None else len(spec.defaults))
-            if min_argc <= len(node.args) <= max_argc:
+            signature = self._context.get_signature(node.id, fun)
+            if signature is None:
+                raise EvaluationException(f"cannot resolve signature of function '{node.id}'")
+            elif signature.accepts(len(node.args)):
                 values = [self._eval_node(n) for n in node.args]        # resolve arguments
                 return fun(*values)
             else:
@@ -117,25 +360,108 @@ class Evaluator(object):
             raise EvaluationException(f"unsupported function '{node.id}'")
 
     def _eval_node(self, node: nodes.ExpNode) -> TypeEvalResult:
-        for (ntype, evaluator) in self._eval_methods:
-            if node.__class__ is ntype:
-                try:
-                    return evaluator(node)
-                except ZeroDivisionError as err:
-                    raise EvaluationException("zero division", inner=err)
-                except ValueError as err:
-                    raise EvaluationException("value error", inner=err)
+        evaluator = self._eval_methods.get(node.__class__)
+        if evaluator is not None:
+            return evaluator(node)
         else:
             raise EvaluationException("invalid inputs")     # unsupported node type, should never happen
 
-    def evaluate(self, exp_or_node: Union[str, nodes.ExpNode]) -> TypeEvalResult:
+    def compile(self, exp_or_node: Union[str, nodes.ExpNode]) -> Callable[[], TypeEvalResult]:
+        """
+        compile given expression or node tree into a callable that returns the same result as `evaluate`,
+        constants and functions are resolved from the context once at compile time
+        """
+
+        if isinstance(exp_or_node, nodes.ExpNode):
+            exp_tree = exp_or_node
+        else:
+            exp_tree = parser.parse_expression(exp_or_node, self.parse_cache)
+
+        return compile_tree(exp_tree, self._context)
+
+    def prepare(self, exp_or_node: Union[str, nodes.ExpNode], params: Sequence[str] = ()) -> PreparedExpression:
         """
-        parse and evaluate given expression, if the input is a node tree, evaluate it directly
+        compile given expression or node tree with free parameters, which are given values when the result is called
         """
 
         if isinstance(exp_or_node, nodes.ExpNode):
             exp_tree = exp_or_node
         else:
-            exp_tree = parser.parse_expression(exp_or_node)
+            exp_tree = parser.parse_expression(exp_or_node, self.parse_cache)
+
+        return PreparedExpression(exp_tree, self._context, params)
+
+    def evaluate_vectorized(self, exp_or_node: Union[str, nodes.ExpNode], variables: Dict[str, typing.Any],
+            vector_functions: Dict[str, Callable[..., typing.Any]] = None):
+        """
+        evaluate given expression over arrays of variable values with numpy, failed elements are NaN,
+        see `calculator.core.vectorized.evaluate_vectorized`
+        """
+
+        if isinstance(exp_or_node, nodes.ExpNode):
+            exp_tree = exp_or_node
+        else:
+            exp_tree = parser.parse_expression(exp_or_node, self.parse_cache)
+
+        return evaluate_vectorized(exp_tree, self._context, variables, vector_functions)
+
+    def assemble(self, exp_or_node: Union[str, nodes.ExpNode]) -> vm.Program:
+        """
+        convert given expression or node tree into a program, which can be passed to `evaluate` repeatedly
+        """
+
+        if isinstance(exp_or_node, nodes.ExpNode):
+            exp_tree = exp_or_node
+        else:
+            exp_tree = parser.parse_expression(exp_or_node, self.parse_cache)
+
+        return vm.assemble(exp_tree)
+
+    @metrics.timed(EVALUATE_SECONDS, EVALUATE_ERRORS)
+    def evaluate_flat(self, ast: flat.FlatAST, index: int, meter: BudgetMeter = None) -> TypeEvalResult:
+        """
+        evaluate an expression stored in a flat AST, without creating node objects unless the evaluation
+        is budgeted, in which case the expression is converted and run on the VM engine
+        """
+
+        if meter is None and self.budget is not None:
+            meter = self.budget.start()
+
+        if meter is not None:
+            return vm.execute(vm.assemble(ast.to_node(index)), self._context, meter)
+        else:
+            return flat.evaluate_flat(ast, index, self._context)
+
+    @metrics.timed(EVALUATE_SECONDS, EVALUATE_ERRORS)
+    def evaluate(self, exp_or_node: Union[str, nodes.ExpNode, vm.Program], meter: BudgetMeter = None) -> TypeEvalResult:
+        """
+        parse and evaluate given expression, if the input is a node tree or an assembled program, evaluate it directly
+
+        :param meter: meter used instead of starting one from `budget`, keeping a reference to the meter
+            allows to cancel the evaluation from another thread
+        """
+
+        if meter is None and self.budget is not None:
+            meter = self.budget.start()
+
+        if isinstance(exp_or_node, vm.Program):
+            return vm.execute(exp_or_node, self._context, meter)
+        elif isinstance(exp_or_node, nodes.ExpNode):
+            exp_tree = exp_or_node
+        else:
+            exp_tree = parser.parse_expression(exp_or_node, self.parse_cache)
+
+        if self.engine == ENGINE_VM or meter is not None:
+            return vm.execute(vm.assemble(exp_tree), self._context, meter)
+        elif self.tracer is not None:
+            return evaluate_traced(exp_tree, self._context, self.tracer)
+        elif self.memo is not None:
+            return evaluate_memoized(exp_tree, self._context, self.memo)
 
-        return self._eval_node(exp_tree)
+        # errors raised by operators and functions are translated once at the top level
+        try:
+            return self._eval_node(exp_tree)
+        except ZeroDivisionError as err:
+            raise EvaluationException("zero division", inner=err)
+        except ValueError as err:
+            raise EvaluationException("value error", inner=err)
@@ -1,4 +1,4 @@
-__all__ = ['ParsingException']
+__all__ = ['ParsingException', 'EvaluationException', 'BudgetExceededException']
 
 class ParsingException(Exception):
     """
@@ -19,3 +19,25 @@ class EvaluationException(Exception):
         super().__init__(msg)
 
         self.inner = inner
+
+    def __reduce__(self):
+        # keep inner exception when sent across processes
+        return (self.__class__, (self.args[0], self.inner))
+
+class BudgetExceededException(EvaluationException):
+    """
+    error for evaluation aborted because it exceeds its budget
+    """
+
+    def __init__(self, msg: str, limit: str):
+        """
+        :param limit: name of the exceeded limit, one of 'digits', 'operations' and 'timeout',
+            or 'cancelled' when the evaluation is cancelled
+        """
+
+        super().__init__(msg)
+
+        self.limit = limit
+
+    def __reduce__(self):
+        return (self.__class__, (self.args[0], self.limit))
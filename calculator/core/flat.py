@@ -0,0 +1,408 @@
+import typing
+from array import array
+from typing import List, Union, Optional
+
+import calculator.core.parser as parser
+import calculator.core.nodes as nodes
+from calculator.core.constants import BinaryOperators, UnaryOperators
+from calculator.core.operators import OP_FUNCTIONS_BINARY, OP_FUNCTIONS_UNARY
+from calculator.core.exception import EvaluationException
+
+if typing.TYPE_CHECKING:
+    from calculator.core.evaluator import EvaluatorContext
+
+
+__all__ = ['FlatAST', 'evaluate_flat']
+
+
+# node kinds
+KIND_NUMBER = 0
+KIND_NAME = 1
+KIND_BINARY = 2
+KIND_UNARY = 3
+KIND_CALL = 4
+
+# operator symbols indexed by op code, binary and unary operators have separate codes
+BINARY_OPS = (
+    BinaryOperators.OP_ADD, BinaryOperators.OP_MINUS, BinaryOperators.OP_MULTIPLY,
+    BinaryOperators.OP_DIVIDE, BinaryOperators.OP_POWER, BinaryOperators.OP_MOD
+)
+UNARY_OPS = (UnaryOperators.OP_NEGATIVE, UnaryOperators.OP_POSITIVE, UnaryOperators.OP_FACTORIAL)
+
+BINARY_OP_CODES = {op: code for (code, op) in enumerate(BINARY_OPS)}
+UNARY_OP_CODES = {op: code for (code, op) in enumerate(UNARY_OPS)}
+
+BINARY_FUNCTIONS = tuple(OP_FUNCTIONS_BINARY[op] for op in BINARY_OPS)
+UNARY_FUNCTIONS = tuple(OP_FUNCTIONS_UNARY[op] for op in UNARY_OPS)
+
+# (attribute, typecode) of each array column
+COLUMNS = (
+    ('kind', 'B'), ('op', 'B'), ('value', 'i'), ('left', 'i'), ('right', 'i'), ('pos', 'i'),
+    ('args', 'i'), ('roots', 'i')
+)
+
+
+class FlatAST(object):
+    """
+    structure-of-arrays storage of many expression trees, nodes are rows of parallel array columns
+    instead of objects, which takes a fraction of the memory of `ExpNode` trees
+
+    columns of each node:
+        kind    node kind
+        op      op code of operator nodes
+        value   index into `literals` for numbers, into `names` for constants and functions
+        left    left operand of binary nodes, operand of unary nodes, first item in `args` for calls
+        right   right operand of binary nodes, number of arguments for calls
+        pos     position in the expression
+
+    number literals and names are interned, expressions are identified by their index and evaluated
+    without creating node objects
+
+    columns of a read-only AST are views into an external buffer, see `calculator.core.serialization`
+    """
+
+    readonly = False
+
+    def __init__(self):
+        self.kind = array('B')
+        self.op = array('B')
+        self.value = array('i')
+        self.left = array('i')
+        self.right = array('i')
+        self.pos = array('i')
+
+        # child node indices of function calls
+        self.args = array('i')
+        # root node of each expression
+        self.roots = array('i')
+
+        self.literals = []
+        self.names = []
+        self._literal_index = {}
+        self._name_index = {}
+
+    def __len__(self):
+        return len(self.roots)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.readonly:
+            # views cannot be pickled, copies of read-only columns are stored and can be extended again
+            for (name, typecode) in COLUMNS:
+                state[name] = array(typecode, getattr(self, name))
+
+            state['_literal_index'] = {(num.__class__, num): i for (i, num) in enumerate(self.literals)}
+            state['_name_index'] = {name: i for (i, name) in enumerate(self.names)}
+            state['readonly'] = False
+
+        return state
+
+    @property
+    def node_count(self) -> int:
+        return len(self.kind)
+
+    def _columns(self) -> tuple:
+        return (self.kind, self.op, self.value, self.left, self.right, self.pos, self.args)
+
+    def intern_literal(self, num: Union[int, float]) -> int:
+        # numbers are keyed with their type, so that 1 and 1.0 are stored separately
+        key = (num.__class__, num)
+        index = self._literal_index.get(key)
+        if index is None:
+            index = len(self.literals)
+            self.literals.append(num)
+            self._literal_index[key] = index
+
+        return index
+
+    def intern_name(self, name: str) -> int:
+        index = self._name_index.get(name)
+        if index is None:
+            index = len(self.names)
+            self.names.append(name)
+            self._name_index[name] = index
+
+        return index
+
+    def add_node(self, kind: int, op: int, value: int, left: int, right: int, pos: int) -> int:
+        """
+        append a node row and return its index
+        """
+
+        index = len(self.kind)
+        self.kind.append(kind)
+        self.op.append(op)
+        self.value.append(value)
+        self.left.append(left)
+        self.right.append(right)
+        self.pos.append(pos)
+        return index
+
+    def add_call(self, name: str, args: List[int], pos: int) -> int:
+        """
+        append a function call node with row indices of its arguments
+        """
+
+        start = len(self.args)
+        self.args.extend(args)
+        return self.add_node(KIND_CALL, 0, self.intern_name(name), start, len(args), pos)
+
+    def _append_root(self, build) -> int:
+        if self.readonly:
+            raise TypeError("cannot modify a read-only flat AST")
+
+        # rows of a failed build are dropped, so that the columns only hold complete expressions
+        sizes = [len(c) for c in self._columns()]
+        try:
+            root = build()
+        except BaseException:
+            for (column, size) in zip(self._columns(), sizes):
+                del column[size:]
+            raise
+
+        self.roots.append(root)
+        return len(self.roots) - 1
+
+    def append(self, expression: str) -> int:
+        """
+        parse an expression directly into the columns, return index of the expression
+        """
+
+        token_list = parser.tokenize(expression)
+        return self._append_root(lambda: parser.build_expression_tree(token_list, emitter=_FlatEmitter(self)))
+
+    def append_node(self, root: nodes.ExpNode) -> int:
+        """
+        copy a node tree into the columns, return index of the expression
+        """
+
+        return self._append_root(lambda: self._add_tree(root))
+
+    def _add_tree(self, root: nodes.ExpNode) -> int:
+        # post-order traversal, row indices of converted children are collected on `results`
+        results = []
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            cls = node.__class__
+
+            if cls is nodes.NumberNode:
+                results.append(self.add_node(KIND_NUMBER, 0, self.intern_literal(node.num), -1, -1, node.pos))
+            elif cls is nodes.NameConstantNode:
+                results.append(self.add_node(KIND_NAME, 0, self.intern_name(node.name), -1, -1, node.pos))
+            elif not visited:
+                stack.append((node, True))
+                if cls is nodes.BinaryOpNode:
+                    stack.append((node.right, False))
+                    stack.append((node.left, False))
+                elif cls is nodes.UnaryOpNode:
+                    stack.append((node.child, False))
+                elif cls is nodes.FuncCallNode:
+                    for arg in reversed(node.args):
+                        stack.append((arg, False))
+                else:
+                    raise ValueError(f"unsupported node type {cls.__name__}")
+            elif cls is nodes.BinaryOpNode:
+                code = BINARY_OP_CODES.get(node.op)
+                if code is None:
+                    raise ValueError(f"unsupported binary operator '{node.op}'")
+
+                right = results.pop()
+                left = results.pop()
+                results.append(self.add_node(KIND_BINARY, code, -1, left, right, node.pos))
+            elif cls is nodes.UnaryOpNode:
+                code = UNARY_OP_CODES.get(node.op)
+                if code is None:
+                    raise ValueError(f"unsupported unary operator '{node.op}'")
+
+                results.append(self.add_node(KIND_UNARY, code, -1, results.pop(), -1, node.pos))
+            else:
+                argc = len(node.args)
+                args = results[len(results) - argc:]
+                del results[len(results) - argc:]
+                results.append(self.add_call(node.id, args, node.pos))
+
+        return results[0]
+
+    def to_node(self, index: int) -> nodes.ExpNode:
+        """
+        convert an expression back into a node tree
+        """
+
+        kinds = self.kind
+        results = []
+        stack = [(self.roots[index], False)]
+        while stack:
+            i, visited = stack.pop()
+            kind = kinds[i]
+
+            if kind == KIND_NUMBER:
+                results.append(nodes.NumberNode(self.literals[self.value[i]], pos=self.pos[i]))
+            elif kind == KIND_NAME:
+                results.append(nodes.NameConstantNode(self.names[self.value[i]], pos=self.pos[i]))
+            elif not visited:
+                stack.append((i, True))
+                for child in reversed(self.children(i)):
+                    stack.append((child, False))
+            elif kind == KIND_BINARY:
+                right = results.pop()
+                left = results.pop()
+                results.append(nodes.BinaryOpNode(BINARY_OPS[self.op[i]], left, right, pos=self.pos[i]))
+            elif kind == KIND_UNARY:
+                results.append(nodes.UnaryOpNode(UNARY_OPS[self.op[i]], results.pop(), pos=self.pos[i]))
+            else:
+                argc = self.right[i]
+                args = results[len(results) - argc:]
+                del results[len(results) - argc:]
+                results.append(nodes.FuncCallNode(self.names[self.value[i]], args, pos=self.pos[i]))
+
+        return results[0]
+
+    def children(self, i: int) -> List[int]:
+        """
+        get row indices of child nodes of a node
+        """
+
+        kind = self.kind[i]
+        if kind == KIND_BINARY:
+            return [self.left[i], self.right[i]]
+        elif kind == KIND_UNARY:
+            return [self.left[i]]
+        elif kind == KIND_CALL:
+            start = self.left[i]
+            return list(self.args[start : start + self.right[i]])
+        else:
+            return []
+
+class _FlatEmitter(object):
+    """
+    emitter of the tree builder writing nodes into the columns of a flat AST, handles are row indices
+    """
+
+    def __init__(self, ast: FlatAST):
+        self._ast = ast
+
+    def number(self, num: Union[int, float], pos: int) -> int:
+        ast = self._ast
+        return ast.add_node(KIND_NUMBER, 0, ast.intern_literal(num), -1, -1, pos)
+
+    def name(self, name: str, pos: int) -> int:
+        ast = self._ast
+        return ast.add_node(KIND_NAME, 0, ast.intern_name(name), -1, -1, pos)
+
+    def unary(self, op: str, child: int, pos: int) -> int:
+        return self._ast.add_node(KIND_UNARY, UNARY_OP_CODES[op], -1, child, -1, pos)
+
+    def binary(self, op: str, left: int, right: int, pos: int) -> int:
+        return self._ast.add_node(KIND_BINARY, BINARY_OP_CODES[op], -1, left, right, pos)
+
+    def call(self, name: str, args: List[int], pos: int) -> int:
+        return self._ast.add_call(name, args, pos)
+
+    def binary_op(self, i: int) -> Optional[str]:
+        ast = self._ast
+        return BINARY_OPS[ast.op[i]] if ast.kind[i] == KIND_BINARY else None
+
+    def left(self, i: int) -> int:
+        return self._ast.left[i]
+
+    def set_left(self, i: int, left: int):
+        self._ast.left[i] = left
+
+    def unary_op(self, i: int) -> Optional[str]:
+        ast = self._ast
+        return UNARY_OPS[ast.op[i]] if ast.kind[i] == KIND_UNARY else None
+
+    def child(self, i: int) -> int:
+        return self._ast.left[i]
+
+    def set_child(self, i: int, child: int):
+        self._ast.left[i] = child
+
+def _check_call(context: 'EvaluatorContext', name: str, argc: int):
+    fun = context.functions.get(name, None)
+    if fun is None:
+        raise EvaluationException(f"unsupported function '{name}'")
+
+    signature = context.get_signature(name, fun)
+    if signature is None:
+        raise EvaluationException(f"cannot resolve signature of function '{name}'")
+    elif not signature.accepts(argc):
+        raise EvaluationException(f"incorrect number of arguments passed into function '{name}'")
+
+def _run(ast: FlatAST, index: int, context: 'EvaluatorContext') -> Union[int, float]:
+    kinds = ast.kind
+    ops = ast.op
+    values = ast.value
+    lefts = ast.left
+    rights = ast.right
+    args = ast.args
+    literals = ast.literals
+    names = ast.names
+    constants = context.constants
+    functions = context.functions
+
+    # rows are pushed as is when entered, and as their complement once their children are evaluated
+    results = []
+    stack = [ast.roots[index]]
+    while stack:
+        i = stack.pop()
+
+        if i >= 0:
+            kind = kinds[i]
+            if kind == KIND_NUMBER:
+                results.append(literals[values[i]])
+            elif kind == KIND_NAME:
+                name = names[values[i]]
+                if name in constants:
+                    results.append(constants[name])
+                else:
+                    raise EvaluationException(f"unknown constant '{name}'")
+            elif kind == KIND_BINARY:
+                stack.append(~i)
+                stack.append(rights[i])
+                stack.append(lefts[i])
+            elif kind == KIND_UNARY:
+                stack.append(~i)
+                stack.append(lefts[i])
+            else:
+                _check_call(context, names[values[i]], rights[i])
+                stack.append(~i)
+                start = lefts[i]
+                for k in range(start + rights[i] - 1, start - 1, -1):
+                    stack.append(args[k])
+        else:
+            i = ~i
+            kind = kinds[i]
+            if kind == KIND_BINARY:
+                right = results.pop()
+                result = BINARY_FUNCTIONS[ops[i]](results[-1], right)
+                if isinstance(result, complex):
+                    raise EvaluationException("invalid expression")
+
+                results[-1] = result
+            elif kind == KIND_UNARY:
+                results[-1] = UNARY_FUNCTIONS[ops[i]](results[-1])
+            else:
+                argc = rights[i]
+                fun = functions[names[values[i]]]
+                if argc == 0:
+                    results.append(fun())
+                else:
+                    call_args = results[len(results) - argc:]
+                    del results[len(results) - argc:]
+                    results.append(fun(*call_args))
+
+    return results[0]
+
+def evaluate_flat(ast: FlatAST, index: int, context: 'EvaluatorContext') -> Union[int, float]:
+    """
+    evaluate an expression of a flat AST like the tree walking engine, without creating node objects
+    """
+
+    try:
+        return _run(ast, index, context)
+    except ZeroDivisionError as err:
+        raise EvaluationException("zero division", inner=err)
+    except ValueError as err:
+        raise EvaluationException("value error", inner=err)
@@ -0,0 +1,49 @@
+import math
+from typing import Union
+
+from calculator.core.exception import EvaluationException
+
+
+__all__ = ['formatNumber', 'formatError']
+
+
+ZERO = '0'
+DOT = '.'
+
+
+def formatNumber(n: Union[float, int], maxPrecision: int, roundPrecision: int) -> str:
+    """
+    custom number formatting
+    """
+
+    if maxPrecision > 0:
+        exp = 10 ** maxPrecision
+        n = round(n * exp) / exp
+
+    if roundPrecision > 0:
+        nround = round(n, roundPrecision)
+        if math.isclose(nround, n, rel_tol=10**(-roundPrecision)):
+            n = nround
+
+    s = str(n)
+    if DOT in s:
+        s = s.rstrip(ZERO)
+        if s[-1] == DOT:
+            return s[:-1]
+        else:
+            return s
+    else:
+        return s
+
+def formatError(err: Exception) -> str:
+    """
+    short error text shown in place of a result
+    """
+
+    if isinstance(err, EvaluationException) and err.inner is not None:
+        if isinstance(err.inner, ZeroDivisionError):
+            return 'ERROR: Zero Division'
+        elif isinstance(err.inner, ValueError):
+            return 'ERROR: Invalid Input'
+
+    return 'ERROR'
@@ -0,0 +1,120 @@
+import math
+import functools
+
+from calculator.core.evaluator import EvaluatorContext
+
+try:
+    import numpy as np
+except ImportError:         # numpy is optional, only required by vectorized evaluation
+    np = None
+
+
+__all__ = ['standardLibrary', 'proLibrary', 'standardContext', 'proContext']
+
+
+# functions are defined at module level rather than as lambdas, so that contexts
+# can be pickled and sent to worker processes
+
+def invert(a):
+    return 1 / a
+
+def square(a):
+    return a * a
+
+def cube(a):
+    return a * a * a
+
+def sind(d):
+    return math.sin(math.radians(d))
+
+def cosd(d):
+    return math.cos(math.radians(d))
+
+def tand(d):
+    return math.tan(math.radians(d))
+
+# array forms used by vectorized evaluation, the arithmetic ones above work on arrays as they are
+
+def vector_sind(d):
+    return np.sin(np.radians(d))
+
+def vector_cosd(d):
+    return np.cos(np.radians(d))
+
+def vector_tand(d):
+    return np.tan(np.radians(d))
+
+
+STANDARD_FUNCTIONS = {
+    'invert': invert
+}
+
+PRO_FUNCTIONS = {
+    'sqrt': math.sqrt,
+    'square': square,
+    'cube': cube,
+    'degree': math.degrees,
+    'radians': math.radians,
+    'sin': math.sin,
+    'sind': sind,
+    'cos': math.cos,
+    'cosd': cosd,
+    'tan': math.tan,
+    'tand': tand,
+    'log': math.log10,
+    'exp': math.exp,
+    'abs': abs,
+    'floor': math.floor,
+    'ceil': math.ceil,
+    'invert': invert
+}
+
+VECTOR_FORMS = {
+    'invert': invert,
+    'square': square,
+    'cube': cube,
+    'sind': vector_sind,
+    'cosd': vector_cosd,
+    'tand': vector_tand
+}
+
+
+@functools.lru_cache(maxsize=None)
+def standardLibrary() -> EvaluatorContext:
+    """
+    get the shared frozen context holding functions of the standard calculator
+    """
+
+    context = EvaluatorContext()
+    for (name, fun) in STANDARD_FUNCTIONS.items():
+        context.register_function(name, fun, pure=True, vector=VECTOR_FORMS.get(name))
+
+    return context.freeze()
+
+@functools.lru_cache(maxsize=None)
+def proLibrary() -> EvaluatorContext:
+    """
+    get the shared frozen context holding functions of the scientific calculator
+    """
+
+    context = EvaluatorContext()
+    for (name, fun) in PRO_FUNCTIONS.items():
+        context.register_function(name, fun, pure=True, vector=VECTOR_FORMS.get(name))
+
+    # math.log doesn't expose its signature, give its arity explicitly
+    context.register_function('ln', math.log, arity=1, pure=True)
+    return context.freeze()
+
+def standardContext() -> EvaluatorContext:
+    """
+    create evaluation context of the standard calculator, layered on top of the shared library
+    """
+
+    return standardLibrary().derive()
+
+def proContext() -> EvaluatorContext:
+    """
+    create evaluation context of the scientific calculator, layered on top of the shared library
+    """
+
+    return proLibrary().derive()
@@ -0,0 +1,160 @@
+from typing import List, Tuple, Dict
+
+import calculator.core.nodes as nodes
+from calculator.core.constants import BinaryOperators
+
+
+__all__ = ['structural_hash', 'structurally_equal', 'subtree_hashes', 'leaf_structure_key']
+
+
+# operators whose operands can be swapped without changing the result, including float rounding
+COMMUTATIVE_OPERATORS = frozenset((BinaryOperators.OP_ADD, BinaryOperators.OP_MULTIPLY))
+
+TAG_NUMBER = 'N'
+TAG_NAME = 'C'
+TAG_BINARY = 'B'
+TAG_UNARY = 'U'
+TAG_CALL = 'F'
+
+
+def _leaf_hash(node: nodes.ExpNode) -> int:
+    cls = node.__class__
+    if cls is nodes.NumberNode:
+        # number type is part of the key, 1 and 1.0 give results of different types
+        return hash((TAG_NUMBER, node.num.__class__, node.num))
+    elif cls is nodes.NameConstantNode:
+        return hash((TAG_NAME, node.name))
+    else:
+        return hash(cls)
+
+def subtree_hashes(root: nodes.ExpNode) -> List[Tuple[nodes.ExpNode, int]]:
+    """
+    compute structural hashes of all nodes of a tree, return (node, hash) pairs in post-order
+    """
+
+    out = []
+    hashes = []
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        cls = node.__class__
+
+        if cls is nodes.BinaryOpNode:
+            if visited:
+                right = hashes.pop()
+                left = hashes.pop()
+                if node.op in COMMUTATIVE_OPERATORS and right < left:
+                    left, right = right, left
+
+                h = hash((TAG_BINARY, node.op, left, right))
+            else:
+                stack.append((node, True))
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+                continue
+        elif cls is nodes.UnaryOpNode:
+            if visited:
+                h = hash((TAG_UNARY, node.op, hashes.pop()))
+            else:
+                stack.append((node, True))
+                stack.append((node.child, False))
+                continue
+        elif cls is nodes.FuncCallNode:
+            if visited:
+                argc = len(node.args)
+                h = hash((TAG_CALL, node.id, *hashes[len(hashes) - argc:]))
+                del hashes[len(hashes) - argc:]
+            else:
+                stack.append((node, True))
+                for arg in reversed(node.args):
+                    stack.append((arg, False))
+                continue
+        else:
+            h = _leaf_hash(node)
+
+        hashes.append(h)
+        out.append((node, h))
+
+    return out
+
+def structural_hash(node: nodes.ExpNode) -> int:
+    """
+    hash of the structure of a tree, ignoring node positions
+
+    operands of `+` and `×` are ordered canonically, so `a + b` and `b + a` give the same hash.
+    other rewritings like re-association are not considered, as they may change float results.
+    the hash is built from `hash` of names, so like `hash` it is only stable within a process
+    """
+
+    return subtree_hashes(node)[-1][1]
+
+def leaf_structure_key(node: nodes.ExpNode) -> tuple:
+    """
+    canonical key of a leaf for numbering structures, equal keys are only given to equal leaves
+    """
+
+    if node.__class__ is nodes.NumberNode:
+        num = node.num
+        # floats are compared by their exact bits, so that 0.0 and -0.0 are different
+        return (TAG_NUMBER, num.__class__, num.hex() if num.__class__ is float else num)
+    elif node.__class__ is nodes.NameConstantNode:
+        return (TAG_NAME, node.name)
+    else:
+        return (node.__class__,)
+
+def _structure_id(root: nodes.ExpNode, table: Dict[tuple, int]) -> int:
+    """
+    number the structure of a tree, trees numbered with the same table get the same number
+    if and only if they are structurally equal
+    """
+
+    ids = []
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        cls = node.__class__
+
+        if cls is nodes.NumberNode or cls is nodes.NameConstantNode:
+            key = leaf_structure_key(node)
+        elif not visited:
+            stack.append((node, True))
+            if cls is nodes.BinaryOpNode:
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+            elif cls is nodes.UnaryOpNode:
+                stack.append((node.child, False))
+            elif cls is nodes.FuncCallNode:
+                for arg in reversed(node.args):
+                    stack.append((arg, False))
+            continue
+        elif cls is nodes.BinaryOpNode:
+            right = ids.pop()
+            left = ids.pop()
+            if node.op in COMMUTATIVE_OPERATORS and right < left:
+                left, right = right, left
+
+            key = (TAG_BINARY, node.op, left, right)
+        elif cls is nodes.UnaryOpNode:
+            key = (TAG_UNARY, node.op, ids.pop())
+        elif cls is nodes.FuncCallNode:
+            argc = len(node.args)
+            key = (TAG_CALL, node.id, *ids[len(ids) - argc:])
+            del ids[len(ids) - argc:]
+        else:
+            key = (cls,)
+
+        ids.append(table.setdefault(key, len(table)))
+
+    return ids[0]
+
+def structurally_equal(n1: nodes.ExpNode, n2: nodes.ExpNode) -> bool:
+    """
+    whether two trees have the same structure, with the same rules as `structural_hash`,
+    unlike hashes the comparison is exact
+    """
+
+    if n1 is n2:
+        return True
+
+    table = {}
+    return _structure_id(n1, table) == _structure_id(n2, table)
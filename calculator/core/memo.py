@@ -0,0 +1,307 @@
+import typing
+import weakref
+from typing import Collection, Union
+
+import calculator.core.nodes as nodes
+from calculator.core.operators import OP_FUNCTIONS_BINARY, OP_FUNCTIONS_UNARY
+from calculator.core.hashing import COMMUTATIVE_OPERATORS, TAG_BINARY, TAG_UNARY, TAG_CALL, leaf_structure_key
+from calculator.core.cache import LRUCache
+from calculator.core.exception import EvaluationException
+
+if typing.TYPE_CHECKING:
+    from calculator.core.evaluator import EvaluatorContext
+
+
+__all__ = ['SubtreeMemo', 'evaluate_memoized']
+
+
+# maximal pure subtrees with fewer nodes are evaluated rather than memoized, pure function calls are always memoized
+MIN_SUBTREE_SIZE = 8
+
+# number of structures the memo numbers before it starts over, as the table only grows
+MAX_STRUCTURES = 1 << 16
+
+
+class SubtreeMemo(LRUCache):
+    """
+    cache of subtree results shared across evaluations with one context. subtrees are numbered
+    through a table of their canonical structure, structurally equal subtrees get the same number,
+    so that a hit needs no further comparison
+
+    results of calls to pure functions are memoized, as well as the largest subtrees which call
+    no function other than pure ones. cached results depend on constants and functions of the context,
+    the memo is cleared once the context is modified or a different context is used
+    """
+
+    def __init__(self, maxsize: int = 1024, pure_functions: Collection[str] = None):
+        """
+        :param pure_functions: names of functions which always return the same result for the same arguments,
+            defaults to functions registered as pure in the context
+        """
+
+        super().__init__(maxsize)
+
+        self.pure_functions = frozenset(pure_functions) if pure_functions is not None else None
+        self._pure = self.pure_functions
+
+        self._context_ref = None
+        self._context_version = None
+
+        # canonical key -> structure number, numbers are not reused once the table starts over,
+        # so entries put by evaluations still using old numbers are never hit
+        self._structures = {}
+        self._first_id = 0
+
+        # tree -> {node id: structure number} of its memoized subtrees, trees are treated as read-only
+        self._trees = weakref.WeakKeyDictionary()
+
+    def bind(self, context: 'EvaluatorContext'):
+        """
+        prepare the memo for evaluation with the given context, clear entries computed with another
+        context or an older version of the same context
+        """
+
+        with self._lock:
+            owner = self._context_ref() if self._context_ref is not None else None
+            version = context.version
+            if owner is not context or version != self._context_version:
+                self._data.clear()
+                self._context_ref = weakref.ref(context)
+                self._context_version = version
+
+                if self.pure_functions is None:
+                    # purity of functions may have changed, subtrees are classified again
+                    self._pure = context.pure_functions()
+                    self._trees.clear()
+
+    def __reduce__(self):
+        return (self.__class__, (self.maxsize, self.pure_functions))
+
+    def pure_subtrees(self, root: nodes.ExpNode) -> dict:
+        """
+        get structure numbers of the memoized subtrees of a tree keyed by node id, computed once per tree
+        """
+
+        with self._lock:
+            result = self._trees.get(root)
+            if result is None:
+                if len(self._structures) > MAX_STRUCTURES:
+                    self._first_id += len(self._structures)
+                    self._structures = {}
+                    self._data.clear()
+                    self._trees.clear()
+
+                result = self._select(root)
+                self._trees[root] = result
+
+        return result
+
+    def _select(self, root: nodes.ExpNode) -> dict:
+        """
+        number the structures of all nodes of a tree like `structurally_equal`, and pick the subtrees to memoize
+        """
+
+        table = self._structures
+        first_id = self._first_id
+        pure_functions = self._pure
+
+        result = {}
+        # structure numbers, purity and node counts of subtrees whose parent is not visited yet
+        ids = []
+        flags = []
+        sizes = []
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            cls = node.__class__
+
+            if cls is nodes.NumberNode or cls is nodes.NameConstantNode:
+                # leaves are cheap to evaluate, they are never looked up
+                ids.append(table.setdefault(leaf_structure_key(node), first_id + len(table)))
+                flags.append(True)
+                sizes.append(1)
+                continue
+            elif not visited:
+                stack.append((node, True))
+                if cls is nodes.BinaryOpNode:
+                    stack.append((node.right, False))
+                    stack.append((node.left, False))
+                elif cls is nodes.UnaryOpNode:
+                    stack.append((node.child, False))
+                elif cls is nodes.FuncCallNode:
+                    for arg in reversed(node.args):
+                        stack.append((arg, False))
+                continue
+
+            if cls is nodes.BinaryOpNode:
+                right = ids.pop()
+                left = ids.pop()
+                right_pure = flags.pop()
+                left_pure = flags.pop()
+                right_size = sizes.pop()
+                left_size = sizes.pop()
+
+                pure = left_pure and right_pure
+                if not pure:
+                    # pure operands are the largest pure subtrees containing them
+                    if left_pure and left_size >= MIN_SUBTREE_SIZE:
+                        result[id(node.left)] = left
+                    if right_pure and right_size >= MIN_SUBTREE_SIZE:
+                        result[id(node.right)] = right
+
+                if node.op in COMMUTATIVE_OPERATORS and right < left:
+                    left, right = right, left
+
+                key = (TAG_BINARY, node.op, left, right)
+                size = left_size + right_size + 1
+            elif cls is nodes.UnaryOpNode:
+                key = (TAG_UNARY, node.op, ids.pop())
+                pure = flags.pop()
+                size = sizes.pop() + 1
+            elif cls is nodes.FuncCallNode:
+                argc = len(node.args)
+                arg_ids = ids[len(ids) - argc:]
+                arg_flags = flags[len(flags) - argc:]
+                arg_sizes = sizes[len(sizes) - argc:]
+                del ids[len(ids) - argc:], flags[len(flags) - argc:], sizes[len(sizes) - argc:]
+
+                pure = node.id in pure_functions and all(arg_flags)
+                if not pure:
+                    for (arg, arg_id, arg_pure, arg_size) in zip(node.args, arg_ids, arg_flags, arg_sizes):
+                        if arg_pure and arg_size >= MIN_SUBTREE_SIZE:
+                            result[id(arg)] = arg_id
+
+                key = (TAG_CALL, node.id, *arg_ids)
+                size = sum(arg_sizes) + 1
+            else:
+                key = leaf_structure_key(node)
+                pure = False
+                size = 1
+
+            sid = table.setdefault(key, first_id + len(table))
+            if pure and cls is nodes.FuncCallNode:
+                # calls of pure functions are memoized whatever their size
+                result[id(node)] = sid
+
+            ids.append(sid)
+            flags.append(pure)
+            sizes.append(size)
+
+        if flags[0] and sizes[0] >= MIN_SUBTREE_SIZE:
+            result[id(root)] = ids[0]
+
+        return result
+
+class _MemoEvaluator(object):
+    """
+    tree walking evaluation that looks up pure subtrees in the memo before evaluating them
+    """
+
+    def __init__(self, context: 'EvaluatorContext', memo: SubtreeMemo):
+        self._context = context
+        self._memo = memo
+
+    def _leaf(self, node: nodes.ExpNode) -> Union[int, float]:
+        if node.__class__ is nodes.NumberNode:
+            return node.num
+        elif node.__class__ is nodes.NameConstantNode:
+            if node.name in self._context.constants:
+                return self._context.constants[node.name]
+            else:
+                raise EvaluationException(f"unknown constant '{node.name}'")
+        else:
+            raise EvaluationException("invalid inputs")
+
+    def _check_call(self, node: nodes.FuncCallNode):
+        fun = self._context.functions.get(node.id, None)
+        if fun is None:
+            raise EvaluationException(f"unsupported function '{node.id}'")
+
+        signature = self._context.get_signature(node.id, fun)
+        if signature is None:
+            raise EvaluationException(f"cannot resolve signature of function '{node.id}'")
+        elif not signature.accepts(len(node.args)):
+            raise EvaluationException(f"incorrect number of arguments passed into function '{node.id}'")
+
+        return fun
+
+    def run(self, root: nodes.ExpNode) -> Union[int, float]:
+        memo = self._memo
+        pure = memo.pure_subtrees(root)
+
+        results = []
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            cls = node.__class__
+
+            if cls is nodes.NumberNode or cls is nodes.NameConstantNode:
+                results.append(self._leaf(node))
+                continue
+
+            key = pure.get(id(node))
+            if not visited and key is not None:
+                value = memo.get(key)
+                if value is not None:
+                    results.append(value)
+                    continue
+
+            if cls is nodes.BinaryOpNode:
+                fun = OP_FUNCTIONS_BINARY.get(node.op)
+                if fun is None:
+                    raise EvaluationException(f"unsupported binary operator '{node.op}'")
+                elif visited:
+                    right = results.pop()
+                    value = fun(results.pop(), right)
+                    if isinstance(value, complex):
+                        raise EvaluationException("invalid expression")
+                else:
+                    stack.append((node, True))
+                    stack.append((node.right, False))
+                    stack.append((node.left, False))
+                    continue
+            elif cls is nodes.UnaryOpNode:
+                fun = OP_FUNCTIONS_UNARY.get(node.op)
+                if fun is None:
+                    raise EvaluationException(f"unsupported unary operator '{node.op}'")
+                elif visited:
+                    value = fun(results.pop())
+                else:
+                    stack.append((node, True))
+                    stack.append((node.child, False))
+                    continue
+            elif cls is nodes.FuncCallNode:
+                if visited:
+                    argc = len(node.args)
+                    args = results[len(results) - argc:]
+                    del results[len(results) - argc:]
+                    value = self._context.functions[node.id](*args)
+                else:
+                    self._check_call(node)
+                    stack.append((node, True))
+                    for arg in reversed(node.args):
+                        stack.append((arg, False))
+                    continue
+            else:
+                raise EvaluationException("invalid inputs")
+
+            if key is not None and value is not None:
+                memo.put(key, value)
+
+            results.append(value)
+
+        return results[0]
+
+def evaluate_memoized(node: nodes.ExpNode, context: 'EvaluatorContext', memo: SubtreeMemo) -> Union[int, float]:
+    """
+    evaluate a tree like the tree walking engine, reusing results of pure subtrees from the memo
+    """
+
+    memo.bind(context)
+
+    try:
+        return _MemoEvaluator(context, memo).run(node)
+    except ZeroDivisionError as err:
+        raise EvaluationException("zero division", inner=err)
+    except ValueError as err:
+        raise EvaluationException("value error", inner=err)
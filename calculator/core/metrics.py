@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import bisect
+import functools
+import threading
+from typing import Sequence, Callable, Any, Dict, Optional
+
+
+__all__ = ['Counter', 'Histogram', 'MetricsRegistry', 'REGISTRY', 'DEFAULT_BUCKETS', 'timed']
+
+
+# upper bounds of histogram buckets in seconds, from 10 microseconds to 10 seconds
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+class Counter(object):
+    """
+    monotonically increasing count
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        return self._value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def reset(self):
+        with self._lock:
+            self._value = 0
+
+    def snapshot(self) -> dict:
+        return {'type': self.kind, 'description': self.description, 'value': self._value}
+
+    def prometheus_lines(self) -> list:
+        return [f'{self.name} {self._value}']
+
+class Histogram(object):
+    """
+    distribution of observed values over fixed buckets
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        :param buckets: sorted upper bounds of buckets, values above the last bound are only counted in total
+        """
+
+        if list(buckets) != sorted(buckets):
+            raise ValueError("buckets must be sorted")
+
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def observe(self, value: float):
+        # bucket counts are stored per bucket, and accumulated when exported
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def cumulative_counts(self) -> list:
+        """
+        get count of values less or equal to each bucket bound, the last item counts all values
+        """
+
+        with self._lock:
+            counts = list(self._counts)
+
+        for i in range(1, len(counts)):
+            counts[i] += counts[i - 1]
+
+        return counts
+
+    def snapshot(self) -> dict:
+        counts = self.cumulative_counts()
+        return {
+            'type': self.kind,
+            'description': self.description,
+            'buckets': [[bound, c] for (bound, c) in zip(self.buckets, counts)],
+            'count': counts[-1],
+            'sum': self._sum
+        }
+
+    def prometheus_lines(self) -> list:
+        counts = self.cumulative_counts()
+        lines = [f'{self.name}_bucket{{le="{bound!r}"}} {c}' for (bound, c) in zip(self.buckets, counts)]
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {counts[-1]}')
+        lines.append(f'{self.name}_sum {self._sum!r}')
+        lines.append(f'{self.name}_count {counts[-1]}')
+        return lines
+
+class MetricsRegistry(object):
+    """
+    named collection of metrics, instrumented code only records values while the registry is enabled
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, name: str, factory: Callable[[], Any], kind: str):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            elif metric.kind != kind:
+                raise ValueError(f"metric '{name}' is already registered as a {metric.kind}")
+
+            return metric
+
+    def counter(self, name: str, description: str) -> Counter:
+        """
+        get the counter of given name, create it when missing
+        """
+
+        return self._get_or_create(name, lambda: Counter(name, description), Counter.kind)
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """
+        get the histogram of given name, create it when missing
+        """
+
+        return self._get_or_create(name, lambda: Histogram(name, description, buckets), Histogram.kind)
+
+    def get(self, name: str) -> Optional[Any]:
+        return self._metrics.get(name)
+
+    def reset(self):
+        """
+        reset values of all metrics, registered metrics are kept
+        """
+
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        get current values of all metrics as JSON-compatible data keyed by metric name
+        """
+
+        return {name: metric.snapshot() for (name, metric) in sorted(self._metrics.items())}
+
+    def to_prometheus(self) -> str:
+        """
+        render all metrics in Prometheus text exposition format
+        """
+
+        lines = []
+        for (name, metric) in sorted(self._metrics.items()):
+            lines.append(f'# HELP {name} {metric.description}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            lines.extend(metric.prometheus_lines())
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str, fmt: str = None):
+        """
+        write current values of all metrics into a file, the file is replaced atomically so that
+        collectors never read a partial file
+
+        :param fmt: either 'prometheus' or 'json', guessed from the file extension when omitted
+        """
+
+        if fmt is None:
+            fmt = 'json' if path.endswith('.json') else 'prometheus'
+
+        if fmt == 'json':
+            content = json.dumps(self.snapshot(), indent=2)
+        elif fmt == 'prometheus':
+            content = self.to_prometheus()
+        else:
+            raise ValueError(f"unknown metrics format '{fmt}'")
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+        os.replace(tmp_path, path)
+
+# process-wide registry used by the calculator, disabled by default
+REGISTRY = MetricsRegistry()
+
+
+def timed(histogram: Histogram, errors: Counter = None, registry: MetricsRegistry = REGISTRY):
+    """
+    decorator recording duration of each call of a function into the histogram while the registry is enabled,
+    a disabled registry costs a single attribute check per call
+
+    :param errors: counter of calls that raised an exception
+    """
+
+    perf_counter = time.perf_counter
+
+    def decorator(fun):
+        @functools.wraps(fun)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return fun(*args, **kwargs)
+
+            start = perf_counter()
+            try:
+                return fun(*args, **kwargs)
+            except BaseException:
+                if errors is not None:
+                    errors.inc()
+                raise
+            finally:
+                histogram.observe(perf_counter() - start)
+
+        return wrapper
+
+    return decorator
@@ -6,8 +6,13 @@ __all__ = ['ExpNode', 'BinaryOpNode', 'UnaryOpNode', 'NumberNode', 'NameConstant
 class ExpNode(object):
     """
     base class for all type of expression nodes
+
+    nodes are slot-based to keep cached trees small, `__weakref__` is kept so that trees can be
+    keys of weak mappings
     """
 
+    __slots__ = ('pos', '__weakref__')
+
     def __init__(self, pos=0):
         self.pos = pos
 
@@ -19,6 +24,8 @@ class BinaryOpNode(ExpNode):
     node for binary operation like '*', '+', etc
     """
 
+    __slots__ = ('op', 'left', 'right')
+
     def __init__(self, op: str, left: ExpNode, right: ExpNode, pos=0):
         super().__init__(pos=pos)
 
@@ -34,6 +41,8 @@ class UnaryOpNode(ExpNode):
     node for unary operation like '+', '-'
     """
 
+    __slots__ = ('op', 'child')
+
     def __init__(self, op: str, child: ExpNode, pos=0):
         super().__init__(pos=pos)
 
@@ -48,6 +57,8 @@ class NumberNode(ExpNode):
     node for a number literal
     """
 
+    __slots__ = ('num',)
+
     def __init__(self, num: Union[int, float], pos=0):
         super().__init__(pos=pos)
 
@@ -61,6 +72,8 @@ class NameConstantNode(ExpNode):
     node for a constant name, like 'e'
     """
 
+    __slots__ = ('name',)
+
     def __init__(self, name: str, pos=0):
         super().__init__(pos=pos)
 
@@ -74,6 +87,8 @@ class FuncCallNode(ExpNode):
     node for function invocation
     """
 
+    __slots__ = ('id', 'args')
+
     def __init__(self, id_: str, args: List[ExpNode], pos=0):
         super().__init__(pos=pos)
 
@@ -81,5 +96,5 @@ class FuncCallNode(ExpNode):
         self.args = args
 
     def __str__(self):
-        arg = ', '.join(str(a) for a in self.args)
+        args = ', '.join(str(a) for a in self.args)
         return f'FuncCall({self.id}, args=[{args}])'
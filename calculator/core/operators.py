@@ -0,0 +1,23 @@
+import math
+import operator
+
+from calculator.core.constants import BinaryOperators, UnaryOperators
+
+
+__all__ = ['OP_FUNCTIONS_BINARY', 'OP_FUNCTIONS_UNARY']
+
+
+OP_FUNCTIONS_BINARY = {
+    BinaryOperators.OP_ADD: operator.add,
+    BinaryOperators.OP_MINUS: operator.sub,
+    BinaryOperators.OP_MULTIPLY: operator.mul,
+    BinaryOperators.OP_DIVIDE: operator.truediv,
+    BinaryOperators.OP_POWER: operator.pow,
+    BinaryOperators.OP_MOD: operator.mod
+}
+
+OP_FUNCTIONS_UNARY = {
+    UnaryOperators.OP_POSITIVE: operator.pos,
+    UnaryOperators.OP_NEGATIVE: operator.neg,
+    UnaryOperators.OP_FACTORIAL: math.factorial
+}
@@ -0,0 +1,215 @@
+import typing
+from typing import Collection, List, Optional
+
+import calculator.core.nodes as nodes
+from calculator.core.constants import BinaryOperators, UnaryOperators
+from calculator.core.operators import OP_FUNCTIONS_BINARY, OP_FUNCTIONS_UNARY
+from calculator.core.budget import (EvaluationBudget, estimate_power_digits, estimate_product_digits,
+    estimate_factorial_digits)
+
+if typing.TYPE_CHECKING:
+    from calculator.core.evaluator import EvaluatorContext
+
+
+__all__ = ['optimize']
+
+
+def _is_int_literal(node: nodes.ExpNode, value: int) -> bool:
+    # only int literals are used for identities, float ones may change the result type
+    return node.__class__ is nodes.NumberNode and node.num.__class__ is int and node.num == value
+
+def _is_real(node: nodes.ExpNode) -> bool:
+    """
+    whether the node is guaranteed not to evaluate into a complex number,
+    identities dropping a binary operation are only safe on such nodes since
+    binary operations reject complex results
+    """
+
+    while node.__class__ is nodes.UnaryOpNode and node.op != UnaryOperators.OP_FACTORIAL:
+        node = node.child
+
+    return node.__class__ is not nodes.FuncCallNode
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float))
+
+class _Optimizer(object):
+    """
+    bottom-up rewriting of expression trees, the input tree is never modified
+    """
+
+    def __init__(self, context: 'EvaluatorContext', pure_functions: Collection[str], strength_reduce: bool,
+            max_digits: Optional[int]):
+        self._context = context
+        self._pure_functions = frozenset(pure_functions)
+        self._strength_reduce = strength_reduce
+        self._max_digits = max_digits
+
+    def _too_large(self, digits: Optional[float]) -> bool:
+        return digits is not None and self._max_digits is not None and digits > self._max_digits
+
+    def _fold(self, node: nodes.ExpNode, fun, *args) -> Optional[nodes.NumberNode]:
+        """
+        compute value of a node with constant operands, return None when the computation fails,
+        in which case the node is kept so that the error is raised during evaluation
+        """
+
+        try:
+            value = fun(*args)
+        except Exception:
+            return None
+
+        if _is_number(value):
+            return nodes.NumberNode(value, pos=node.pos)
+        else:
+            return None
+
+    def _estimate_digits(self, op: str, a, b) -> Optional[float]:
+        if op == BinaryOperators.OP_POWER:
+            return estimate_power_digits(a, b)
+        elif op == BinaryOperators.OP_MULTIPLY:
+            return estimate_product_digits(a, b)
+        else:
+            return None
+
+    def _leaf(self, node: nodes.ExpNode) -> nodes.ExpNode:
+        if node.__class__ is nodes.NameConstantNode:
+            constants = self._context.constants
+            if node.name in constants and _is_number(constants[node.name]):
+                return nodes.NumberNode(constants[node.name], pos=node.pos)
+
+        return node
+
+    def _unary(self, node: nodes.UnaryOpNode, child: nodes.ExpNode) -> nodes.ExpNode:
+        fun = OP_FUNCTIONS_UNARY.get(node.op)
+        if fun is not None:
+            if (child.__class__ is nodes.NumberNode and not (node.op == UnaryOperators.OP_FACTORIAL
+                    and self._too_large(estimate_factorial_digits(child.num)))):
+                folded = self._fold(node, fun, child.num)
+                if folded is not None:
+                    return folded
+
+            if node.op == UnaryOperators.OP_POSITIVE:
+                # +x -> x
+                return child
+            elif (node.op == UnaryOperators.OP_NEGATIVE and child.__class__ is nodes.UnaryOpNode
+                    and child.op == UnaryOperators.OP_NEGATIVE):
+                # -(-x) -> x
+                return child.child
+
+        if child is node.child:
+            return node
+        else:
+            return nodes.UnaryOpNode(node.op, child, pos=node.pos)
+
+    def _binary(self, node: nodes.BinaryOpNode, left: nodes.ExpNode, right: nodes.ExpNode) -> nodes.ExpNode:
+        op = node.op
+        fun = OP_FUNCTIONS_BINARY.get(op)
+        if fun is not None:
+            if (left.__class__ is nodes.NumberNode and right.__class__ is nodes.NumberNode
+                    and not self._too_large(self._estimate_digits(op, left.num, right.num))):
+                folded = self._fold(node, fun, left.num, right.num)
+                if folded is not None:
+                    return folded
+
+            # x + 0 is not rewritten, as -0.0 + 0 gives 0.0
+            if op == BinaryOperators.OP_MINUS:
+                # x - 0 -> x
+                if _is_int_literal(right, 0) and _is_real(left):
+                    return left
+            elif op == BinaryOperators.OP_MULTIPLY:
+                # x × 1 -> x, 1 × x -> x
+                if _is_int_literal(right, 1) and _is_real(left):
+                    return left
+                elif _is_int_literal(left, 1) and _is_real(right):
+                    return right
+            elif op == BinaryOperators.OP_POWER:
+                # x ^ 1 -> x
+                if _is_int_literal(right, 1) and _is_real(left):
+                    return left
+                elif (self._strength_reduce and _is_int_literal(right, 2)
+                        and left.__class__ is nodes.NameConstantNode):
+                    # x ^ 2 -> x × x, only for names so that no work is duplicated
+                    return nodes.BinaryOpNode(BinaryOperators.OP_MULTIPLY, left, left, pos=node.pos)
+
+        if left is node.left and right is node.right:
+            return node
+        else:
+            return nodes.BinaryOpNode(op, left, right, pos=node.pos)
+
+    def _func_call(self, node: nodes.FuncCallNode, args: List[nodes.ExpNode]) -> nodes.ExpNode:
+        if node.id in self._pure_functions and all(a.__class__ is nodes.NumberNode for a in args):
+            fun = self._context.functions.get(node.id)
+            if fun is not None:
+                signature = self._context.get_signature(node.id, fun)
+                if signature is not None and signature.accepts(len(args)):
+                    folded = self._fold(node, fun, *[a.num for a in args])
+                    if folded is not None:
+                        return folded
+
+        if all(a is b for (a, b) in zip(args, node.args)):
+            return node
+        else:
+            return nodes.FuncCallNode(node.id, args, pos=node.pos)
+
+    def run(self, root: nodes.ExpNode) -> nodes.ExpNode:
+        # post-order traversal with explicit stacks, rewritten children are collected on `results`
+        results = []
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            cls = node.__class__
+
+            if cls is nodes.BinaryOpNode:
+                if visited:
+                    right = results.pop()
+                    left = results.pop()
+                    results.append(self._binary(node, left, right))
+                else:
+                    stack.append((node, True))
+                    stack.append((node.right, False))
+                    stack.append((node.left, False))
+            elif cls is nodes.UnaryOpNode:
+                if visited:
+                    results.append(self._unary(node, results.pop()))
+                else:
+                    stack.append((node, True))
+                    stack.append((node.child, False))
+            elif cls is nodes.FuncCallNode:
+                if visited:
+                    argc = len(node.args)
+                    args = results[len(results) - argc:]
+                    del results[len(results) - argc:]
+                    results.append(self._func_call(node, args))
+                else:
+                    stack.append((node, True))
+                    for arg in reversed(node.args):
+                        stack.append((arg, False))
+            else:
+                results.append(self._leaf(node))
+
+        return results[0]
+
+def optimize(node: nodes.ExpNode, context: 'EvaluatorContext', pure_functions: Collection[str] = None,
+        strength_reduce: bool = False, budget: EvaluationBudget = None) -> nodes.ExpNode:
+    """
+    fold constant subtrees and apply safe algebraic identities, return a new tree
+
+    named constants are replaced by their values in the context, so the result is bound to the
+    current state of the context. subtrees whose evaluation fails are kept as-is, so that
+    evaluating the optimized tree raises the same errors as the original one
+
+    :param pure_functions: names of functions which always return the same result for the same
+        arguments, calls to them with constant arguments are folded. defaults to functions registered
+        as pure in the context
+    :param strength_reduce: rewrite `x ^ 2` into `x × x` for names, note that for huge floats the
+        multiplication gives `inf` where the power raises an overflow error
+    :param budget: operations whose result would exceed `max_digits` of the budget are not folded,
+        so that they are rejected during evaluation instead of computed here
+    """
+
+    max_digits = budget.max_digits if budget is not None else None
+    if pure_functions is None:
+        pure_functions = context.pure_functions()
+
+    return _Optimizer(context, pure_functions, strength_reduce, max_digits).run(node)
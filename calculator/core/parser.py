@@ -1,16 +1,23 @@
 import inspect
-from typing import List, Tuple, Sequence
+from typing import List, Tuple, Sequence, Dict, Optional
 
 import calculator.core.tokens as tokens
 import calculator.core.nodes as nodes
+import calculator.core.metrics as metrics
 from calculator.core.constants import BinaryOperators, UnaryOperators, OperatorAffix, Separators, MATH_CONSTANTS
 from calculator.core.structs import OperatorInfo
 from calculator.core.exception import ParsingException
+from calculator.core.cache import ParseCache
 
 
 NAME_CHAR_SPECIALS = frozenset(['π', '_'])
 VALID_SEPARATORS = frozenset([Separators.SEP_COMMA])
 
+TOKENIZE_SECONDS = metrics.REGISTRY.histogram('calculator_tokenize_seconds', 'time spent converting expressions into tokens')
+TOKENIZE_ERRORS = metrics.REGISTRY.counter('calculator_tokenize_errors_total', 'expressions rejected by the tokenizer')
+BUILD_TREE_SECONDS = metrics.REGISTRY.histogram('calculator_build_tree_seconds', 'time spent building expression trees')
+BUILD_TREE_ERRORS = metrics.REGISTRY.counter('calculator_build_tree_errors_total', 'token lists rejected by the tree builder')
+
 BINOP_TABLE = {
     BinaryOperators.OP_ADD: OperatorInfo(BinaryOperators.OP_ADD, 5),
     BinaryOperators.OP_MINUS: OperatorInfo(BinaryOperators.OP_MINUS, 5),
@@ -27,9 +34,183 @@ UNARYOP_TABLE = {
 }
 
 
-def tokenize(exp: str) -> List[tokens.Token]:
+# character classes used by the table-driven tokenizer
+CC_OTHER = 0
+CC_SPACE = 1
+CC_DIGIT = 2
+CC_DOT = 3
+CC_EXP = 4
+CC_SIGN = 5
+CC_ALPHA = 6
+CC_NAME_SPECIAL = 7
+CC_SYMBOL = 8
+CC_LEFT_BRACKET = 9
+CC_RIGHT_BRACKET = 10
+
+# states and actions of the number reading automaton
+NS_START = 0
+NS_INT = 1
+NS_FRACTION = 2
+NS_EXPONENT = 3
+NS_EXPONENT_VALUE = 4
+
+NA_END = -1
+NA_INVALID_DOT = -2
+NA_INVALID_EXP = -3
+NA_INVALID_CHAR = -4
+
+NUMBER_ACCEPT_STATES = (False, True, True, False, True)
+
+NAME_CHAR_CLASSES = frozenset([CC_DIGIT, CC_EXP, CC_ALPHA, CC_NAME_SPECIAL])
+
+
+def _classify_char(char: str) -> int:
+    """
+    compute character class of a single char, the order of checks follows the legacy tokenizer
+    """
+
+    if char == UnaryOperators.OP_NEGATIVE or char == UnaryOperators.OP_POSITIVE:
+        return CC_SIGN
+    elif (char in BINOP_TABLE) or (char in UNARYOP_TABLE) or (char in VALID_SEPARATORS):
+        return CC_SYMBOL
+    elif char == Separators.SEP_LEFT_BRACKET:
+        return CC_LEFT_BRACKET
+    elif char == Separators.SEP_RIGHT_BRACKET:
+        return CC_RIGHT_BRACKET
+    elif char == Separators.SEP_DOT:
+        return CC_DOT
+    elif char.isnumeric():
+        return CC_DIGIT
+    elif char == ' ':
+        return CC_SPACE
+    elif char == 'e' or char == 'E':
+        return CC_EXP
+    elif char.isalpha():
+        return CC_ALPHA
+    elif char in NAME_CHAR_SPECIALS:
+        return CC_NAME_SPECIAL
+    else:
+        return CC_OTHER
+
+def _build_char_class_table() -> Dict[str, int]:
+    chars = set(chr(c) for c in range(128))
+    chars.update(NAME_CHAR_SPECIALS, BINOP_TABLE, UNARYOP_TABLE, VALID_SEPARATORS)
+    return {c: _classify_char(c) for c in chars}
+
+def _build_number_transitions() -> Tuple[Tuple[int, ...], ...]:
+    class_count = CC_RIGHT_BRACKET + 1
+
+    table = []
+    for state in (NS_START, NS_INT, NS_FRACTION, NS_EXPONENT, NS_EXPONENT_VALUE):
+        row = [NA_END] * class_count
+
+        if state == NS_START:
+            row[CC_DIGIT] = NS_INT
+        elif state == NS_EXPONENT:
+            row[CC_DIGIT] = NS_EXPONENT_VALUE
+        else:
+            row[CC_DIGIT] = state
+
+        row[CC_DOT] = NS_FRACTION if state in (NS_START, NS_INT) else NA_INVALID_DOT
+        row[CC_EXP] = NS_EXPONENT if state in (NS_INT, NS_FRACTION) else NA_INVALID_EXP
+        row[CC_ALPHA] = NA_INVALID_CHAR
+
+        if state == NS_EXPONENT:
+            row[CC_SIGN] = NS_EXPONENT_VALUE
+
+        table.append(tuple(row))
+
+    return tuple(table)
+
+CHAR_CLASS_TABLE = _build_char_class_table()
+NUMBER_TRANSITIONS = _build_number_transitions()
+
+
+@metrics.timed(TOKENIZE_SECONDS, TOKENIZE_ERRORS)
+def tokenize(exp: str, legacy: bool = False) -> List[tokens.Token]:
     """
     convert the given string expression into a list of tokens
+
+    :param legacy: use the reference implementation instead of the table-driven one,
+        both produce the same token stream and errors
+    """
+
+    if legacy:
+        return _tokenize_legacy(exp)
+
+    if not isinstance(exp, str):
+        raise TypeError("invalid exp")
+
+    if exp == '':
+        raise ValueError("exp is empty")
+
+    # classify the whole string in a single pass, unseen chars are classified on demand
+    class_table = CHAR_CLASS_TABLE
+    classes = [class_table.get(char, -1) for char in exp]
+    if -1 in classes:
+        classes = [_classify_char(char) if cc < 0 else cc for (char, cc) in zip(exp, classes)]
+
+    transitions = NUMBER_TRANSITIONS
+    name_classes = NAME_CHAR_CLASSES
+    TokenSymbol = tokens.TokenSymbol
+    TokenNumber = tokens.TokenNumber
+    TokenName = tokens.TokenName
+
+    token_list: List[tokens.Token] = []
+    append = token_list.append
+
+    length = len(exp)
+    i = 0
+    while i < length:
+        cc = classes[i]
+
+        if cc == CC_SPACE:
+            i += 1
+        elif cc == CC_DIGIT or cc == CC_DOT:
+            start = i
+            state = NS_START
+            while i < length:
+                action = transitions[state][classes[i]]
+                if action >= 0:
+                    state = action
+                    i += 1
+                elif action == NA_END:
+                    break
+                elif action == NA_INVALID_DOT:
+                    raise ParsingException("invalid '.'", i)
+                elif action == NA_INVALID_EXP:
+                    raise ParsingException("invalid 'e'", i)
+                else:
+                    raise ParsingException(f"invalid character '{exp[i]}'", i)
+
+            if NUMBER_ACCEPT_STATES[state]:
+                content = exp[start : i]
+                append(TokenNumber(int(content) if state == NS_INT else float(content), pos=start))
+            else:
+                raise ParsingException(f"invalid character '{exp[i - 1]}'", i - 1)
+        elif cc == CC_SIGN or cc == CC_SYMBOL:
+            append(TokenSymbol(exp[i], pos=i))
+            i += 1
+        elif cc in name_classes:
+            start = i
+            i += 1
+            while i < length and classes[i] in name_classes:
+                i += 1
+            append(TokenName(exp[start : i], pos=start))
+        elif cc == CC_LEFT_BRACKET:
+            append(tokens.TokenOpenBracket(pos=i))
+            i += 1
+        elif cc == CC_RIGHT_BRACKET:
+            append(tokens.TokenCloseBracket(pos=i))
+            i += 1
+        else:
+            raise ParsingException(f"invalid character '{exp[i]}'", i)
+
+    return token_list
+
+def _tokenize_legacy(exp: str) -> List[tokens.Token]:
+    """
+    reference implementation of `tokenize`, walks the string with nested state checks
     """
 
     def is_name_char(char: str) -> bool:
@@ -95,10 +276,9 @@ def tokenize(exp: str) -> List[tokens.Token]:
 
             return i
         else:
-            if is_end:
-                raise ParsingException(f"invalid character '{exp[i - 1]}'", i - 1)
-            else:
-                raise ParsingException(f"invalid character '{exp[i]}'", i)
+            # either the number is terminated by an unexpected char, or the input is exhausted,
+            # in both cases the last consumed char is the offending one
+            raise ParsingException(f"invalid character '{exp[i - 1]}'", i - 1)
 
     def read_name(start: int, token_list: list) -> int:
         i = start
@@ -142,9 +322,281 @@ def tokenize(exp: str) -> List[tokens.Token]:
 
     return token_list
 
-def build_expression_tree(token_list: Sequence[tokens.Token]) -> nodes.ExpNode:
+# kinds of parsing frames used by the iterative tree builder
+FRAME_ROOT = 0
+FRAME_BRACKET = 1
+FRAME_FUNC_CALL = 2
+
+# modes of the iterative tree builder
+BM_READ_OPERAND = 0
+BM_OPERAND_DONE = 1
+BM_END_CHAIN = 2
+BM_FUNC_ARG = 3
+BM_FUNC_CLOSE = 4
+
+
+class NodeEmitter(object):
+    """
+    creates nodes for the tree builder, the builder only refers to nodes through handles returned by
+    an emitter, so that other emitters can build different representations of the same tree
+
+    the default emitter creates `ExpNode` objects, creation methods take the same arguments as node classes
+    """
+
+    number = staticmethod(nodes.NumberNode)
+    name = staticmethod(nodes.NameConstantNode)
+    unary = staticmethod(nodes.UnaryOpNode)
+    binary = staticmethod(nodes.BinaryOpNode)
+    call = staticmethod(nodes.FuncCallNode)
+
+    @staticmethod
+    def binary_op(node: nodes.ExpNode) -> Optional[str]:
+        """
+        get operator of a binary operation node, None for other nodes
+        """
+
+        return node.op if node.__class__ is nodes.BinaryOpNode else None
+
+    @staticmethod
+    def left(node: nodes.BinaryOpNode) -> nodes.ExpNode:
+        return node.left
+
+    @staticmethod
+    def set_left(node: nodes.BinaryOpNode, left: nodes.ExpNode):
+        node.left = left
+
+    @staticmethod
+    def unary_op(node: nodes.ExpNode) -> Optional[str]:
+        """
+        get operator of a unary operation node, None for other nodes
+        """
+
+        return node.op if node.__class__ is nodes.UnaryOpNode else None
+
+    @staticmethod
+    def child(node: nodes.UnaryOpNode) -> nodes.ExpNode:
+        return node.child
+
+    @staticmethod
+    def set_child(node: nodes.UnaryOpNode, child: nodes.ExpNode):
+        node.child = child
+
+NODE_EMITTER = NodeEmitter()
+
+
+class _ChainFrame(object):
+    """
+    parsing state of an operator chain, either the root expression, a bracket or a function call
+    """
+
+    def __init__(self, kind: int, token: tokens.Token = None):
+        self.kind = kind
+        self.token = token
+        self.prefix = None
+        self.args = []
+        self.reset_chain()
+
+    def reset_chain(self):
+        self.operands = []
+        self.ops = []
+        # whether each operand of the chain starts with an open bracket
+        self.bracketed = []
+
+    def fold(self, emitter: NodeEmitter):
+        """
+        combine operands of the chain from right to left
+
+        when the right side is a binary operation of lower or equal priority, the tree is rotated
+        so that the current operator binds the left-most operand of that operation
+        """
+
+        operands = self.operands
+        ops = self.ops
+        bracketed = self.bracketed
+
+        right = operands[-1]
+        for k in range(len(ops) - 1, -1, -1):
+            token = ops[k]
+            right_op = emitter.binary_op(right)
+            if (right_op is not None and not bracketed[k + 1]
+                    and BINOP_TABLE[token.symbol].priority >= BINOP_TABLE[right_op].priority):
+                emitter.set_left(right, emitter.binary(token.symbol, operands[k], emitter.left(right), token.pos))
+            else:
+                right = emitter.binary(token.symbol, operands[k], right, token.pos)
+
+        return right
+
+
+@metrics.timed(BUILD_TREE_SECONDS, BUILD_TREE_ERRORS)
+def build_expression_tree(token_list: Sequence[tokens.Token], legacy: bool = False,
+        emitter: NodeEmitter = NODE_EMITTER) -> nodes.ExpNode:
     """
     convert a list of tokens into expression tree
+
+    the tokens are consumed in a single left to right pass with an explicit stack of frames,
+    so there is no limit on expression length or bracket depth
+
+    :param legacy: use the recursive reference implementation, both produce identical trees
+    :param emitter: creates nodes of the tree, the handle of the root node is returned, not supported
+        by the legacy implementation
+    """
+
+    if legacy:
+        if emitter is not NODE_EMITTER:
+            raise ValueError("legacy implementation only builds node trees")
+
+        return _build_expression_tree_legacy(token_list)
+
+    count = len(token_list)
+    if count == 0:
+        raise ParsingException("empty expression")
+
+    TokenSymbol = tokens.TokenSymbol
+    TokenOpenBracket = tokens.TokenOpenBracket
+    TokenCloseBracket = tokens.TokenCloseBracket
+    SEP_COMMA = Separators.SEP_COMMA
+
+    frame = _ChainFrame(FRAME_ROOT)
+    frames = [frame]
+
+    node = None
+    mode = BM_READ_OPERAND
+    i = 0
+
+    while True:
+        if mode == BM_READ_OPERAND:
+            if i >= count:
+                raise ParsingException("unexpected token", token_list[-1].pos)
+
+            token = token_list[i]
+            is_bracket = token.__class__ is TokenOpenBracket
+            frame.bracketed.append(is_bracket)
+
+            if isinstance(token, TokenSymbol) and not is_bracket:
+                opinfo = UNARYOP_TABLE.get(token.symbol)
+                if opinfo is None:
+                    raise ParsingException(f"unexpected symbol '{token.symbol}'", token.pos)
+                elif opinfo.affix != OperatorAffix.PREFIX:
+                    raise ParsingException(f"unary operator '{token.symbol}' is not a prefix operator", token.pos)
+
+                frame.prefix = token
+                i += 1
+                if i >= count:
+                    raise ParsingException("unexpected token", token_list[-1].pos)
+
+                token = token_list[i]
+                is_bracket = token.__class__ is TokenOpenBracket
+
+            if is_bracket:
+                frame = _ChainFrame(FRAME_BRACKET, token)
+                frames.append(frame)
+                i += 1
+            elif isinstance(token, tokens.TokenNumber):
+                node = emitter.number(token.num, token.pos)
+                mode = BM_OPERAND_DONE
+                i += 1
+            elif isinstance(token, tokens.TokenName):
+                if (i + 1) < count and token_list[i + 1].__class__ is TokenOpenBracket:
+                    frame = _ChainFrame(FRAME_FUNC_CALL, token)
+                    frames.append(frame)
+                    mode = BM_FUNC_ARG
+                    i += 2      # skip '('
+                else:
+                    node = emitter.name(token.name, token.pos)
+                    mode = BM_OPERAND_DONE
+                    i += 1
+            elif isinstance(token, TokenSymbol):
+                raise ParsingException(f"unexpected symbol '{token.symbol}'", token.pos)
+            else:
+                raise ParsingException("unexpceted token", token.pos)
+
+        elif mode == BM_OPERAND_DONE:
+            prefix = frame.prefix
+            if prefix is not None:
+                node = emitter.unary(prefix.symbol, node, prefix.pos)
+                frame.prefix = None
+
+            if i < count:
+                # look ahead for postfix operator
+                token = token_list[i]
+                if isinstance(token, TokenSymbol):
+                    opinfo = UNARYOP_TABLE.get(token.symbol)
+                    if opinfo is not None and opinfo.affix == OperatorAffix.POSTFIX:
+                        node_op = emitter.unary_op(node)
+                        if node_op is not None and opinfo.priority >= UNARYOP_TABLE[node_op].priority:
+                            emitter.set_child(node, emitter.unary(token.symbol, emitter.child(node), token.pos))
+                        else:
+                            node = emitter.unary(token.symbol, node, token.pos)
+                        i += 1
+
+            frame.operands.append(node)
+            mode = BM_END_CHAIN
+
+            if i < count:
+                token = token_list[i]
+                if token.__class__ is TokenCloseBracket:
+                    pass
+                elif isinstance(token, TokenSymbol):
+                    if token.symbol in BINOP_TABLE:
+                        frame.ops.append(token)
+                        mode = BM_READ_OPERAND
+                        i += 1
+                    elif token.symbol != SEP_COMMA:
+                        raise ParsingException(f"unexpected symbol '{token.symbol}'", token.pos)
+                else:
+                    raise ParsingException("unexpected token", token.pos)
+
+        elif mode == BM_END_CHAIN:
+            node = frame.fold(emitter)
+            kind = frame.kind
+
+            if kind == FRAME_BRACKET:
+                if i < count and token_list[i].__class__ is TokenCloseBracket:
+                    frames.pop()
+                    frame = frames[-1]
+                    mode = BM_OPERAND_DONE
+                    i += 1
+                else:
+                    raise ParsingException("unmatch '('", frame.token.pos)
+            elif kind == FRAME_FUNC_CALL:
+                frame.args.append(node)
+                if i < count and isinstance(token_list[i], TokenSymbol) and token_list[i].symbol == SEP_COMMA:
+                    mode = BM_FUNC_ARG
+                    i += 1
+                else:
+                    mode = BM_FUNC_CLOSE
+            else:
+                if i < count:
+                    last_token = token_list[i]
+                    if last_token.__class__ is TokenCloseBracket:
+                        raise ParsingException("unmatch ')'", last_token.pos)
+                    else:
+                        raise ParsingException("unexpected token", last_token.pos)
+                else:
+                    return node
+
+        elif mode == BM_FUNC_ARG:
+            if i < count and token_list[i].__class__ is not TokenCloseBracket:
+                frame.reset_chain()
+                mode = BM_READ_OPERAND
+            else:
+                mode = BM_FUNC_CLOSE
+
+        else:
+            # BM_FUNC_CLOSE
+            name_token = frame.token
+            if i < count and token_list[i].__class__ is TokenCloseBracket:
+                node = emitter.call(name_token.name, frame.args, name_token.pos)
+                frames.pop()
+                frame = frames[-1]
+                mode = BM_OPERAND_DONE
+                i += 1
+            else:
+                raise ParsingException("unclose func call", name_token.pos)
+
+def _build_expression_tree_legacy(token_list: Sequence[tokens.Token]) -> nodes.ExpNode:
+    """
+    reference implementation of `build_expression_tree`, recursive descent with tree rotation
     """
 
     def is_unary_op(op) -> bool:
@@ -311,12 +763,22 @@ def build_expression_tree(token_list: Sequence[tokens.Token]) -> nodes.ExpNode:
     else:
         return node
 
-def parse_expression(expression: str) -> nodes.ExpNode:
+def parse_expression(expression: str, cache: ParseCache = None) -> nodes.ExpNode:
     """
     parse the given string expression into an expression tree
+
+    :param cache: optional cache of parsed trees, trees returned from cache are shared and must not be modified
     """
 
+    if cache is not None:
+        node = cache.get(expression)
+        if node is not None:
+            return node
+
     tokens = tokenize(expression)
     node = build_expression_tree(tokens)
 
+    if cache is not None:
+        cache.put(expression, node)
+
     return node
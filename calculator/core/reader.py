@@ -0,0 +1,72 @@
+import os
+import mmap
+from typing import Iterator, List, Tuple
+
+
+__all__ = ['read_records', 'byte_ranges']
+
+
+NEWLINE = ord('\n')
+CARRIAGE_RETURN = ord('\r')
+
+
+def _record_start(mm: mmap.mmap, start: int) -> int:
+    """
+    find start of the first record owned by a range beginning at `start`,
+    a record belongs to the range containing its first byte
+    """
+
+    if start == 0 or mm[start - 1] == NEWLINE:
+        return start
+
+    pos = mm.find(b'\n', start)
+    return len(mm) if pos < 0 else pos + 1
+
+def read_records(path: str, start: int = 0, end: int = None, encoding: str = 'utf-8') -> Iterator[str]:
+    """
+    iterate newline separated records of a file through a memory map
+
+    records are split on the raw buffer and only sliced bytes are decoded, trailing
+    carriage return is removed. with `start` and `end`, only records beginning inside the
+    byte range are read, so that ranges from `byte_ranges` cover each record exactly once
+
+    :param start: first byte of the range
+    :param end: end of the range (exclusive), defaults to end of file
+    """
+
+    with open(path, 'rb') as inf:
+        size = os.fstat(inf.fileno()).st_size
+        if end is None or end > size:
+            end = size
+        if start >= end:
+            return
+
+        with mmap.mmap(inf.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                pos = _record_start(mm, start)
+                while pos < end:
+                    stop = mm.find(b'\n', pos)
+                    if stop < 0:
+                        stop = size
+                    nxt = stop + 1
+
+                    if stop > pos and mm[stop - 1] == CARRIAGE_RETURN:
+                        stop -= 1
+
+                    yield str(view[pos:stop], encoding)
+                    pos = nxt
+            finally:
+                view.release()
+
+def byte_ranges(path: str, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """
+    divide a file into consecutive byte ranges of about `chunk_bytes`, for readers to map
+    their own part of the file. ranges need not be aligned to records, see `read_records`
+    """
+
+    if chunk_bytes <= 0:
+        raise ValueError("chunk_bytes must be positive")
+
+    size = os.path.getsize(path)
+    return [(offset, min(offset + chunk_bytes, size)) for offset in range(0, size, chunk_bytes)]
@@ -0,0 +1,371 @@
+import os
+import sys
+import mmap
+import struct
+from array import array
+from typing import Union, Callable, Sequence, List, Any
+
+import calculator.core.nodes as nodes
+import calculator.core.vm as vm
+import calculator.core.flat as flat
+
+
+__all__ = ['dumps', 'loads', 'dump', 'load', 'FORMAT_VERSION']
+
+
+MAGIC = b'CALC'
+FORMAT_VERSION = 1
+
+# kinds of encoded objects
+KIND_TREE = 0           # single node tree, stored as a flat AST with one expression
+KIND_FLAT = 1
+KIND_PROGRAM = 2
+
+# literal tags
+LITERAL_FLOAT = 0
+LITERAL_INT = 1
+
+# magic, version, kind, padding
+HEADER = struct.Struct('<4sHBx')
+COUNT = struct.Struct('<I')
+FLOAT = struct.Struct('<d')
+
+# columns are stored little-endian, and decoded without copying on little-endian hosts
+NATIVE = sys.byteorder == 'little'
+
+
+TypeBuffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+TypeEncodable = Union[nodes.ExpNode, flat.FlatAST, vm.Program]
+
+
+class _Writer(object):
+    """
+    helper to append sections to an encoded buffer, array sections are aligned to their item size
+    """
+
+    def __init__(self, kind: int):
+        self.buffer = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, kind))
+
+    def count(self, n: int):
+        self.buffer += COUNT.pack(n)
+
+    def column(self, column: array):
+        self.count(len(column))
+        self.buffer += bytes(-len(self.buffer) % column.itemsize)
+
+        if not NATIVE:
+            column = array(column.typecode, column)
+            column.byteswap()
+        self.buffer += column.tobytes()
+
+    def pool(self, items: Sequence[Any], encode: Callable[[Any], bytes]):
+        # items are stored as a blob with an offset column, offset k + 1 is the end of item k
+        blobs = [encode(item) for item in items]
+        offsets = array('I', [0])
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+
+        self.column(offsets)
+        self.buffer += b''.join(blobs)
+
+class _Reader(object):
+    """
+    helper to read sections of an encoded buffer, array sections are returned as views into the buffer
+    """
+
+    def __init__(self, buffer: TypeBuffer):
+        self.view = memoryview(buffer).cast('B')
+        self.offset = 0
+
+    def _take(self, size: int) -> memoryview:
+        start = self.offset
+        if size < 0 or start + size > len(self.view):
+            raise ValueError("truncated data")
+
+        self.offset = start + size
+        return self.view[start : start + size]
+
+    def count(self) -> int:
+        return COUNT.unpack(self._take(COUNT.size))[0]
+
+    def column(self, typecode: str) -> Union[memoryview, array]:
+        n = self.count()
+        itemsize = array(typecode).itemsize
+        self._take(-self.offset % itemsize)
+        data = self._take(n * itemsize)
+
+        if NATIVE:
+            return data.cast(typecode)
+        else:
+            column = array(typecode, data.tobytes())
+            column.byteswap()
+            return column
+
+    def pool(self, decode: Callable[[memoryview], Any]) -> List[Any]:
+        offsets = self.column('I')
+        if len(offsets) == 0:
+            raise ValueError("invalid pool")
+
+        blob = self._take(offsets[-1])
+        return [decode(blob[offsets[k] : offsets[k + 1]]) for k in range(len(offsets) - 1)]
+
+    def finish(self):
+        if self.offset != len(self.view):
+            raise ValueError("unexpected trailing data")
+
+def _encode_literal(num: Union[int, float]) -> bytes:
+    cls = num.__class__
+    if cls is float:
+        return bytes((LITERAL_FLOAT,)) + FLOAT.pack(num)
+    elif cls is int:
+        # one extra bit for the sign
+        return bytes((LITERAL_INT,)) + num.to_bytes(num.bit_length() // 8 + 1, 'little', signed=True)
+    else:
+        raise ValueError(f"unsupported literal type {cls.__name__}")
+
+def _decode_literal(data: memoryview) -> Union[int, float]:
+    if len(data) == 0:
+        raise ValueError("invalid literal")
+
+    tag = data[0]
+    if tag == LITERAL_FLOAT and len(data) == FLOAT.size + 1:
+        return FLOAT.unpack(data[1:])[0]
+    elif tag == LITERAL_INT and len(data) > 1:
+        return int.from_bytes(data[1:], 'little', signed=True)
+    else:
+        raise ValueError("invalid literal")
+
+def _encode_str(s: str) -> bytes:
+    return s.encode('utf-8')
+
+def _decode_str(data: memoryview) -> str:
+    return str(data, 'utf-8')
+
+def _encode_flat(writer: _Writer, ast: flat.FlatAST):
+    for (name, _) in flat.COLUMNS:
+        writer.column(getattr(ast, name))
+
+    writer.pool(ast.literals, _encode_literal)
+    writer.pool(ast.names, _encode_str)
+
+def _decode_flat(reader: _Reader) -> flat.FlatAST:
+    ast = flat.FlatAST()
+    for (name, typecode) in flat.COLUMNS:
+        setattr(ast, name, reader.column(typecode))
+
+    ast.literals = reader.pool(_decode_literal)
+    ast.names = reader.pool(_decode_str)
+    ast.readonly = True
+
+    count = len(ast.kind)
+    if any(len(getattr(ast, name)) != count for (name, _) in flat.COLUMNS[:6]):
+        raise ValueError("inconsistent column lengths")
+
+    return ast
+
+def _encode_program(writer: _Writer, program: vm.Program):
+    writer.column(program.code)
+    writer.pool(program.consts, _encode_literal)
+    writer.pool(program.names, _encode_str)
+    writer.pool([name for (name, _) in program.calls], _encode_str)
+    writer.column(array('i', [argc for (_, argc) in program.calls]))
+    writer.pool(program.strings, _encode_str)
+
+def _decode_program(reader: _Reader) -> vm.Program:
+    code = reader.column('i')
+    consts = tuple(reader.pool(_decode_literal))
+    names = tuple(reader.pool(_decode_str))
+    call_names = reader.pool(_decode_str)
+    call_argc = reader.column('i')
+    strings = tuple(reader.pool(_decode_str))
+
+    if len(code) % 2 != 0 or len(call_names) != len(call_argc):
+        raise ValueError("inconsistent program sections")
+
+    return vm.Program(code, consts, names, tuple(zip(call_names, call_argc)), strings)
+
+def _validate_flat(ast: flat.FlatAST):
+    """
+    check that all indices of a decoded flat AST are in range and that its expressions are trees
+    """
+
+    count = ast.node_count
+    parents = array('B', bytes(count))
+
+    def link(child: int):
+        if not 0 <= child < count or parents[child]:
+            raise ValueError("invalid node reference")
+        parents[child] = 1
+
+    for i in range(count):
+        kind = ast.kind[i]
+        if kind == flat.KIND_NUMBER:
+            valid = 0 <= ast.value[i] < len(ast.literals)
+        elif kind == flat.KIND_NAME:
+            valid = 0 <= ast.value[i] < len(ast.names)
+        elif kind == flat.KIND_BINARY:
+            valid = ast.op[i] < len(flat.BINARY_OPS)
+            link(ast.left[i])
+            link(ast.right[i])
+        elif kind == flat.KIND_UNARY:
+            valid = ast.op[i] < len(flat.UNARY_OPS)
+            link(ast.left[i])
+        elif kind == flat.KIND_CALL:
+            start = ast.left[i]
+            argc = ast.right[i]
+            valid = 0 <= ast.value[i] < len(ast.names) and start >= 0 and argc >= 0 and start + argc <= len(ast.args)
+            if valid:
+                for k in range(start, start + argc):
+                    link(ast.args[k])
+        else:
+            valid = False
+
+        if not valid:
+            raise ValueError(f"invalid node {i}")
+
+    # a node with a parent cannot be a root, so that nodes reachable from roots form trees
+    for root in ast.roots:
+        if not 0 <= root < count or parents[root]:
+            raise ValueError("invalid root")
+
+def _validate_program(program: vm.Program):
+    """
+    check that all arguments of a decoded program are in range, and simulate its stack, so that
+    each instruction finds its operands and the program leaves a single result. calls must be
+    enclosed by a matching CHECK_CALL, so that functions are always checked before being called
+    """
+
+    code = program.code
+    pools = {
+        vm.OP_CONST: len(program.consts),
+        vm.OP_NAME: len(program.names),
+        vm.OP_CHECK_CALL: len(program.calls),
+        vm.OP_CALL: len(program.calls),
+        vm.OP_FAIL: len(program.strings)
+    }
+
+    if any(argc < 0 for (_, argc) in program.calls):
+        raise ValueError("invalid argument count")
+
+    depth = 0
+    # (call index, stack depth) of each open CHECK_CALL
+    calls = []
+    for pc in range(0, len(code), 2):
+        opcode = code[pc]
+        arg = code[pc + 1]
+
+        if not 0 <= opcode < len(vm.OPCODE_NAMES):
+            raise ValueError(f"invalid opcode at {pc // 2}")
+        elif opcode in pools and not 0 <= arg < pools[opcode]:
+            raise ValueError(f"invalid argument at {pc // 2}")
+
+        # FAIL stands for the node it replaces, it would push that node's value
+        if opcode in (vm.OP_CONST, vm.OP_NAME, vm.OP_FAIL):
+            depth += 1
+        elif vm.OP_ADD <= opcode <= vm.OP_MOD:
+            if depth < 2:
+                raise ValueError(f"stack underflow at {pc // 2}")
+            depth -= 1
+        elif vm.OP_POS <= opcode <= vm.OP_FACT:
+            if depth < 1:
+                raise ValueError(f"stack underflow at {pc // 2}")
+        elif opcode == vm.OP_CHECK_CALL:
+            calls.append((arg, depth))
+        else:
+            if not calls or calls[-1] != (arg, depth - program.calls[arg][1]):
+                raise ValueError(f"unmatched call at {pc // 2}")
+            depth = calls.pop()[1] + 1
+
+    if depth != 1 or calls:
+        raise ValueError("program must leave a single result")
+
+def dumps(obj: TypeEncodable) -> bytes:
+    """
+    encode a node tree, a flat AST or an assembled program into a compact binary form
+
+    the encoding starts with a header of magic, format version and object kind, followed by array
+    columns stored little-endian and aligned to their item size, and pools of literals and strings
+    """
+
+    if isinstance(obj, nodes.ExpNode):
+        writer = _Writer(KIND_TREE)
+        ast = flat.FlatAST()
+        ast.append_node(obj)
+        _encode_flat(writer, ast)
+    elif isinstance(obj, flat.FlatAST):
+        writer = _Writer(KIND_FLAT)
+        _encode_flat(writer, obj)
+    elif isinstance(obj, vm.Program):
+        writer = _Writer(KIND_PROGRAM)
+        _encode_program(writer, obj)
+    else:
+        raise ValueError(f"cannot encode {obj.__class__.__name__}")
+
+    return bytes(writer.buffer)
+
+def loads(buffer: TypeBuffer, validate: bool = False) -> TypeEncodable:
+    """
+    decode an object encoded by `dumps`
+
+    columns of decoded flat ASTs and programs are views into the buffer rather than copies, so that
+    the buffer is kept alive by them, and flat ASTs are read-only. only literal and string pools are
+    converted into objects. node trees are always checked before they are rebuilt from the columns
+
+    :param validate: check every node or instruction of flat ASTs and programs, so that malformed data
+        fails here with `ValueError`. without validation, malformed data may raise other errors during
+        evaluation, and a flat AST with cyclic references makes evaluation and conversion loop forever,
+        so data from untrusted sources must be validated
+    """
+
+    reader = _Reader(buffer)
+    magic, version, kind = HEADER.unpack(reader._take(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError("not an encoded expression")
+    elif version != FORMAT_VERSION:
+        raise ValueError(f"unsupported format version {version}")
+
+    if kind == KIND_TREE or kind == KIND_FLAT:
+        obj = _decode_flat(reader)
+        reader.finish()
+        if validate or kind == KIND_TREE:
+            _validate_flat(obj)
+
+        if kind == KIND_TREE:
+            if len(obj) != 1:
+                raise ValueError("invalid node tree")
+            obj = obj.to_node(0)
+    elif kind == KIND_PROGRAM:
+        obj = _decode_program(reader)
+        reader.finish()
+        if validate:
+            _validate_program(obj)
+    else:
+        raise ValueError(f"unknown object kind {kind}")
+
+    return obj
+
+def dump(obj: TypeEncodable, path: str):
+    """
+    encode an object into a file, the file is replaced atomically so that readers never map a partial file
+    """
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(dumps(obj))
+
+    os.replace(tmp_path, path)
+
+def load(path: str, validate: bool = False) -> TypeEncodable:
+    """
+    decode an object from a file through a read-only memory map, columns of the result are views
+    into the mapped file, whose pages are shared by all processes loading it
+    """
+
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("truncated data")
+
+        # the map stays open as long as views into it are alive
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return loads(mm, validate)
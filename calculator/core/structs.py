@@ -1,6 +1,16 @@
+import itertools
+from collections.abc import KeysView, ItemsView, ValuesView
+
 from calculator.core.constants import OperatorAffix
 
-__all__ = ['OperatorInfo']
+__all__ = ['OperatorInfo', 'FunctionSignature', 'FunctionInfo', 'VersionedDict', 'LayeredDict']
+
+
+# versions are drawn from a shared counter, so that a new dict never reuses the version of a replaced one
+_version_counter = itertools.count(1)
+
+# maximum number of parents a layered dict looks through, longer chains are flattened
+MAX_LAYERS = 4
 
 class OperatorInfo(object):
     """
@@ -11,3 +21,225 @@ class OperatorInfo(object):
         self.op = op
         self.priority = priority
         self.affix = affix
+
+class FunctionSignature(object):
+    """
+    accepted argument counts of a function callable from expressions
+    """
+
+    def __init__(self, min_argc: int, max_argc: int = None):
+        """
+        :param min_argc: minimum number of positional arguments
+        :param max_argc: maximum number of positional arguments, None for variadic functions
+        """
+
+        self.min_argc = min_argc
+        self.max_argc = max_argc
+
+    @property
+    def variadic(self) -> bool:
+        return self.max_argc is None
+
+    def accepts(self, argc: int) -> bool:
+        """
+        whether the function can be called with the given number of arguments
+        """
+
+        if argc < self.min_argc:
+            return False
+        else:
+            return self.max_argc is None or argc <= self.max_argc
+
+    def __str__(self):
+        return f'FunctionSignature({self.min_argc}, {self.max_argc})'
+
+class FunctionInfo(object):
+    """
+    metadata of a function callable from expressions
+    """
+
+    def __init__(self, fun, signature: FunctionSignature, pure: bool = False, cost: int = 1, vector=None):
+        """
+        :param fun: the function as stored in the context, which may be a memoizing wrapper
+        :param signature: accepted argument counts, None if it cannot be resolved
+        :param pure: whether the function always returns the same result for the same arguments
+        :param cost: estimated cost of a call, counted in operations of evaluation budgets
+        :param vector: array implementation taking and returning numpy arrays
+        """
+
+        self.fun = fun
+        self.signature = signature
+        self.pure = pure
+        self.cost = cost
+        self.vector = vector
+
+    @property
+    def memoized(self) -> bool:
+        return hasattr(self.fun, 'cache_info')
+
+    def __str__(self):
+        return f'FunctionInfo({self.signature}, pure={self.pure}, cost={self.cost}, memoized={self.memoized})'
+
+class VersionedDict(dict):
+    """
+    dict that takes a new version number on every modification, used to detect changes of evaluation contexts
+    """
+
+    frozen = False
+    depth = 0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = next(_version_counter)
+
+    def freeze(self) -> 'VersionedDict':
+        """
+        reject any further modification, return the dict itself
+        """
+
+        self.frozen = True
+        return self
+
+    def _check(self):
+        if self.frozen:
+            raise TypeError("cannot modify a frozen dict")
+
+    def _touch(self):
+        self.version = next(_version_counter)
+
+    def __setitem__(self, key, value):
+        self._check()
+        super().__setitem__(key, value)
+        self._touch()
+
+    def __delitem__(self, key):
+        self._check()
+        super().__delitem__(key)
+        self._touch()
+
+    def __ior__(self, other):
+        self._check()
+        result = super().__ior__(other)
+        self._touch()
+        return result
+
+    def update(self, *args, **kwargs):
+        self._check()
+        super().update(*args, **kwargs)
+        self._touch()
+
+    def setdefault(self, key, default=None):
+        self._check()
+        result = super().setdefault(key, default)
+        self._touch()
+        return result
+
+    def pop(self, *args):
+        self._check()
+        result = super().pop(*args)
+        self._touch()
+        return result
+
+    def popitem(self):
+        self._check()
+        result = super().popitem()
+        self._touch()
+        return result
+
+    def clear(self):
+        self._check()
+        super().clear()
+        self._touch()
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),), {'frozen': self.frozen})
+
+class LayeredDict(VersionedDict):
+    """
+    overlay on top of a frozen parent dict, entries of the parent are visible without being copied
+    and entries set on the overlay shadow them, so creating an overlay costs O(1) whatever the parent size
+
+    lookups fall through the chain of parents, a parent chain longer than `MAX_LAYERS` is flattened into
+    a single dict when the overlay is created, so that lookups stay fast
+
+    inherited entries cannot be removed, `clear` and `popitem` only affect entries of the overlay
+    """
+
+    def __init__(self, parent: VersionedDict, *args, **kwargs):
+        """
+        :param parent: frozen dict providing inherited entries
+        """
+
+        if not parent.frozen:
+            raise ValueError("parent of a layered dict must be frozen")
+        elif parent.depth >= MAX_LAYERS:
+            parent = VersionedDict(parent.items()).freeze()
+
+        super().__init__(*args, **kwargs)
+        self.parent = parent
+        self.depth = parent.depth + 1
+
+    def __missing__(self, key):
+        # called by `__getitem__` for keys not set on the overlay
+        return self.parent[key]
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.parent
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        yield from dict.__iter__(self)
+        for key in self.parent:
+            if not dict.__contains__(self, key):
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def keys(self):
+        return KeysView(self)
+
+    def items(self):
+        return ItemsView(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def copy(self) -> dict:
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return dict(self.items()) == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({dict(self.items())!r})'
+
+    def _check_inherited(self, key):
+        if not dict.__contains__(self, key) and key in self.parent:
+            raise KeyError(f"cannot remove inherited key {key!r}, shadow it instead")
+
+    def __delitem__(self, key):
+        self._check_inherited(key)
+        super().__delitem__(key)
+
+    def pop(self, key, *args):
+        self._check_inherited(key)
+        return super().pop(key, *args)
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        else:
+            self[key] = default
+            return default
+
+    def __reduce__(self):
+        # the parent is pickled as its own object, so a shared parent is sent only once
+        return (self.__class__, (self.parent, dict.copy(self)), {'frozen': self.frozen})
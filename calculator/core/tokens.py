@@ -1,3 +1,4 @@
+import os
 from typing import Union
 
 from calculator.core.constants import Separators
@@ -5,11 +6,19 @@ from calculator.core.constants import Separators
 
 __all__ = ['Token', 'TokenName', 'TokenNumber', 'TokenSymbol', 'TokenOpenBracket', 'TokenCloseBracket']
 
+
+# constructor arguments of tokens are only validated in debug mode, which is enabled by
+# setting CALCULATOR_DEBUG environment variable, the tokenizer always gives valid arguments
+DEBUG = os.environ.get('CALCULATOR_DEBUG', '') not in ('', '0')
+
+
 class Token(object):
     """
     base class for token
     """
 
+    __slots__ = ('pos',)
+
     def __init__(self, pos=0):
         self.pos = pos
 
@@ -21,14 +30,17 @@ class TokenName(Token):
     naming constant token, like π, e, etc
     """
 
+    __slots__ = ('name',)
+
     def __init__(self, name: str, pos=0):
         super().__init__(pos=pos)
 
-        if not isinstance(name, str):
-            raise TypeError("name must be str")
+        if DEBUG:
+            if not isinstance(name, str):
+                raise TypeError("name must be str")
 
-        if name == '':
-            raise ValueError("name is empty")
+            if name == '':
+                raise ValueError("name is empty")
 
         self.name = name
 
@@ -40,10 +52,12 @@ class TokenNumber(Token):
     number token, including 5, 5.5, 5e10
     """
 
+    __slots__ = ('num',)
+
     def __init__(self, num: Union[int, float], pos=0):
         super().__init__(pos=pos)
 
-        if not isinstance(num, (int, float)):
+        if DEBUG and not isinstance(num, (int, float)):
             raise TypeError("num must be number")
 
         self.num = num
@@ -56,14 +70,17 @@ class TokenSymbol(Token):
     token for symbol, like '+', '*', '(', etc
     """
 
+    __slots__ = ('symbol',)
+
     def __init__(self, symbol: str, pos=0):
         super().__init__(pos=pos)
 
-        if not isinstance(symbol, str):
-            raise TypeError("symbol must be string")
+        if DEBUG:
+            if not isinstance(symbol, str):
+                raise TypeError("symbol must be string")
 
-        if symbol == '':
-            raise ValueError("symbol is empty")
+            if symbol == '':
+                raise ValueError("symbol is empty")
 
         self.symbol = symbol
 
@@ -75,6 +92,8 @@ class TokenOpenBracket(TokenSymbol):
     left bracket
     """
 
+    __slots__ = ()
+
     def __init__(self, pos=0):
         super().__init__(Separators.SEP_LEFT_BRACKET, pos=pos)
 
@@ -83,5 +102,7 @@ class TokenCloseBracket(TokenSymbol):
     right bracket
     """
 
+    __slots__ = ()
+
     def __init__(self, pos=0):
         super().__init__(Separators.SEP_RIGHT_BRACKET, pos=pos)
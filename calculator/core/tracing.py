@@ -0,0 +1,296 @@
+import json
+import time
+import typing
+from typing import Union, List, Optional
+
+import calculator.core.nodes as nodes
+from calculator.core.operators import OP_FUNCTIONS_BINARY, OP_FUNCTIONS_UNARY
+from calculator.core.exception import EvaluationException
+
+if typing.TYPE_CHECKING:
+    from calculator.core.evaluator import EvaluatorContext
+
+
+__all__ = ['EvaluationTracer', 'NodeStats', 'FunctionStats', 'Profiler', 'evaluate_traced', 'describe_node']
+
+
+def describe_node(node: nodes.ExpNode) -> str:
+    """
+    short readable label of a node, used in reports
+    """
+
+    cls = node.__class__
+    if cls is nodes.NumberNode:
+        return repr(node.num)
+    elif cls is nodes.NameConstantNode:
+        return node.name
+    elif cls is nodes.BinaryOpNode or cls is nodes.UnaryOpNode:
+        return node.op
+    elif cls is nodes.FuncCallNode:
+        return f'{node.id}()'
+    else:
+        return cls.__name__
+
+class EvaluationTracer(object):
+    """
+    base of evaluation hooks, `enter` is called before a node is evaluated and `exit` after it,
+    nodes that are entered are always exited, also when the evaluation fails
+    """
+
+    def enter(self, node: nodes.ExpNode):
+        pass
+
+    def exit(self, node: nodes.ExpNode, value: Optional[Union[int, float]], error: Optional[BaseException]):
+        """
+        :param value: result of the node, None when the evaluation failed
+        :param error: exception raised in the node or one of its children, None on success
+        """
+
+        pass
+
+class NodeStats(object):
+    """
+    accumulated statistics of nodes at a position of the expression
+    """
+
+    def __init__(self, pos: int, label: str):
+        self.pos = pos
+        self.label = label
+        self.calls = 0
+        self.total_time = 0         # nanoseconds including children
+        self.self_time = 0          # nanoseconds excluding children
+
+class FunctionStats(object):
+    """
+    accumulated statistics of calls to a function, arguments are not included in the time
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.total_time = 0         # nanoseconds
+
+class Profiler(EvaluationTracer):
+    """
+    tracer that records call counts and time of each node keyed by node position, and of each function
+    keyed by name, accumulated over all evaluations until `reset`
+    """
+
+    def __init__(self, record_events: bool = False):
+        """
+        :param record_events: also keep an event per node evaluation for `chrome_trace`, which grows with
+            the number of evaluated nodes
+        """
+
+        self.record_events = record_events
+        self.reset()
+
+    def reset(self):
+        """
+        drop all recorded statistics and events
+        """
+
+        self.nodes = {}         # pos -> NodeStats
+        self.functions = {}     # name -> FunctionStats
+        self.events = []
+        self._origin = time.perf_counter_ns()
+
+        # open nodes as [node, start time, time spent in children]
+        self._open = []
+
+    def enter(self, node: nodes.ExpNode):
+        self._open.append([node, time.perf_counter_ns(), 0])
+
+    def exit(self, node: nodes.ExpNode, value, error):
+        end = time.perf_counter_ns()
+        _, start, children = self._open.pop()
+        elapsed = end - start
+
+        if self._open:
+            self._open[-1][2] += elapsed
+
+        stats = self.nodes.get(node.pos)
+        if stats is None:
+            stats = self.nodes[node.pos] = NodeStats(node.pos, describe_node(node))
+
+        stats.calls += 1
+        stats.total_time += elapsed
+        stats.self_time += elapsed - children
+
+        if node.__class__ is nodes.FuncCallNode:
+            fstats = self.functions.get(node.id)
+            if fstats is None:
+                fstats = self.functions[node.id] = FunctionStats(node.id)
+
+            fstats.calls += 1
+            fstats.total_time += elapsed - children
+
+        if self.record_events:
+            self.events.append((stats.label, node.pos, start - self._origin, elapsed, error is not None))
+
+    def report(self, limit: int = None) -> List[str]:
+        """
+        render a flat report of nodes and functions sorted by time, slowest first
+
+        :param limit: maximum number of lines of each section
+        """
+
+        lines = [f'{"pos":>5} {"node":<16} {"calls":>8} {"total ms":>10} {"self ms":>10}']
+        node_stats = sorted(self.nodes.values(), key=lambda s: s.total_time, reverse=True)
+        for s in node_stats[:limit]:
+            lines.append(f'{s.pos:>5} {s.label:<16} {s.calls:>8} {s.total_time / 1e6:>10.3f} {s.self_time / 1e6:>10.3f}')
+
+        if self.functions:
+            lines.append('')
+            lines.append(f'{"function":<22} {"calls":>8} {"total ms":>10}')
+            function_stats = sorted(self.functions.values(), key=lambda s: s.total_time, reverse=True)
+            for s in function_stats[:limit]:
+                lines.append(f'{s.name:<22} {s.calls:>8} {s.total_time / 1e6:>10.3f}')
+
+        return lines
+
+    def chrome_trace(self) -> dict:
+        """
+        get recorded events in Chrome trace event format, to be loaded by chrome://tracing or Perfetto,
+        only available when the profiler records events
+        """
+
+        if not self.record_events:
+            raise ValueError("profiler doesn't record events")
+
+        events = []
+        for (label, pos, start, elapsed, failed) in self.events:
+            events.append({
+                'name': label,
+                'cat': 'evaluation',
+                'ph': 'X',
+                'ts': start / 1000,
+                'dur': elapsed / 1000,
+                'pid': 0,
+                'tid': 0,
+                'args': {'pos': pos, 'failed': failed}
+            })
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ns'}
+
+    def write_chrome_trace(self, path: str):
+        """
+        write recorded events as a Chrome trace JSON file
+        """
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+class _TracedEvaluator(object):
+    """
+    tree walking evaluation that calls tracer hooks around each node
+    """
+
+    def __init__(self, context: 'EvaluatorContext', tracer: EvaluationTracer):
+        self._context = context
+        self._tracer = tracer
+
+    def _leaf(self, node: nodes.ExpNode) -> Union[int, float]:
+        if node.__class__ is nodes.NumberNode:
+            return node.num
+        elif node.__class__ is nodes.NameConstantNode:
+            if node.name in self._context.constants:
+                return self._context.constants[node.name]
+            else:
+                raise EvaluationException(f"unknown constant '{node.name}'")
+        else:
+            raise EvaluationException("invalid inputs")
+
+    def _check_call(self, node: nodes.FuncCallNode):
+        fun = self._context.functions.get(node.id, None)
+        if fun is None:
+            raise EvaluationException(f"unsupported function '{node.id}'")
+
+        signature = self._context.get_signature(node.id, fun)
+        if signature is None:
+            raise EvaluationException(f"cannot resolve signature of function '{node.id}'")
+        elif not signature.accepts(len(node.args)):
+            raise EvaluationException(f"incorrect number of arguments passed into function '{node.id}'")
+
+    def run(self, root: nodes.ExpNode) -> Union[int, float]:
+        tracer = self._tracer
+
+        # nodes entered but not exited yet, exited with the error when evaluation fails
+        path = []
+        try:
+            return self._walk(root, path)
+        except Exception as err:
+            while path:
+                tracer.exit(path.pop(), None, err)
+
+            raise
+
+    def _walk(self, root: nodes.ExpNode, path: list) -> Union[int, float]:
+        tracer = self._tracer
+
+        results = []
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            cls = node.__class__
+
+            if not visited:
+                tracer.enter(node)
+                path.append(node)
+
+            if cls is nodes.BinaryOpNode:
+                fun = OP_FUNCTIONS_BINARY.get(node.op)
+                if fun is None:
+                    raise EvaluationException(f"unsupported binary operator '{node.op}'")
+                elif visited:
+                    right = results.pop()
+                    value = fun(results.pop(), right)
+                    if isinstance(value, complex):
+                        raise EvaluationException("invalid expression")
+                else:
+                    stack.append((node, True))
+                    stack.append((node.right, False))
+                    stack.append((node.left, False))
+                    continue
+            elif cls is nodes.UnaryOpNode:
+                fun = OP_FUNCTIONS_UNARY.get(node.op)
+                if fun is None:
+                    raise EvaluationException(f"unsupported unary operator '{node.op}'")
+                elif visited:
+                    value = fun(results.pop())
+                else:
+                    stack.append((node, True))
+                    stack.append((node.child, False))
+                    continue
+            elif cls is nodes.FuncCallNode:
+                if visited:
+                    argc = len(node.args)
+                    args = results[len(results) - argc:]
+                    del results[len(results) - argc:]
+                    value = self._context.functions[node.id](*args)
+                else:
+                    self._check_call(node)
+                    stack.append((node, True))
+                    for arg in reversed(node.args):
+                        stack.append((arg, False))
+                    continue
+            else:
+                value = self._leaf(node)
+
+            path.pop()
+            tracer.exit(node, value, None)
+            results.append(value)
+
+        return results[0]
+
+def evaluate_traced(node: nodes.ExpNode, context: 'EvaluatorContext', tracer: EvaluationTracer) -> Union[int, float]:
+    """
+    evaluate a tree like the tree walking engine, calling hooks of the tracer around each node
+    """
+
+    try:
+        return _TracedEvaluator(context, tracer).run(node)
+    except ZeroDivisionError as err:
+        raise EvaluationException("zero division", inner=err)
+    except ValueError as err:
+        raise EvaluationException("value error", inner=err)
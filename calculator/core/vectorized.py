@@ -0,0 +1,266 @@
+import math
+import typing
+from typing import Callable, Dict, Any, List
+
+import calculator.core.nodes as nodes
+from calculator.core.constants import BinaryOperators, UnaryOperators
+from calculator.core.exception import EvaluationException
+from calculator.core.cache import MemoizedFunction
+
+try:
+    import numpy as np
+except ImportError:         # numpy is optional, only required by vectorized evaluation
+    np = None
+
+if typing.TYPE_CHECKING:
+    from calculator.core.evaluator import EvaluatorContext
+
+
+__all__ = ['evaluate_vectorized', 'VECTOR_FUNCTIONS']
+
+
+def _log(x, base=None):
+    if base is None:
+        return np.log(x)
+    else:
+        return np.log(x) / np.log(base)
+
+def _build_vector_functions() -> Dict[Callable[..., Any], Callable[..., Any]]:
+    if np is None:
+        return {}
+
+    return {
+        math.sin: np.sin,
+        math.cos: np.cos,
+        math.tan: np.tan,
+        math.asin: np.arcsin,
+        math.acos: np.arccos,
+        math.atan: np.arctan,
+        math.sinh: np.sinh,
+        math.cosh: np.cosh,
+        math.tanh: np.tanh,
+        math.sqrt: np.sqrt,
+        math.exp: np.exp,
+        math.log: _log,
+        math.log10: np.log10,
+        math.log2: np.log2,
+        math.degrees: np.degrees,
+        math.radians: np.radians,
+        math.floor: np.floor,
+        math.ceil: np.ceil,
+        math.fabs: np.fabs,
+        abs: np.abs
+    }
+
+# scalar function -> array equivalent, looked up by identity of the functions in context
+VECTOR_FUNCTIONS = _build_vector_functions()
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for vectorized evaluation")
+
+def _invalidate_overflow(result, *args):
+    """
+    mark elements as NaN where finite inputs give non-finite output, which are
+    the cases where scalar math functions raise overflow or domain errors
+    """
+
+    bad = ~np.isfinite(result)
+    if bad.any():
+        for a in args:
+            bad &= np.isfinite(a)
+        result = np.where(bad, np.nan, result)
+
+    return result
+
+def _divide(a, b):
+    result = np.true_divide(a, b)
+    return np.where(b == 0, np.nan, result)
+
+def _mod(a, b):
+    result = np.mod(a, b)
+    return np.where(b == 0, np.nan, result)
+
+def _power(a, b):
+    result = np.power(a, b)
+    # zero to negative power raises zero division in scalar evaluation
+    result = np.where((a == 0) & (b < 0), np.nan, result)
+    return _invalidate_overflow(result, a, b)
+
+# largest integer whose factorial is within float range
+MAX_FLOAT_FACTORIAL = 170
+
+
+def _factorial_scalar(x: float) -> float:
+    if x >= 0 and x == math.floor(x):
+        # larger factorials are infinite as floats, they are not computed
+        if x > MAX_FLOAT_FACTORIAL:
+            return math.inf
+        else:
+            return float(math.factorial(int(x)))
+    else:
+        return math.nan
+
+def _apply_scalar(fun: Callable[..., Any], values) -> float:
+    try:
+        value = fun(*values)
+        return value if isinstance(value, (int, float)) else math.nan
+    except (ArithmeticError, ValueError, TypeError):
+        return math.nan
+
+def _elementwise(fun: Callable[..., Any], args: List[Any]):
+    """
+    apply a scalar function element by element, elements that fail are set to NaN
+    """
+
+    if not args:
+        # a call without arguments has a single result, broadcast by the operations using it
+        return np.float64(_apply_scalar(fun, ()))
+
+    broadcast = np.broadcast(*args)
+    columns = [np.broadcast_to(a, broadcast.shape).ravel().tolist() for a in args]
+
+    out = np.empty(broadcast.size, dtype=np.float64)
+    for (i, values) in enumerate(zip(*columns)):
+        out[i] = _apply_scalar(fun, values)
+
+    return out.reshape(broadcast.shape)
+
+def _binary_functions() -> Dict[str, Callable[..., Any]]:
+    return {
+        BinaryOperators.OP_ADD: np.add,
+        BinaryOperators.OP_MINUS: np.subtract,
+        BinaryOperators.OP_MULTIPLY: np.multiply,
+        BinaryOperators.OP_DIVIDE: _divide,
+        BinaryOperators.OP_POWER: _power,
+        BinaryOperators.OP_MOD: _mod
+    }
+
+def _unary_functions() -> Dict[str, Callable[..., Any]]:
+    return {
+        UnaryOperators.OP_POSITIVE: np.positive,
+        UnaryOperators.OP_NEGATIVE: np.negative,
+        UnaryOperators.OP_FACTORIAL: lambda a: _elementwise(_factorial_scalar, [a])
+    }
+
+class _VectorEvaluator(object):
+    """
+    evaluate expression trees over float64 arrays
+    """
+
+    def __init__(self, context: 'EvaluatorContext', variables: Dict[str, Any], vector_functions: Dict[str, Callable[..., Any]]):
+        self._context = context
+        self._variables = {name: np.asarray(v, dtype=np.float64) for (name, v) in variables.items()}
+        self._vector_functions = vector_functions
+        self._binary = _binary_functions()
+        self._unary = _unary_functions()
+
+    def _leaf(self, node: nodes.ExpNode):
+        if node.__class__ is nodes.NumberNode:
+            try:
+                return np.float64(float(node.num))
+            except OverflowError:
+                # integer literals beyond float range are rounded to infinity like float results
+                return np.float64(math.inf if node.num > 0 else -math.inf)
+        elif node.__class__ is nodes.NameConstantNode:
+            if node.name in self._variables:
+                return self._variables[node.name]
+            elif node.name in self._context.constants:
+                return np.float64(self._context.constants[node.name])
+            else:
+                raise EvaluationException(f"unknown constant '{node.name}'")
+        else:
+            raise EvaluationException("invalid inputs")
+
+    def _check_call(self, node: nodes.FuncCallNode) -> Callable[..., Any]:
+        fun = self._context.functions.get(node.id, None)
+        if fun is None:
+            raise EvaluationException(f"unsupported function '{node.id}'")
+
+        signature = self._context.get_signature(node.id, fun)
+        if signature is None:
+            raise EvaluationException(f"cannot resolve signature of function '{node.id}'")
+        elif not signature.accepts(len(node.args)):
+            raise EvaluationException(f"incorrect number of arguments passed into function '{node.id}'")
+
+        return fun
+
+    def _call(self, node: nodes.FuncCallNode, args: List[Any]):
+        fun = self._check_call(node)
+
+        vfun = self._vector_functions.get(node.id)
+        if vfun is None:
+            vfun = self._context.get_function_info(node.id).vector
+        if vfun is None:
+            vfun = VECTOR_FUNCTIONS.get(fun.fun if isinstance(fun, MemoizedFunction) else fun)
+
+        if vfun is not None:
+            return _invalidate_overflow(np.asarray(vfun(*args), dtype=np.float64), *args)
+        else:
+            return _elementwise(fun, args)
+
+    def run(self, root: nodes.ExpNode):
+        results = []
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            cls = node.__class__
+
+            if cls is nodes.BinaryOpNode:
+                fun = self._binary.get(node.op)
+                if fun is None:
+                    raise EvaluationException(f"unsupported binary operator '{node.op}'")
+                elif visited:
+                    right = results.pop()
+                    left = results.pop()
+                    results.append(fun(left, right))
+                else:
+                    stack.append((node, True))
+                    stack.append((node.right, False))
+                    stack.append((node.left, False))
+            elif cls is nodes.UnaryOpNode:
+                fun = self._unary.get(node.op)
+                if fun is None:
+                    raise EvaluationException(f"unsupported unary operator '{node.op}'")
+                elif visited:
+                    results.append(fun(results.pop()))
+                else:
+                    stack.append((node, True))
+                    stack.append((node.child, False))
+            elif cls is nodes.FuncCallNode:
+                if visited:
+                    argc = len(node.args)
+                    args = results[len(results) - argc:]
+                    del results[len(results) - argc:]
+                    results.append(self._call(node, args))
+                else:
+                    self._check_call(node)
+                    stack.append((node, True))
+                    for arg in reversed(node.args):
+                        stack.append((arg, False))
+            else:
+                results.append(self._leaf(node))
+
+        return np.asarray(results[0], dtype=np.float64)
+
+def evaluate_vectorized(node: nodes.ExpNode, context: 'EvaluatorContext', variables: Dict[str, Any],
+        vector_functions: Dict[str, Callable[..., Any]] = None):
+    """
+    evaluate an expression tree with array-valued variables, the result is a float64 array
+    broadcast from all variables
+
+    elements whose scalar evaluation would fail (zero division, domain and overflow errors of
+    functions, complex powers) are NaN in the result, instead of raising for each of them.
+    structural errors like unknown names or wrong argument counts still raise `EvaluationException`
+
+    :param variables: name -> array-like values, names shadow constants in the context
+    :param vector_functions: function name -> array implementation, overriding implementations registered
+        in the context and the builtin mapping of `math` functions, functions without array implementation
+        are applied element by element
+    """
+
+    _require_numpy()
+
+    with np.errstate(all='ignore'):
+        return _VectorEvaluator(context, variables, vector_functions or {}).run(node)
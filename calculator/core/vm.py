@@ -0,0 +1,312 @@
+import typing
+from array import array
+from typing import List, Union
+
+import calculator.core.nodes as nodes
+from calculator.core.constants import BinaryOperators, UnaryOperators
+from calculator.core.operators import OP_FUNCTIONS_UNARY
+from calculator.core.exception import EvaluationException
+
+if typing.TYPE_CHECKING:
+    from calculator.core.evaluator import EvaluatorContext
+    from calculator.core.budget import BudgetMeter
+
+
+__all__ = ['Program', 'assemble', 'execute', 'disassemble']
+
+
+# opcodes, each instruction is a pair of (opcode, argument) in the code buffer
+OP_CONST = 0           # push constant pool item
+OP_NAME = 1            # push named constant resolved from context
+OP_ADD = 2
+OP_SUB = 3
+OP_MUL = 4
+OP_DIV = 5
+OP_POW = 6
+OP_MOD = 7
+OP_POS = 8
+OP_NEG = 9
+OP_FACT = 10
+OP_CHECK_CALL = 11     # validate function and argument count before arguments are evaluated
+OP_CALL = 12           # pop arguments and call function
+OP_FAIL = 13           # raise evaluation error with message from string pool
+
+OPCODE_NAMES = (
+    'CONST', 'NAME', 'ADD', 'SUB', 'MUL', 'DIV', 'POW', 'MOD',
+    'POS', 'NEG', 'FACT', 'CHECK_CALL', 'CALL', 'FAIL'
+)
+
+BINARY_OPCODES = {
+    BinaryOperators.OP_ADD: OP_ADD,
+    BinaryOperators.OP_MINUS: OP_SUB,
+    BinaryOperators.OP_MULTIPLY: OP_MUL,
+    BinaryOperators.OP_DIVIDE: OP_DIV,
+    BinaryOperators.OP_POWER: OP_POW,
+    BinaryOperators.OP_MOD: OP_MOD
+}
+
+UNARY_OPCODES = {
+    UnaryOperators.OP_POSITIVE: OP_POS,
+    UnaryOperators.OP_NEGATIVE: OP_NEG,
+    UnaryOperators.OP_FACTORIAL: OP_FACT
+}
+
+
+class Program(object):
+    """
+    compiled postfix form of an expression tree
+
+    the program is independent of evaluation context, names and functions are resolved when executed
+    """
+
+    def __init__(self, code: array, consts: tuple, names: tuple, calls: tuple, strings: tuple):
+        """
+        :param code: flat buffer of (opcode, argument) pairs, an int array or a view of one
+        :param consts: number literal pool
+        :param names: constant name pool
+        :param calls: pool of (function name, argument count)
+        :param strings: error message pool
+        """
+
+        self.code = code
+        self.consts = consts
+        self.names = names
+        self.calls = calls
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.code) // 2
+
+    def __str__(self):
+        return f'Program({len(self)} instructions)'
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # decoded programs hold a view into an external buffer, which cannot be pickled
+        if not isinstance(self.code, array):
+            state['code'] = array('i', self.code)
+
+        return state
+
+class _ProgramBuilder(object):
+    """
+    helper to emit instructions and intern pool items
+    """
+
+    def __init__(self):
+        self.code = array('i')
+        self._pools = ([], [], [], [])
+        self._indexes = ({}, {}, {}, {})
+
+    def intern(self, pool: int, value) -> int:
+        # numbers are keyed with their type, so that 1 and 1.0 are stored separately
+        key = (value.__class__, value)
+        index = self._indexes[pool].get(key)
+        if index is None:
+            index = len(self._pools[pool])
+            self._pools[pool].append(value)
+            self._indexes[pool][key] = index
+
+        return index
+
+    def emit(self, opcode: int, arg: int = 0):
+        self.code.append(opcode)
+        self.code.append(arg)
+
+    def emit_fail(self, msg: str):
+        self.emit(OP_FAIL, self.intern(3, msg))
+
+    def build(self) -> Program:
+        return Program(self.code, *(tuple(p) for p in self._pools))
+
+def assemble(node: nodes.ExpNode) -> Program:
+    """
+    convert an expression tree into a program, the tree is traversed without recursion
+
+    nodes that would fail before evaluating their children are emitted as a single FAIL instruction,
+    so that errors are raised in the same order as tree-walking evaluation
+    """
+
+    builder = _ProgramBuilder()
+
+    # pending items of (node, tag), tag is None before the node's children are emitted
+    stack = [(node, None)]
+    while stack:
+        node, tag = stack.pop()
+        cls = node.__class__
+
+        if cls is nodes.NumberNode:
+            builder.emit(OP_CONST, builder.intern(0, node.num))
+        elif cls is nodes.NameConstantNode:
+            builder.emit(OP_NAME, builder.intern(1, node.name))
+        elif cls is nodes.BinaryOpNode:
+            opcode = BINARY_OPCODES.get(node.op)
+            if opcode is None:
+                builder.emit_fail(f"unsupported binary operator '{node.op}'")
+            elif tag is None:
+                stack.append((node, opcode))
+                stack.append((node.right, None))
+                stack.append((node.left, None))
+            else:
+                builder.emit(tag)
+        elif cls is nodes.UnaryOpNode:
+            opcode = UNARY_OPCODES.get(node.op)
+            if opcode is None:
+                builder.emit_fail(f"unsupported unary operator '{node.op}'")
+            elif tag is None:
+                stack.append((node, opcode))
+                stack.append((node.child, None))
+            else:
+                builder.emit(tag)
+        elif cls is nodes.FuncCallNode:
+            if tag is None:
+                index = builder.intern(2, (node.id, len(node.args)))
+                builder.emit(OP_CHECK_CALL, index)
+                stack.append((node, index))
+                for arg in reversed(node.args):
+                    stack.append((arg, None))
+            else:
+                builder.emit(OP_CALL, tag)
+        else:
+            builder.emit_fail("invalid inputs")
+
+    return builder.build()
+
+def execute(program: Program, context: 'EvaluatorContext', meter: 'BudgetMeter' = None) -> Union[int, float]:
+    """
+    run a program with the given context and return the result
+
+    :param meter: budget meter checked before each operation, the evaluation is aborted
+        with `BudgetExceededException` when the budget runs out
+    """
+
+    try:
+        return _run(program, context, meter)
+    except ZeroDivisionError as err:
+        raise EvaluationException("zero division", inner=err)
+    except ValueError as err:
+        raise EvaluationException("value error", inner=err)
+
+def _check_budget(meter: 'BudgetMeter', opcode: int, stack: list, cost: int):
+    if opcode == OP_POW:
+        meter.check_power(stack[-2], stack[-1])
+    elif opcode == OP_MUL:
+        meter.check_product(stack[-2], stack[-1])
+    elif opcode == OP_FACT:
+        meter.check_factorial(stack[-1])
+    elif opcode != OP_CHECK_CALL and opcode != OP_FAIL:
+        meter.tick(cost)
+
+def _run(program: Program, context: 'EvaluatorContext', meter: 'BudgetMeter' = None) -> Union[int, float]:
+    code = program.code
+    consts = program.consts
+    names = program.names
+    calls = program.calls
+
+    constants = context.constants
+    functions = context.functions
+    factorial = OP_FUNCTIONS_UNARY[UnaryOperators.OP_FACTORIAL]
+
+    stack = []
+    push = stack.append
+    pop = stack.pop
+
+    pc = 0
+    size = len(code)
+    while pc < size:
+        opcode = code[pc]
+        arg = code[pc + 1]
+        pc += 2
+
+        if meter is not None and opcode > OP_NAME:
+            # function calls are counted by their registered cost
+            cost = context.get_function_info(calls[arg][0]).cost if opcode == OP_CALL else 1
+            _check_budget(meter, opcode, stack, cost)
+
+        if opcode == OP_CONST:
+            push(consts[arg])
+        elif opcode == OP_NAME:
+            name = names[arg]
+            if name in constants:
+                push(constants[name])
+            else:
+                raise EvaluationException(f"unknown constant '{name}'")
+        elif opcode <= OP_MOD:
+            right = pop()
+            left = stack[-1]
+
+            if opcode == OP_ADD:
+                result = left + right
+            elif opcode == OP_SUB:
+                result = left - right
+            elif opcode == OP_MUL:
+                result = left * right
+            elif opcode == OP_DIV:
+                result = left / right
+            elif opcode == OP_POW:
+                result = left ** right
+            else:
+                result = left % right
+
+            if isinstance(result, complex):
+                raise EvaluationException("invalid expression")
+
+            stack[-1] = result
+        elif opcode == OP_NEG:
+            stack[-1] = -stack[-1]
+        elif opcode == OP_POS:
+            stack[-1] = +stack[-1]
+        elif opcode == OP_FACT:
+            stack[-1] = factorial(stack[-1])
+        elif opcode == OP_CHECK_CALL:
+            name, argc = calls[arg]
+            fun = functions.get(name, None)
+            if fun is None:
+                raise EvaluationException(f"unsupported function '{name}'")
+
+            signature = context.get_signature(name, fun)
+            if signature is None:
+                raise EvaluationException(f"cannot resolve signature of function '{name}'")
+            elif not signature.accepts(argc):
+                raise EvaluationException(f"incorrect number of arguments passed into function '{name}'")
+        elif opcode == OP_CALL:
+            name, argc = calls[arg]
+            fun = functions[name]
+            if argc == 1:
+                stack[-1] = fun(stack[-1])
+            elif argc == 0:
+                push(fun())
+            else:
+                args = stack[-argc:]
+                del stack[-argc:]
+                push(fun(*args))
+        else:
+            raise EvaluationException(program.strings[arg])
+
+    return stack[-1]
+
+def disassemble(program: Program) -> List[str]:
+    """
+    render instructions of a program as readable lines, for debugging
+    """
+
+    lines = []
+    code = program.code
+    for pc in range(0, len(code), 2):
+        opcode = code[pc]
+        arg = code[pc + 1]
+
+        if opcode == OP_CONST:
+            detail = repr(program.consts[arg])
+        elif opcode == OP_NAME:
+            detail = program.names[arg]
+        elif opcode in (OP_CHECK_CALL, OP_CALL):
+            detail = '%s/%d' % program.calls[arg]
+        elif opcode == OP_FAIL:
+            detail = repr(program.strings[arg])
+        else:
+            detail = ''
+
+        lines.append(f'{pc // 2:4d} {OPCODE_NAMES[opcode]:<10} {detail}'.rstrip())
+
+    return lines
@@ -34,4 +34,15 @@ KEY_SPECIAL_BG_HOVER = QtGui.QColor('#434f5c')
 
 KEY_SIZE_STD = 80
 KEY_WIDTH_PRO = 70
-KEY_HEIGHT_PRO = 50
\ No newline at end of file
+KEY_HEIGHT_PRO = 50
+
+# evaluation runs on a worker thread and reports an error once these limits are exceeded
+EVAL_TIMEOUT = 10                   # seconds
+EVAL_MAX_DIGITS = 10000             # larger integer results cannot be displayed anyway
+EVAL_COMPUTING_TEXT = 'Computing…'
+EVAL_PARSE_CACHE_SIZE = 64
+
+# result preview shown while typing in pro mode
+PREVIEW_DELAY = 150                 # milliseconds of idle typing before a preview is computed
+PREVIEW_TIMEOUT = 1                 # seconds
+PREVIEW_MAX_DIGITS = 1000
\ No newline at end of file
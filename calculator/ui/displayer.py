@@ -15,9 +15,9 @@ class CalculatorDisplayer(QtWidgets.QWidget):
         self.setFixedHeight(120)
 
         layout = QtWidgets.QVBoxLayout()
-        layout.setContentsMargins(8, 0, 8, 20)
+        layout.setContentsMargins(8, 0, 8, 15)
         layout.setSpacing(5)
-        layout.addSpacerItem(QtWidgets.QSpacerItem(100, 45))
+        layout.addSpacerItem(QtWidgets.QSpacerItem(100, 30))
         self.setLayout(layout)
 
         # create and config secondary input
@@ -62,6 +62,15 @@ class CalculatorDisplayer(QtWidgets.QWidget):
         self._primaryInput.installEventFilter(parent)
         layout.addWidget(primaryInput)
 
+        # create and config preview of the result, shown under the primary input while typing
+        preview = QtWidgets.QLabel('', parent=self)
+        preview.setObjectName("Preview")
+        preview.setFixedHeight(15)
+        preview.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+        self._preview = preview
+        layout.addWidget(preview)
+
     def _updatePrimaryFontSize(self, content):
         """
         change main input font size based on content length
@@ -119,6 +128,13 @@ class CalculatorDisplayer(QtWidgets.QWidget):
 
         return self._secondaryInput.text()
 
+    def setPreviewContent(self, content):
+        """
+        update content of the result preview
+        """
+
+        self._preview.setText(content)
+
     # event handles #
 
     def resizeEvent(self, event):
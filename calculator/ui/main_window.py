@@ -8,11 +8,16 @@ from PyQt5.QtCore import Qt, QEvent, pyqtSlot
 import calculator.ui.config as config
 import calculator.ui.font as font
 import calculator.ui.util as util
+import calculator.core.metrics as metrics
 from calculator.ui.keyboard import CalculatorKeyboard, CalculatorKeyboardButton
 from calculator.ui.displayer import CalculatorDisplayer
 from calculator.ui.runtime import CalculatorRuntime, CalculatorRuntimeBasic, CalculatorRuntimePro
 
 
+GUI_MODEL_CHANGE_SECONDS = metrics.REGISTRY.histogram('calculator_gui_model_change_seconds',
+    'time spent updating the displayer on runtime model changes')
+
+
 class WindowButton(QtWidgets.QAbstractButton):
     """
     button appears on top of the window
@@ -310,6 +315,7 @@ class CalculatorWindowBackboard(QtWidgets.QWidget):
             return False
 
     @pyqtSlot(CalculatorRuntime)
+    @metrics.timed(GUI_MODEL_CHANGE_SECONDS)
     def onRuntimeModelChange(self, runtime):
         """
         runtime model change slot, update displayer content
@@ -318,6 +324,7 @@ class CalculatorWindowBackboard(QtWidgets.QWidget):
         model = runtime.model
         self._displayer.setPrimaryContent(model.input, runtime.justEvaluated())
         self._displayer.setSecondaryContent(model.hint)
+        self._displayer.setPreviewContent(model.preview)
 
 class CalculatorWindow(QtWidgets.QWidget):
     """
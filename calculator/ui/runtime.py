@@ -1,43 +1,26 @@
 import sys
 import re
-import math
+import time
 from abc import ABCMeta, abstractmethod
-from typing import Union, Optional, List, Tuple
+from typing import Optional, List, Tuple
 
-from PyQt5.QtCore import Qt, pyqtSignal, pyqtSlot, QObject
+from PyQt5.QtCore import Qt, pyqtSignal, pyqtSlot, QObject, QTimer
 
 import calculator.ui.config as config
-from calculator.core.evaluator import Evaluator, EvaluatorContext
-from calculator.core.exception import EvaluationException
+from calculator.ui.worker import EvaluationTask, startTask, cancelTask
+import calculator.core.metrics as metrics
+from calculator.core.evaluator import Evaluator, EvaluationBudget
+from calculator.core.cache import ParseCache
+from calculator.core.functions import standardContext, proContext
+from calculator.core.formatting import formatNumber, formatError
 
 
 ZERO = '0'
 DOT = '.'
 
+GUI_EVALUATION_SECONDS = metrics.REGISTRY.histogram('calculator_gui_evaluation_seconds',
+    'time from pressing evaluate until the result or error is shown')
 
-def formatNumber(n: Union[float, int], maxPrecision: int, roundPrecision: int) -> str:
-    """
-    custom number formatting
-    """
-
-    if maxPrecision > 0:
-        exp = 10 ** maxPrecision
-        n = round(n * exp) / exp
-
-    if roundPrecision > 0:
-        nround = round(n, roundPrecision)
-        if math.isclose(nround, n, rel_tol=10**(-roundPrecision)):
-            n = nround
-
-    s = str(n)
-    if DOT in s:
-        s = s.rstrip(ZERO)
-        if s[-1] == DOT:
-            return s[:-1]
-        else:
-            return s
-    else:
-        return s
 
 def checkFunc(content: str) -> str:
     """
@@ -147,6 +130,7 @@ class CalculatorRuntimeModel(QObject):
 
         self.__hint = ''
         self.__input = ZERO
+        self.__preview = ''
 
     def _triggerChangeSignal(self):
         self.modelChange.emit()
@@ -186,6 +170,23 @@ class CalculatorRuntimeModel(QObject):
             self.__input = value
             self._triggerChangeSignal()
 
+    @property
+    def preview(self) -> str:
+        """
+        get preview of the result of current input
+        """
+        return self.__preview
+
+    @preview.setter
+    def preview(self, value: str):
+        """
+        set preview content
+        """
+
+        if value != self.__preview:
+            self.__preview = value
+            self._triggerChangeSignal()
+
     def reset(self, noSignal=False):
         """
         reset model state, clear all the contents
@@ -193,6 +194,10 @@ class CalculatorRuntimeModel(QObject):
 
         hasChange = False
 
+        if self.__preview != '':
+            self.__preview = ''
+            hasChange = True
+
         if self.__input != ZERO:
             self.__input = ZERO
             hasChange = True
@@ -238,6 +243,7 @@ class StdRTStates(object):
     CONST = 8
     EVAL = 20
     ERROR = 21
+    COMPUTING = 22
 
 class CalculatorRuntimeStandard(CalculatorRuntime, metaclass=ABCMeta):
     """
@@ -248,6 +254,17 @@ class CalculatorRuntimeStandard(CalculatorRuntime, metaclass=ABCMeta):
         super().__init__()
 
         self._evaluator = evaluator
+        self._budget = EvaluationBudget(max_digits=config.EVAL_MAX_DIGITS, timeout=config.EVAL_TIMEOUT)
+
+        # evaluation running on the thread pool
+        self._task = None
+        self._evaluationStart = 0.0
+
+        # result preview, disabled unless `_enablePreview` is called
+        self._previewBudget = EvaluationBudget(max_digits=config.PREVIEW_MAX_DIGITS, timeout=config.PREVIEW_TIMEOUT)
+        self._previewTask = None
+        self._previewExpr = None
+        self._previewTimer = None
 
         # stack of states for current input
         self._stateStack = [StdRTStates.ANY]
@@ -350,6 +367,9 @@ class CalculatorRuntimeStandard(CalculatorRuntime, metaclass=ABCMeta):
         self._resetState()
 
     def reset(self):
+        self._cancelEvaluation()
+        self._cancelPreview()
+        self._previewExpr = None
         self.model.reset()
         self._resetState()
         self._uncloseBrackets = 0
@@ -362,7 +382,7 @@ class CalculatorRuntimeStandard(CalculatorRuntime, metaclass=ABCMeta):
         )
 
     def _canEvaluate(self):
-        if self._matchState(StdRTStates.EVAL, StdRTStates.ERROR):
+        if self._matchState(StdRTStates.EVAL, StdRTStates.ERROR, StdRTStates.COMPUTING):
             return False
         elif self.model.hint != '':
             return True
@@ -379,6 +399,9 @@ class CalculatorRuntimeStandard(CalculatorRuntime, metaclass=ABCMeta):
     def isError(self):
         return self._peekState() == StdRTStates.ERROR
 
+    def isComputing(self):
+        return self._task is not None
+
     ### handles ###
 
     def _clearHandle(self):
@@ -570,42 +593,156 @@ class CalculatorRuntimeStandard(CalculatorRuntime, metaclass=ABCMeta):
 
             self._setState(StdRTStates.R_BRACKET)
 
-    def evaluate(self):
-        def checkInnerErrType(err, cls):
-            return err.inner is not None and isinstance(err.inner, cls)
+    def _currentExpression(self) -> str:
+        model = self.model
+        if model.hint == '':
+            expr = model.input
+        else:
+            expr = model.hint + ' ' + model.input
 
+        # complement unmatched left brackets
+        if self._uncloseBrackets > 0:
+            expr += (')' * self._uncloseBrackets)
+
+        return expr
+
+    def evaluate(self):
         if self._canEvaluate():
             model = self.model
-            if model.hint == '':
-                expr = model.input
-            else:
-                expr = model.hint + ' ' + model.input
+            expr = self._currentExpression()
+            self._uncloseBrackets = 0
+
+            # evaluate on the thread pool so that heavy computation doesn't freeze the window,
+            # other input is ignored until the evaluation finishes or is cancelled
+            task = EvaluationTask(self._evaluator, expr, self._budget.start())
+            task.signals.finished.connect(self._onEvaluationFinished)
+            task.signals.failed.connect(self._onEvaluationFailed)
+
+            self._task = task
+            self._evaluationStart = time.perf_counter()
+            model.update(config.EVAL_COMPUTING_TEXT, expr + ' =')
+            self._setState(StdRTStates.COMPUTING)
 
-            # complement unmatched left brackets
-            if self._uncloseBrackets > 0:
-                expr += (')' * self._uncloseBrackets)
+            startTask(task)
+
+    def _cancelEvaluation(self):
+        if self._task is not None:
+            cancelTask(self._task)
+            self._task = None
+
+    def _onEvaluationFinished(self, task, output):
+        # results of cancelled or replaced tasks are dropped
+        if task is self._task:
+            self._task = None
+            self._recordEvaluationTime()
 
             try:
-                output = self._evaluator.evaluate(expr)
                 # model.update(f'{output:.20g}', expr + ' =')
-                model.update(formatNumber(output, 16, 12), expr + ' =')
+                self.model.update(formatNumber(output, 16, 12), task.expr + ' =')
                 self._setState(StdRTStates.EVAL)
             except Exception as err:
-                sys.stdout.write(f"error occurred during evaluation: {err}\n")
+                self._showError(err)
 
-                if isinstance(err, EvaluationException):
-                    if checkInnerErrType(err, ZeroDivisionError):
-                        model.update('ERROR: Zero Division', '')
-                    elif checkInnerErrType(err, ValueError):
-                        model.update('ERROR: Invalid Input', '')
-                    else:
-                        model.update('ERROR', '')
-                else:
-                    model.update('ERROR', '')
+    def _onEvaluationFailed(self, task, err):
+        if task is self._task:
+            self._task = None
+            self._recordEvaluationTime()
+            self._showError(err)
 
-                self._setState(StdRTStates.ERROR)
-            finally:
-                self._uncloseBrackets = 0
+    def _recordEvaluationTime(self):
+        if metrics.REGISTRY.enabled:
+            GUI_EVALUATION_SECONDS.observe(time.perf_counter() - self._evaluationStart)
+
+    def _showError(self, err):
+        sys.stdout.write(f"error occurred during evaluation: {err}\n")
+        self.model.update(formatError(err), '')
+        self._setState(StdRTStates.ERROR)
+
+    ### result preview ###
+
+    def _enablePreview(self):
+        """
+        show preview of the result while typing, previews are debounced and computed on the thread pool
+        """
+
+        self._previewTimer = QTimer()
+        self._previewTimer.setSingleShot(True)
+        self._previewTimer.setInterval(config.PREVIEW_DELAY)
+        self._previewTimer.timeout.connect(self._startPreview)
+
+        self.model.modelChange.connect(self._schedulePreview)
+
+    def _schedulePreview(self):
+        # keep current preview while an operator is pending, it gives no new result
+        if self._peekState() == StdRTStates.BINOP:
+            return
+
+        if not self.isComputing() and self._canEvaluate():
+            expr = self._currentExpression()
+        else:
+            expr = None
+
+        if expr != self._previewExpr:
+            self._previewExpr = expr
+            self._cancelPreview()
+
+            if expr is None:
+                self.model.preview = ''
+            else:
+                self._previewTimer.start()
+
+    def _cancelPreview(self):
+        if self._previewTimer is not None:
+            self._previewTimer.stop()
+
+        if self._previewTask is not None:
+            cancelTask(self._previewTask)
+            self._previewTask = None
+
+    def _startPreview(self):
+        if self._previewExpr is not None:
+            # preview shares the parse cache of the evaluator, so evaluating the same
+            # expression afterwards doesn't parse it again
+            task = EvaluationTask(self._evaluator, self._previewExpr, self._previewBudget.start())
+            task.signals.finished.connect(self._onPreviewFinished)
+            task.signals.failed.connect(self._onPreviewFailed)
+
+            self._previewTask = task
+            startTask(task)
+
+    def _onPreviewFinished(self, task, output):
+        if task is self._previewTask:
+            self._previewTask = None
+
+            try:
+                self.model.preview = formatNumber(output, 16, 12)
+            except Exception:
+                self.model.preview = ''
+
+    def _onPreviewFailed(self, task, err):
+        if task is self._previewTask:
+            self._previewTask = None
+            self.model.preview = ''
+
+    def _guardKeyboard(self, keyboard: List[List[KeyOption]]) -> List[List[KeyOption]]:
+        """
+        make key callbacks ignored during evaluation, except the ones cancelling it
+        """
+
+        def guard(callback):
+            @pyqtSlot()
+            def handle():
+                if not self.isComputing():
+                    callback()
+
+            return handle
+
+        for row in keyboard:
+            for key in row:
+                if key.callback is not None and key.callback != self._clearHandle:
+                    key.callback = guard(key.callback)
+
+        return keyboard
 
     # keyboard event handle
     def onKeyboardEvent(self, event):
@@ -624,7 +761,11 @@ class CalculatorRuntimeStandard(CalculatorRuntime, metaclass=ABCMeta):
         modifiers = event.modifiers()
         key = event.key()
 
-        if modifiers == Qt.NoModifier or modifiers == Qt.KeypadModifier:
+        if self.isComputing():
+            # only cancellation is accepted during evaluation
+            if key == Qt.Key_Escape:
+                self._clearHandle()
+        elif modifiers == Qt.NoModifier or modifiers == Qt.KeypadModifier:
             if Qt.Key_0 <= key <= Qt.Key_9:
                 self._numberHandle(str(key - Qt.Key_0))
             elif key == Qt.Key_Return or key == Qt.Key_Enter or key == Qt.Key_Equal:
@@ -643,11 +784,7 @@ class CalculatorRuntimeBasic(CalculatorRuntimeStandard):
     def __init__(self):
         super().__init__()
 
-        functions = {
-            'invert': lambda a: 1 / a
-        }
-        context = EvaluatorContext(functions=functions)
-        self._evaluator = Evaluator(context)
+        self._evaluator = Evaluator(standardContext())
 
         self._keyMap = {
             Qt.Key_Period: ((Qt.NoModifier, Qt.KeypadModifier), self._dotHandle),
@@ -662,7 +799,7 @@ class CalculatorRuntimeBasic(CalculatorRuntimeStandard):
     def getKeyboard(self):
         keySize = config.KEY_SIZE_STD
 
-        return [
+        return self._guardKeyboard([
             [
                 KeyOption('AC', fontSize=20, size=keySize, hoverColor=config.KEY_DANGER_BG_HOVER, callback=self._clearHandle),
                 KeyOption('+/-', size=keySize, callback=self._negetHandle),
@@ -694,7 +831,7 @@ class CalculatorRuntimeBasic(CalculatorRuntimeStandard):
                 KeyOption('=', fontSize=28, fontBold=True, buttonColor=config.KEY_EVAL_BG_DEFAULT, hoverColor=config.KEY_EVAL_BG_HOVER, size=keySize,
                     callback=self.evaluate)
             ]
-        ]
+        ])
 
     def getKeyboardDimension(self):
         return (4, 5, config.KEY_SIZE_STD, config.KEY_SIZE_STD)
@@ -703,28 +840,8 @@ class CalculatorRuntimePro(CalculatorRuntimeStandard):
     def __init__(self):
         super().__init__()
 
-        functions = {
-            'sqrt': math.sqrt,
-            'square': lambda a: a * a,
-            'cube': lambda a: a * a * a,
-            'degree': math.degrees,
-            'radians': math.radians,
-            'sin': math.sin,
-            'sind': lambda d: math.sin(math.radians(d)),
-            'cos': math.cos,
-            'cosd': lambda d: math.cos(math.radians(d)),
-            'tan': math.tan,
-            'tand': lambda d: math.tan(math.radians(d)),
-            'log': math.log10,
-            'ln': lambda a: math.log(a),        # cannot get spec from math.log directly, maybe a bug
-            'exp': math.exp,
-            'abs': abs,
-            'floor': math.floor,
-            'ceil': math.ceil,
-            'invert': lambda a: 1 / a
-        }
-        context = EvaluatorContext(functions=functions)
-        self._evaluator = Evaluator(context)
+        self._evaluator = Evaluator(proContext(), parse_cache=ParseCache(config.EVAL_PARSE_CACHE_SIZE))
+        self._enablePreview()
 
         self._keyMap = {
             Qt.Key_Period: ((Qt.NoModifier, Qt.KeypadModifier), self._dotHandle,),
@@ -810,7 +927,7 @@ class CalculatorRuntimePro(CalculatorRuntimeStandard):
                 if isinstance(key.text, str) and (key.text.isnumeric() or key.text == '.'):
                     key.hoverColor = config.KEY_SPECIAL_BG_HOVER
 
-        return keyboard
+        return self._guardKeyboard(keyboard)
 
     def getKeyboardDimension(self):
         return (9, 5, config.KEY_WIDTH_PRO, config.KEY_HEIGHT_PRO)
@@ -0,0 +1,84 @@
+from PyQt5.QtCore import pyqtSignal, QObject, QRunnable, QThreadPool
+
+from calculator.core.evaluator import Evaluator
+from calculator.core.budget import BudgetMeter
+
+
+class EvaluationTaskSignals(QObject):
+    """
+    signals of evaluation task, emitted from the worker thread
+    """
+
+    # emit task and evaluation result
+    finished = pyqtSignal(object, object)
+    # emit task and raised exception
+    failed = pyqtSignal(object, object)
+    # emit task once it has run, also when it was cancelled
+    done = pyqtSignal(object)
+
+class EvaluationTask(QRunnable):
+    """
+    evaluate an expression on a thread pool
+    """
+
+    def __init__(self, evaluator: Evaluator, expr: str, meter: BudgetMeter):
+        super().__init__()
+
+        self.expr = expr
+        self.signals = EvaluationTaskSignals()
+
+        self._evaluator = evaluator
+        self._meter = meter
+
+        # the pool doesn't own the task, `startTask` keeps a reference until the task has run
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        """
+        stop the evaluation at its next operation, the task emits neither signal afterwards
+        """
+
+        self._meter.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._meter.cancelled
+
+    def run(self):
+        try:
+            result = self._evaluator.evaluate(self.expr, meter=self._meter)
+        except Exception as err:
+            if not self.cancelled:
+                self.signals.failed.emit(self, err)
+        else:
+            if not self.cancelled:
+                self.signals.finished.emit(self, result)
+        finally:
+            self.signals.done.emit(self)
+
+
+# tasks queued or running on the thread pool, the Python reference is the only thing
+# keeping the underlying runnable alive
+_liveTasks = set()
+
+
+def _releaseTask(task: EvaluationTask):
+    _liveTasks.discard(task)
+
+def startTask(task: EvaluationTask):
+    """
+    run a task on the global thread pool, the task is kept alive until it has run
+    """
+
+    _liveTasks.add(task)
+    task.signals.done.connect(_releaseTask)
+    QThreadPool.globalInstance().start(task)
+
+def cancelTask(task: EvaluationTask):
+    """
+    cancel a task started by `startTask`, a task still waiting in the queue is taken back and never runs
+    """
+
+    task.cancel()
+    if QThreadPool.globalInstance().tryTake(task):
+        _releaseTask(task)
@@ -1,3 +1,10 @@
+import sys
+
 import calculator
 
-calculator.run()
\ No newline at end of file
+
+if len(sys.argv) > 1:
+    import calculator.cli
+    sys.exit(calculator.cli.main())
+else:
+    calculator.run()
\ No newline at end of file
@@ -0,0 +1,50 @@
+import unittest
+import os
+import math
+import tempfile
+
+from calculator.core.exception import ParsingException, EvaluationException
+from calculator.core.evaluator import *
+from calculator.core.batch import evaluate_many, evaluate_file
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self._context = EvaluatorContext(functions={'cos': math.cos, 'sqrt': math.sqrt})
+        self._expressions = ['1 + 2', 'cos(π)', '1 ÷ 0', '2 × (3', 'sqrt(16) ^ 2', 'foo(1)'] * 7
+
+    def _check(self, results):
+        evaluator = Evaluator(self._context)
+
+        self.assertEqual([r.index for r in results], list(range(len(self._expressions))))
+
+        for (exp, result) in zip(self._expressions, results):
+            try:
+                value = evaluator.evaluate(exp)
+            except (ParsingException, EvaluationException) as err:
+                self.assertFalse(result.ok)
+                self.assertIs(type(result.error), type(err))
+                self.assertEqual(result.error.args, err.args)
+            else:
+                self.assertTrue(result.ok)
+                self.assertEqual(result.value, value)
+
+    def test_in_process(self):
+        results = list(evaluate_many(self._expressions, self._context, workers=1, chunksize=4))
+        self._check(results)
+
+    def test_process_pool(self):
+        results = list(evaluate_many(iter(self._expressions), self._context, workers=2, chunksize=5, cache_size=8))
+        self._check(results)
+
+        zero_division = results[2].error
+        self.assertIsInstance(zero_division.inner, ZeroDivisionError)
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'input.txt')
+            with open(path, 'w', encoding='utf-8', newline='') as outf:
+                outf.write('\r\n\n'.join(self._expressions))
+
+            self._check(list(evaluate_file(path, self._context, workers=1, chunk_bytes=16)))
+            self._check(list(evaluate_file(path, self._context, workers=2, chunk_bytes=16)))
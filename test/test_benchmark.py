@@ -0,0 +1,68 @@
+import unittest
+import os
+import tempfile
+
+import calculator.core.parser as parser
+import calculator.core.nodes as nodes
+from calculator.core.evaluator import Evaluator
+from calculator.core.functions import proContext
+from benchmark.generator import ExpressionGenerator
+from benchmark.suite import (STAGES, BenchmarkConfig, run_stages, scaling_exponent, compare, save_baseline,
+    load_baseline)
+
+
+def count_operands(node: nodes.ExpNode) -> int:
+    # operands are combined by binary operators only, except powers which are part of an operand
+    if node.__class__ is nodes.BinaryOpNode and node.op != '^':
+        return count_operands(node.left) + count_operands(node.right)
+    else:
+        return 1
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_generator(self):
+        exps = ExpressionGenerator(seed=7).expressions(20, 16)
+        self.assertEqual(exps, ExpressionGenerator(seed=7).expressions(20, 16))
+        self.assertNotEqual(exps, ExpressionGenerator(seed=8).expressions(20, 16))
+
+        for exp in exps:
+            self.assertEqual(count_operands(parser.parse_expression(exp)), 16, exp)
+
+        # operator and function mix
+        gen = ExpressionGenerator(seed=1, operators={'×': 1}, functions=['sqrt'], function_rate=1, max_depth=1)
+        exp = gen.expression(4)
+        self.assertEqual(exp.count('×'), 3)
+        self.assertEqual(exp.count('sqrt('), 4)
+
+        # divisors are non-zero literals, so that large expressions are evaluated completely
+        evaluator = Evaluator(proContext())
+        for exp in ExpressionGenerator(seed=0).expressions(20, 1024):
+            self.assertIsInstance(evaluator.evaluate(exp), (int, float))
+
+        with self.assertRaises(ValueError):
+            ExpressionGenerator(functions=['nope'])
+        with self.assertRaises(ValueError):
+            ExpressionGenerator().expression(0)
+
+    def test_scaling_exponent(self):
+        sizes = [10, 20, 40, 80]
+        self.assertAlmostEqual(scaling_exponent(sizes, [s * 3.0 for s in sizes]), 1)
+        self.assertAlmostEqual(scaling_exponent(sizes, [s * s * 0.5 for s in sizes]), 2)
+
+    def test_baseline(self):
+        config = BenchmarkConfig(seed=3, count=5, size=8, rounds=1)
+        results = run_stages(config)
+        self.assertEqual(set(results), set(STAGES))
+        self.assertTrue(all(t > 0 for t in results.values()))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'baseline.json')
+            save_baseline(path, config, results)
+            baseline = load_baseline(path)
+
+        self.assertEqual(baseline['stages'], results)
+        self.assertEqual(BenchmarkConfig.from_dict(baseline['config']).to_dict(), config.to_dict())
+
+        slower = dict(results, tokenize=results['tokenize'] * 2)
+        self.assertEqual(compare(slower, results, 0.5), ['tokenize'])
+        self.assertEqual(compare(results, slower, 0.5), [])
@@ -0,0 +1,52 @@
+import unittest
+
+import calculator.core.parser as parser
+from calculator.core.cache import ParseCache
+from calculator.core.evaluator import *
+
+
+class ParseCacheTest(unittest.TestCase):
+    def test_cache_hit_and_miss(self):
+        cache = ParseCache(maxsize=4)
+
+        node1 = parser.parse_expression('1 + 2 × 3', cache)
+        node2 = parser.parse_expression('1 + 2 × 3', cache)
+        self.assertIs(node1, node2)
+
+        info = cache.info()
+        self.assertEqual(info.hits, 1)
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.currsize, 1)
+
+    def test_cache_eviction(self):
+        cache = ParseCache(maxsize=2)
+
+        parser.parse_expression('1', cache)
+        parser.parse_expression('2', cache)
+        parser.parse_expression('1', cache)
+        parser.parse_expression('3', cache)
+
+        self.assertIn('1', cache)
+        self.assertNotIn('2', cache)
+        self.assertEqual(cache.info().evictions, 1)
+
+        cache.resize(1)
+        self.assertEqual(len(cache), 1)
+        self.assertIn('3', cache)
+        self.assertEqual(cache.info().evictions, 2)
+
+        cache.clear(reset_stats=True)
+        info = cache.info()
+        self.assertEqual(info.currsize, 0)
+        self.assertEqual(info.hits + info.misses + info.evictions, 0)
+
+        with self.assertRaises(ValueError):
+            cache.resize(0)
+
+    def test_evaluator_with_cache(self):
+        cache = ParseCache()
+        evaluator = Evaluator(parse_cache=cache)
+
+        self.assertEqual(evaluator.evaluate('(1 + 2) × 3'), 9)
+        self.assertEqual(evaluator.evaluate('(1 + 2) × 3'), 9)
+        self.assertEqual(cache.info().hits, 1)
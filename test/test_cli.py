@@ -0,0 +1,77 @@
+import unittest
+import io
+import os
+import sys
+import subprocess
+import tempfile
+
+import calculator.core.metrics as metrics
+from calculator.cli import main
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CliTest(unittest.TestCase):
+    def _run(self, argv, text=''):
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        code = main(argv, stdin=io.StringIO(text), stdout=stdout, stderr=stderr)
+        return (code, stdout.getvalue().splitlines(), stderr.getvalue().splitlines())
+
+    def test_eval(self):
+        code, out, err = self._run(['--eval', '1 + 2 × 3'])
+        self.assertEqual(code, 0)
+        self.assertEqual(out, ['7'])
+        self.assertEqual(err, [])
+
+    def test_stream(self):
+        code, out, err = self._run(['--eval', '-'], '0.1 + 0.2\n\n2 ÷ 0\nsqrt(16)\n(1\nln(e)\n')
+        self.assertEqual(code, 1)
+        self.assertEqual(out, ['0.3', 'ERROR: Zero Division', '4', 'ERROR', '1'])
+        self.assertEqual(len(err), 2)
+
+    def test_budget(self):
+        code, out, err = self._run(['--eval', '-', '--max-digits', '100'], '2 ^ 10\n1000!\n')
+        self.assertEqual(code, 1)
+        self.assertEqual(out, ['1024', 'ERROR'])
+        self.assertEqual(err, ['expression 2: result too large'])
+
+    def test_metrics(self):
+        self.addCleanup(metrics.REGISTRY.reset)
+        self.addCleanup(setattr, metrics.REGISTRY, 'enabled', False)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'metrics.prom')
+            code, out, err = self._run(['--eval', '-', '--metrics', path], '1 + 1\n2 ×\n')
+            self.assertEqual(code, 1)
+
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+
+        self.assertIn('calculator_evaluate_seconds_count 2\n', text)
+        self.assertIn('calculator_evaluate_errors_total 1\n', text)
+
+    def test_batch_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'input.txt')
+            with open(path, 'w', encoding='utf-8') as outf:
+                outf.write('1 + 1\n2 ^ 10\n' * 50)
+
+            code, out, _ = self._run(['--batch', path, '--workers', '2', '--engine', 'vm'])
+            self.assertEqual(code, 0)
+            self.assertEqual(out, ['2', '1024'] * 50)
+
+    def test_no_qt_import(self):
+        script = ("import sys, runpy; sys.argv = ['main.py', '--eval', '3!']; "
+            "code = 0\n"
+            "try:\n"
+            "    runpy.run_path('main.py', run_name='__main__')\n"
+            "except SystemExit as e:\n"
+            "    code = e.code\n"
+            "assert code == 0\n"
+            "assert not any(m.startswith('PyQt5') for m in sys.modules), 'PyQt5 imported'\n")
+
+        proc = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True)
+        self.assertEqual(proc.returncode, 0, proc.stderr.decode('utf-8', 'replace'))
+        self.assertEqual(proc.stdout.decode('utf-8').strip(), '6')
@@ -1,8 +1,9 @@
 import unittest
 import math
+import pickle
 
 import calculator.core.parser as parser
-from calculator.core.exception import EvaluationException
+from calculator.core.exception import EvaluationException, BudgetExceededException
 from calculator.core.evaluator import *
 
 
@@ -16,6 +17,7 @@ class EvaluatorTest(unittest.TestCase):
 
         context = EvaluatorContext(constants=None, functions=functions)
         self._evaluator = Evaluator(context)
+        self._vm_evaluator = Evaluator(context, engine=ENGINE_VM)
 
     def test_basic_evaluation(self):
         v1 = self._evaluator.evaluate('1 + 2 - 5')
@@ -99,3 +101,282 @@ class EvaluatorTest(unittest.TestCase):
 
         with self.assertRaises(EvaluationException):
             self._evaluator.evaluate('(-1) ^ 0.5')
+
+    def test_inner_exception(self):
+        with self.assertRaises(EvaluationException) as cm:
+            self._evaluator.evaluate('2 + abs(1 - 1 ÷ 0)')
+
+        self.assertEqual(cm.exception.args[0], 'zero division')
+        self.assertIsInstance(cm.exception.inner, ZeroDivisionError)
+
+        with self.assertRaises(EvaluationException) as cm:
+            self._evaluator.evaluate('(0 - 3)!')
+
+        self.assertEqual(cm.exception.args[0], 'value error')
+        self.assertIsInstance(cm.exception.inner, ValueError)
+
+    def test_function_signature(self):
+        context = EvaluatorContext()
+        context.register_function('ln', math.log, arity=1)
+        context.register_function('log', math.log, arity=(1, 2))
+        context.register_function('total', lambda *args: sum(args))
+        evaluator = Evaluator(context)
+
+        self.assertEqual(evaluator.evaluate('ln(e)'), 1.0)
+        self.assertEqual(evaluator.evaluate('log(8, 2)'), 3.0)
+        self.assertEqual(evaluator.evaluate('total(1, 2, 3, 4)'), 10)
+        self.assertEqual(evaluator.evaluate('total()'), 0)
+
+        with self.assertRaises(EvaluationException) as cm:
+            evaluator.evaluate('ln(2, 3)')
+
+        self.assertIn('incorrect number of arguments', cm.exception.args[0])
+
+        with self.assertRaises(ValueError):
+            context.register_function('bad', math.log)
+
+        # required keyword-only arguments can't be passed from expressions
+        def scaled(a, *, factor):
+            return a * factor
+
+        with self.assertRaises(ValueError):
+            context.register_function('scaled', scaled)
+
+        context.functions['scaled'] = scaled
+        with self.assertRaises(EvaluationException) as cm:
+            evaluator.evaluate('scaled(2)')
+
+        self.assertIn('cannot resolve signature', cm.exception.args[0])
+
+        context.register_function('rounded', lambda a, *, digits=0: round(a, digits))
+        self.assertEqual(evaluator.evaluate('rounded(2.5)'), 2.0)
+
+        # functions added to the dict directly are resolved on first call
+        context.functions['twice'] = lambda a: a * 2
+        self.assertEqual(evaluator.evaluate('twice(4)'), 8)
+        context.functions['twice'] = lambda a, b: a * b
+        self.assertEqual(evaluator.evaluate('twice(4, 3)'), 12)
+
+    def test_compile(self):
+        expressions = [
+            '1 + 2 - 5', '1 ÷ 2 × 4', '(10 - 15) × 2', '1 + -4!', '2 ^ 0.5 % 1',
+            'abs(2-5)', 'cos(2 × π)', '1 - abs(-3) × 2', 'mult(10)', 'mult(10, 3)'
+        ]
+
+        for exp in expressions:
+            compiled = self._evaluator.compile(exp)
+            self.assertEqual(compiled(), self._evaluator.evaluate(exp), exp)
+            self.assertEqual(compiled(), self._evaluator.evaluate(exp), exp)
+
+        invalid_expressions = [
+            '1 + a - 2', '1 + foo(10) × 2', 'abs(1, -2)', 'mult()', '1 ÷ 0', '(-1) ^ 0.5', '(0 - 3)!'
+        ]
+
+        for exp in invalid_expressions:
+            compiled = self._evaluator.compile(exp)
+
+            with self.assertRaises(EvaluationException) as cm:
+                self._evaluator.evaluate(exp)
+
+            with self.assertRaises(EvaluationException) as cm_compiled:
+                compiled()
+
+            self.assertEqual(cm.exception.args, cm_compiled.exception.args, exp)
+            self.assertIs(type(cm.exception.inner), type(cm_compiled.exception.inner), exp)
+
+    def test_vm_engine(self):
+        expressions = [
+            '1 + 2 - 5', '1 ÷ 2 × 4', '(10 - 15) × 2', '1 + -4!', '2 ^ 0.5 % 1', '1.0 + 1',
+            'abs(2-5)', 'cos(2 × π)', '1 - abs(-3) × 2', 'mult(10)', 'mult(10, 3)'
+        ]
+
+        for exp in expressions:
+            value = self._evaluator.evaluate(exp)
+            self.assertEqual(self._vm_evaluator.evaluate(exp), value, exp)
+            self.assertEqual(self._evaluator.evaluate(self._evaluator.assemble(exp)), value, exp)
+
+        invalid_expressions = [
+            '1 + a - 2', '1 + foo(1 ÷ 0) × 2', 'abs(1, -2)', 'mult()', '1 ÷ 0', '(-1) ^ 0.5', '(0 - 3)!'
+        ]
+
+        for exp in invalid_expressions:
+            with self.assertRaises(EvaluationException) as cm:
+                self._evaluator.evaluate(exp)
+
+            with self.assertRaises(EvaluationException) as cm_vm:
+                self._vm_evaluator.evaluate(exp)
+
+            self.assertEqual(cm.exception.args, cm_vm.exception.args, exp)
+            self.assertIs(type(cm.exception.inner), type(cm_vm.exception.inner), exp)
+
+    def test_vm_deep_expression(self):
+        exp = '-(' * 5000 + '1' + ')' * 5000 + ' + 1' * 5000
+        self.assertEqual(self._vm_evaluator.evaluate(exp), 5001)
+
+    def test_prepare(self):
+        prepared = self._evaluator.prepare('a × x ^ 2 + b', params=['a', 'x', 'b'])
+
+        self.assertEqual(prepared(1, 2, 3), 7)
+        self.assertEqual(prepared(a=2, x=3, b=1), 19)
+        self.assertEqual(prepared(2, b=0, x=1), 2)
+
+        bound = prepared.bind(a=2, b=0)
+        self.assertEqual(bound.free_params, ('x',))
+        self.assertEqual(bound(3), 18)
+        self.assertEqual(bound(x=4), 32)
+        self.assertEqual(prepared(1, 1, 1), 2)
+
+        with self.assertRaises(TypeError):
+            prepared(1, 2)
+
+        with self.assertRaises(TypeError):
+            bound(1, x=2)
+
+        with self.assertRaises(TypeError):
+            bound(y=2)
+
+        # parameters shadow constants
+        prepared = self._evaluator.prepare('e + abs(π)', params=['e'])
+        self.assertEqual(prepared(1), 1 + math.pi)
+
+        prepared = self._evaluator.prepare('1 ÷ x', params=['x'])
+        with self.assertRaises(EvaluationException) as cm:
+            prepared(0)
+
+        self.assertIsInstance(cm.exception.inner, ZeroDivisionError)
+
+    def test_budget(self):
+        context = EvaluatorContext(functions={'cos': math.cos})
+        budget = EvaluationBudget(max_digits=1000, max_operations=100)
+
+        evaluator = Evaluator(context, budget=budget)
+        self.assertEqual(evaluator.evaluate('2 ^ 100 + 10!'), 2 ** 100 + math.factorial(10))
+        self.assertEqual(evaluator.evaluate('cos(0) × 2 ^ 0.5'), 2 ** 0.5)
+        self.assertEqual(evaluator.evaluate(evaluator.assemble('(10 ^ 400) × (10 ^ 400)')), 10 ** 800)
+
+        cases = [
+            ('2 ^ 9 ^ 9 ^ 9', 'digits'),
+            ('(9 ^ 9) ^ (9 ^ 9)', 'digits'),
+            ('100000!', 'digits'),
+            ('(500 + 0.0)!', 'digits'),
+            ('(10 ^ 600) × (10 ^ 600)', 'digits'),
+            (' + '.join(['1'] * 200), 'operations')
+        ]
+
+        for (exp, limit) in cases:
+            with self.assertRaises(BudgetExceededException) as cm:
+                evaluator.evaluate(exp)
+
+            self.assertEqual(cm.exception.limit, limit, exp)
+
+        # other errors are raised as before
+        with self.assertRaises(EvaluationException) as cm:
+            evaluator.evaluate('1 ÷ 0')
+
+        self.assertIsInstance(cm.exception.inner, ZeroDivisionError)
+
+        evaluator = Evaluator(context, budget=EvaluationBudget(timeout=0))
+        with self.assertRaises(BudgetExceededException) as cm:
+            evaluator.evaluate('1 + 1')
+
+        self.assertEqual(cm.exception.limit, 'timeout')
+
+        # cancelled meters abort at the next operation
+        meter = EvaluationBudget().start()
+        meter.cancel()
+        with self.assertRaises(BudgetExceededException) as cm:
+            self._evaluator.evaluate('1 + 1', meter=meter)
+
+        self.assertEqual(cm.exception.limit, 'cancelled')
+
+    def test_function_registry(self):
+        calls = []
+
+        def slow_square(a):
+            calls.append(a)
+            return a * a
+
+        context = EvaluatorContext(functions={'cos': math.cos})
+        context.register_function('sq', slow_square, pure=True, cost=10, memo_size=2)
+        context.register_function('ln', math.log, arity=1, pure=True)
+
+        # plain functions get default metadata
+        info = context.get_function_info('cos')
+        self.assertFalse(info.pure)
+        self.assertEqual(info.cost, 1)
+        self.assertEqual(info.signature.min_argc, 1)
+        self.assertIsNone(context.get_function_info('tan'))
+        self.assertEqual(context.pure_functions(), frozenset(['sq', 'ln']))
+
+        evaluator = Evaluator(context)
+        self.assertEqual(evaluator.evaluate('sq(3) + sq(3) + sq(3.0) + cos(0)'), 28)
+        self.assertEqual(calls, [3, 3.0])
+
+        info = context.get_function_info('sq')
+        self.assertTrue(info.memoized)
+        self.assertEqual(info.fun.cache_info().hits, 1)
+
+        # call cost is counted by budgets
+        evaluator = Evaluator(context, budget=EvaluationBudget(max_operations=15))
+        self.assertEqual(evaluator.evaluate('sq(2) + 1'), 5)
+        with self.assertRaises(BudgetExceededException):
+            evaluator.evaluate('sq(2) + sq(3)')
+
+        # replacing a function through the dict resets its metadata
+        context.functions['sq'] = lambda a: a
+        self.assertFalse(context.get_function_info('sq').pure)
+        self.assertEqual(context.pure_functions(), frozenset(['ln']))
+
+    def test_layered_context(self):
+        base = EvaluatorContext(constants={'g': 9.8}, functions={'cos': math.cos})
+        base.register_function('ln', math.log, arity=1, pure=True)
+
+        with self.assertRaises(ValueError):
+            base.derive()
+
+        base.freeze()
+        with self.assertRaises(TypeError):
+            base.constants['g'] = 10
+        with self.assertRaises(TypeError):
+            base.register_function('sin', math.sin)
+
+        # overlay shadows and extends the parent without modifying it
+        child = base.derive(constants={'g': 10, 'h': 2}, functions={'sin': math.sin})
+        evaluator = Evaluator(child)
+        self.assertEqual(evaluator.evaluate('cos(0) + sin(0) + g × h'), 21)
+        self.assertAlmostEqual(evaluator.evaluate('ln(e) + π'), 1 + math.pi)
+        self.assertEqual(Evaluator(child, engine=ENGINE_VM).evaluate('g × h + cos(0)'), 21)
+        self.assertEqual(base.constants['g'], 9.8)
+        self.assertNotIn('h', base.constants)
+        self.assertEqual(set(child.constants), {'g', 'h', 'π', 'e'})
+        self.assertEqual(len(child.functions), 3)
+
+        # metadata of inherited functions is shared
+        self.assertIs(child.get_function_info('ln'), base.get_function_info('ln'))
+        self.assertEqual(child.pure_functions(), frozenset(['ln']))
+
+        with self.assertRaises(KeyError):
+            del child.constants['π']
+        del child.constants['g']
+        self.assertEqual(child.constants['g'], 9.8)
+
+        # lookups stay correct through a chain of layers longer than the flattening limit
+        context = base
+        for i in range(10):
+            context = context.derive(constants={f'c{i}': i}).freeze()
+        self.assertEqual(Evaluator(context).evaluate('c0 + c9 + g'), 18.8)
+
+        # frozen contexts are hashable and compare by content
+        other = base.derive(constants={'h': 2}).freeze()
+        same = base.derive(constants={'h': 2}).freeze()
+        self.assertEqual(other, same)
+        self.assertEqual(hash(other), hash(same))
+        self.assertNotEqual(other, base)
+        self.assertEqual({other: 1}[same], 1)
+        with self.assertRaises(TypeError):
+            hash(child)
+
+        restored = pickle.loads(pickle.dumps(other))
+        self.assertTrue(restored.frozen)
+        self.assertEqual(restored.constants['h'], 2)
+        self.assertTrue(restored.get_function_info('ln').pure)
@@ -0,0 +1,115 @@
+import unittest
+import math
+
+import calculator.core.parser as parser
+from calculator.core.flat import FlatAST, evaluate_flat
+from calculator.core.evaluator import EvaluatorContext, Evaluator, EvaluationBudget
+from calculator.core.functions import proContext
+from calculator.core.exception import EvaluationException, ParsingException, BudgetExceededException
+
+from _util import NodeComparator
+
+
+class FlatASTTest(unittest.TestCase):
+    EXPRESSIONS = [
+        '1',
+        'π',
+        '-3!',
+        '1 + 2 × 3 - 4 ÷ 5',
+        '2 ^ 3 ^ 2',
+        '(1 + 2) × (3 - 4) % 5',
+        '-(2 + 3) × +4',
+        'cos(0) + sin(π ÷ 2) + sqrt(16)',
+        'max(1, 2 + 3, cos(0)) - min(4, -5)',
+        '10 - 2.5 × (3 + 4 ÷ (2 - 1))',
+        'abs(-(5 - 3)!) + e'
+    ]
+
+    def setUp(self):
+        self.node_comparator = NodeComparator()
+        self._context = proContext()
+        self._context.functions['max'] = lambda *values: max(values)
+        self._context.functions['min'] = lambda a, b: min(a, b)
+        self._evaluator = Evaluator(self._context)
+
+    def test_parsing(self):
+        ast = FlatAST()
+        for exp in self.EXPRESSIONS:
+            tree = parser.parse_expression(exp)
+            index = ast.append(exp)
+            self.assertTrue(self.node_comparator.compare(ast.to_node(index), tree), exp)
+
+            # copying a node tree gives the same rows as parsing into the columns
+            copy = ast.append_node(tree)
+            self.assertTrue(self.node_comparator.compare(ast.to_node(copy), tree), exp)
+
+        self.assertEqual(len(ast), len(self.EXPRESSIONS) * 2)
+
+    def test_interning(self):
+        ast = FlatAST()
+        ast.append('1 + 1 + x + x')
+        ast.append('x × 1.0 + cos(x)')
+
+        self.assertEqual(ast.literals, [1, 1.0])
+        self.assertIsInstance(ast.literals[1], float)
+        self.assertEqual(ast.names, ['x', 'cos'])
+        self.assertEqual(ast.node_count, 7 + 6)
+
+    def test_failed_append(self):
+        ast = FlatAST()
+        ast.append('1 + 2')
+        sizes = [len(c) for c in (ast.kind, ast.op, ast.value, ast.left, ast.right, ast.pos, ast.args, ast.roots)]
+
+        for exp in ['1 + cos(2 × 3', '(1 + 2) × 3)', '1 +']:
+            with self.assertRaises(ParsingException, msg=exp):
+                ast.append(exp)
+
+        self.assertEqual(
+            [len(c) for c in (ast.kind, ast.op, ast.value, ast.left, ast.right, ast.pos, ast.args, ast.roots)], sizes)
+        self.assertEqual(evaluate_flat(ast, 0, self._context), 3)
+
+    def test_evaluation(self):
+        ast = FlatAST()
+        for exp in self.EXPRESSIONS:
+            index = ast.append(exp)
+            self.assertEqual(evaluate_flat(ast, index, self._context), self._evaluator.evaluate(exp), exp)
+            self.assertEqual(self._evaluator.evaluate_flat(ast, index), self._evaluator.evaluate(exp), exp)
+
+        # large expressions are evaluated without recursion
+        index = ast.append(' + '.join(['1'] * 5000))
+        self.assertEqual(evaluate_flat(ast, index, self._context), 5000)
+
+    def test_errors(self):
+        context = EvaluatorContext(constants={'x': 2}, functions={'cos': math.cos, 'sqrt': math.sqrt})
+        evaluator = Evaluator(context)
+
+        # errors and their order match the tree walking engine
+        cases = [
+            'y + 1',
+            'f(1)',
+            'cos(1, 2)',
+            'unknown(1 ÷ 0)',
+            '1 ÷ 0 + f(2)',
+            'sqrt(0 - 1)',
+            '(0 - 8) ^ 0.5',
+            'x % 0'
+        ]
+
+        ast = FlatAST()
+        for exp in cases:
+            index = ast.append(exp)
+            with self.assertRaises(EvaluationException, msg=exp) as expected:
+                evaluator.evaluate(exp)
+            with self.assertRaises(EvaluationException, msg=exp) as cm:
+                evaluator.evaluate_flat(ast, index)
+
+            self.assertEqual(cm.exception.args[0], expected.exception.args[0], exp)
+            self.assertIs(type(cm.exception.inner), type(expected.exception.inner), exp)
+
+    def test_budget(self):
+        evaluator = Evaluator(self._context, budget=EvaluationBudget(max_digits=1000))
+
+        ast = FlatAST()
+        self.assertEqual(evaluator.evaluate_flat(ast, ast.append('2 ^ 100 + 10!')), 2 ** 100 + math.factorial(10))
+        with self.assertRaises(BudgetExceededException):
+            evaluator.evaluate_flat(ast, ast.append('(10 ^ 600) × (10 ^ 600)'))
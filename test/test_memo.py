@@ -0,0 +1,108 @@
+import unittest
+import math
+
+import calculator.core.parser as parser
+import calculator.core.memo as memo_module
+from calculator.core.exception import EvaluationException
+from calculator.core.evaluator import *
+from calculator.core.hashing import structural_hash, structurally_equal
+
+
+class MemoTest(unittest.TestCase):
+    def setUp(self):
+        self._calls = 0
+
+        def norm(a, b):
+            self._calls += 1
+            return math.sqrt(a * a + b * b)
+
+        self._context = EvaluatorContext(constants={'x': 3, 'y': 4}, functions={'norm': norm, 'rand': lambda: 0.5})
+        self._memo = SubtreeMemo(64, pure_functions=['norm'])
+        self._evaluator = Evaluator(self._context, memo=self._memo)
+        self._ref_evaluator = Evaluator(self._context)
+
+    def test_structural_hash(self):
+        h = lambda exp: structural_hash(parser.parse_expression(exp))
+
+        self.assertEqual(h('1 + norm(x, 2 × y)'), h('norm(x, y × 2) + 1'))
+        self.assertEqual(h('(1 + 2)'), h('1 + 2'))
+        self.assertNotEqual(h('1 - 2'), h('2 - 1'))
+        self.assertNotEqual(h('1 ÷ 2'), h('2 ÷ 1'))
+        self.assertNotEqual(h('1'), h('1.0'))
+        self.assertNotEqual(h('norm(1, 2)'), h('norm(12)'))
+        self.assertTrue(structurally_equal(parser.parse_expression('x × e'), parser.parse_expression('e × x')))
+        self.assertTrue(structurally_equal(parser.parse_expression('norm(1 + x, 2) × e'),
+                                           parser.parse_expression('e × norm(x + 1, 2)')))
+        self.assertFalse(structurally_equal(parser.parse_expression('norm(1, 2)'), parser.parse_expression('norm(2, 1)')))
+
+        # hashes of different literals may collide, equality compares the literals themselves
+        big = parser.parse_expression(f'{2 ** 61} + 1')
+        self.assertEqual(h(f'{2 ** 61} + 1'), h('1 + 1'))
+        self.assertFalse(structurally_equal(big, parser.parse_expression('1 + 1')))
+        self.assertTrue(structurally_equal(big, parser.parse_expression(f'1 + {2 ** 61}')))
+
+        deep = parser.parse_expression(' + '.join(['1'] * 50000))
+        self.assertIsInstance(structural_hash(deep), int)
+
+    def test_memoized_results(self):
+        expressions = ['norm(x, y) + 1', '2 × norm(x, y)', 'norm(x, y) ^ 2 - rand()', '(1 + norm(x, y)) × 3']
+        for exp in expressions:
+            self.assertEqual(self._evaluator.evaluate(exp), self._ref_evaluator.evaluate(exp), exp)
+
+        # norm is computed once by the memo evaluator and once for each reference evaluation
+        self.assertEqual(self._calls, 1 + len(expressions))
+
+        for exp in ['1 ÷ 0 + norm(x, y)', 'unknown + 1', 'norm(x)', '(0 - 1) ^ 0.5 + 0']:
+            with self.assertRaises(EvaluationException) as cm:
+                self._evaluator.evaluate(exp)
+
+            with self.assertRaises(EvaluationException) as cm_ref:
+                self._ref_evaluator.evaluate(exp)
+
+            self.assertEqual(cm.exception.args, cm_ref.exception.args, exp)
+
+    def test_hash_collision(self):
+        context = EvaluatorContext(functions={'sqrt': math.sqrt})
+        evaluator = Evaluator(context, memo=SubtreeMemo(64, pure_functions=['sqrt']))
+
+        self.assertEqual(evaluator.evaluate('1 + 1'), 2)
+        self.assertEqual(evaluator.evaluate(f'{2 ** 61} + 1'), 2 ** 61 + 1)
+        self.assertEqual(evaluator.evaluate('sqrt(1) + 0'), 1.0)
+        self.assertEqual(evaluator.evaluate(f'sqrt({2 ** 61}) + 0'), math.sqrt(2 ** 61))
+        self.assertEqual(evaluator.evaluate('sqrt(1) + 0'), 1.0)
+
+    def test_invalidation(self):
+        self.assertEqual(self._evaluator.evaluate('norm(x, y) + 1'), 6)
+
+        self._context.constants['x'] = 6
+        self._context.constants['y'] = 8
+        self.assertEqual(self._evaluator.evaluate('norm(x, y) + 1'), 11)
+
+        self._context.register_function('norm', lambda a, b: a + b)
+        self.assertEqual(self._evaluator.evaluate('norm(x, y) + 1'), 15)
+
+        other = EvaluatorContext(constants={'x': 1, 'y': 1}, functions={'norm': lambda a, b: 0})
+        self.assertEqual(Evaluator(other, memo=self._memo).evaluate('norm(x, y) + 1'), 1)
+
+    def test_registered_purity(self):
+        context = EvaluatorContext()
+        context.register_function('sq', lambda a: a * a, pure=True, memo_size=4)
+        context.register_function('rand', lambda: 0.5)
+
+        memo = SubtreeMemo(16)
+        evaluator = Evaluator(context, memo=memo)
+        self.assertEqual(evaluator.evaluate('sq(2) + 1 + rand()'), 5.5)
+        self.assertEqual(memo.info().currsize, 1)       # sq(2), sq(2) + 1 is too small to be memoized
+
+        # the largest pure subtrees are memoized along with calls of pure functions
+        self.assertEqual(evaluator.evaluate('sq(3) + (1 + 2 + 3 + 4 + 5) × rand()'), 16.5)
+        self.assertEqual(memo.info().currsize, 3)
+
+    def test_structure_table(self):
+        self.addCleanup(setattr, memo_module, 'MAX_STRUCTURES', memo_module.MAX_STRUCTURES)
+        memo_module.MAX_STRUCTURES = 4
+
+        # numbering starts over once the table is full, results stay correct across restarts
+        for _ in range(3):
+            for exp in ['norm(x, y) + 1', 'norm(y, x) × 2', 'norm(x + 1, y) - norm(x, y)']:
+                self.assertEqual(self._evaluator.evaluate(exp), self._ref_evaluator.evaluate(exp), exp)
@@ -0,0 +1,95 @@
+import unittest
+import json
+import os
+import tempfile
+
+import calculator.core.metrics as metrics
+from calculator.core.exception import ParsingException
+from calculator.core.evaluator import *
+
+
+class MetricsTest(unittest.TestCase):
+    def tearDown(self):
+        metrics.REGISTRY.enabled = False
+        metrics.REGISTRY.reset()
+
+    def test_histogram(self):
+        hist = metrics.Histogram('latency_seconds', 'latency', buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            hist.observe(value)
+
+        self.assertEqual(hist.count, 4)
+        self.assertAlmostEqual(hist.sum, 2.65)
+        self.assertEqual(hist.cumulative_counts(), [2, 3, 4])
+        self.assertEqual(hist.prometheus_lines(), [
+            'latency_seconds_bucket{le="0.1"} 2',
+            'latency_seconds_bucket{le="1.0"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            'latency_seconds_sum 2.65',
+            'latency_seconds_count 4'
+        ])
+
+        with self.assertRaises(ValueError):
+            metrics.Histogram('bad', 'bad', buckets=(1.0, 0.1))
+
+    def test_registry(self):
+        registry = metrics.MetricsRegistry(enabled=True)
+        counter = registry.counter('calls_total', 'calls')
+        self.assertIs(registry.counter('calls_total', 'calls'), counter)
+        with self.assertRaises(ValueError):
+            registry.histogram('calls_total', 'calls')
+
+        hist = registry.histogram('call_seconds', 'call time')
+
+        @metrics.timed(hist, counter, registry=registry)
+        def half(a):
+            return 1 / a * 0.5
+
+        self.assertEqual(half(1), 0.5)
+        with self.assertRaises(ZeroDivisionError):
+            half(0)
+        self.assertEqual(hist.count, 2)
+        self.assertEqual(counter.value, 1)
+
+        # nothing is recorded while disabled
+        registry.enabled = False
+        half(2)
+        self.assertEqual(hist.count, 2)
+
+        text = registry.to_prometheus()
+        self.assertIn('# TYPE calls_total counter\ncalls_total 1\n', text)
+        self.assertIn('# TYPE call_seconds histogram\n', text)
+        self.assertIn('call_seconds_count 2\n', text)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            registry.write(os.path.join(tmp, 'metrics.json'))
+            with open(os.path.join(tmp, 'metrics.json'), encoding='utf-8') as f:
+                snapshot = json.load(f)
+
+            registry.write(os.path.join(tmp, 'metrics.prom'))
+            with open(os.path.join(tmp, 'metrics.prom'), encoding='utf-8') as f:
+                self.assertEqual(f.read(), text)
+
+            # temporary files are replaced
+            self.assertEqual(sorted(os.listdir(tmp)), ['metrics.json', 'metrics.prom'])
+
+        self.assertEqual(snapshot['calls_total']['value'], 1)
+        self.assertEqual(snapshot['call_seconds']['count'], 2)
+
+    def test_instrumentation(self):
+        registry = metrics.REGISTRY
+        evaluator = Evaluator()
+
+        evaluator.evaluate('1 + 2')
+        self.assertEqual(registry.get('calculator_evaluate_seconds').count, 0)
+
+        registry.enabled = True
+        evaluator.evaluate('1 + 2')
+        with self.assertRaises(ParsingException):
+            evaluator.evaluate('1 +')
+
+        self.assertEqual(registry.get('calculator_evaluate_seconds').count, 2)
+        self.assertEqual(registry.get('calculator_evaluate_errors_total').value, 1)
+        self.assertEqual(registry.get('calculator_tokenize_seconds').count, 2)
+        self.assertEqual(registry.get('calculator_build_tree_seconds').count, 2)
+        self.assertEqual(registry.get('calculator_build_tree_errors_total').value, 1)
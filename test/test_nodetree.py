@@ -1,4 +1,5 @@
 import unittest
+import weakref
 
 import calculator.core.parser as parser
 from calculator.core.nodes import *
@@ -359,3 +360,44 @@ class NodeTreeTest(unittest.TestCase):
             NodeTreeTest._to_node_tree('1+ 1, 2 × 2')
 
         self.assertIn('unexpected token', cm.exception.args[0])
+
+    def test_legacy_equivalence(self):
+        expressions = [
+            '1 - 2 × 3 + 4', '2 ^ 3 × 4 + 5', '1 - 2 - 3 - 4', '-3! + (-2)!',
+            '3 + (2×(-1 + 10)) -5.5', 'pow(log(100, 5 × 2), 2) % -e', 'f()', 'f(1, -g(2)!,)'
+        ]
+
+        for exp in expressions:
+            tokens = parser.tokenize(exp)
+            node = parser.build_expression_tree(tokens)
+            ref_node = parser.build_expression_tree(tokens, legacy=True)
+            self.assertTrue(self.node_comparator.compare(node, ref_node), exp)
+
+    def test_large_expression(self):
+        node = NodeTreeTest._to_node_tree(' + '.join(['1'] * 5000))
+        self.assertIsInstance(node, BinaryOpNode)
+
+        node = NodeTreeTest._to_node_tree('(' * 5000 + '1' + ')' * 5000)
+        self.assertIsInstance(node, NumberNode)
+        self.assertEqual(node.pos, 5000)
+
+    def test_compact_nodes(self):
+        node = NodeTreeTest._to_node_tree('f(1, -x) × 2')
+        self.assertFalse(hasattr(node, '__dict__'))
+        self.assertFalse(hasattr(node.left.args[1], '__dict__'))
+
+        with self.assertRaises(AttributeError):
+            node.extra = 1
+
+        # trees can be keys of weak mappings
+        self.assertIs(weakref.ref(node)(), node)
+        self.assertEqual(str(node.left), 'FuncCall(f, args=[NumberNode(1), UnaryOpNode(-, NameConstantNode(x))])')
+
+    def test_incomplete_expression(self):
+        with self.assertRaises(ParsingException) as cm:
+            NodeTreeTest._to_node_tree('1 + ')
+
+        self.assertIn('unexpected token', cm.exception.args[0])
+
+        with self.assertRaises(ParsingException):
+            NodeTreeTest._to_node_tree('(')
@@ -0,0 +1,114 @@
+import unittest
+import math
+
+import calculator.core.parser as parser
+from calculator.core.nodes import *
+from calculator.core.exception import EvaluationException
+from calculator.core.evaluator import *
+from calculator.core.optimizer import optimize
+
+from _util import NodeComparator
+
+
+class OptimizerTest(unittest.TestCase):
+    def setUp(self):
+        functions = {
+            'sin': math.sin,
+            'rand': lambda: 4
+        }
+
+        self._context = EvaluatorContext(functions=functions)
+        self._evaluator = Evaluator(self._context)
+        self.node_comparator = NodeComparator()
+
+    def _optimize(self, exp, **kwargs):
+        return optimize(parser.parse_expression(exp), self._context, pure_functions=['sin'], **kwargs)
+
+    def test_constant_folding(self):
+        node = self._optimize('2 × π ÷ 360')
+        self.assertIsInstance(node, NumberNode)
+        self.assertEqual(node.num, self._evaluator.evaluate('2 × π ÷ 360'))
+
+        node = self._optimize('sin(0) + -(3!)')
+        self.assertTrue(self.node_comparator.compare(node, NumberNode(-6, pos=7)))
+
+        # impure functions are kept
+        node = self._optimize('rand() × 2')
+        self.assertIsInstance(node, BinaryOpNode)
+        self.assertIsInstance(node.left, FuncCallNode)
+
+    def test_identities(self):
+        node = self._optimize('(x - 0) × 1 ^ 1')
+        self.assertTrue(self.node_comparator.compare(node, NameConstantNode('x', pos=1)))
+
+        # adding zero turns -0.0 into 0.0, so it is kept
+        negative_zero = Evaluator(EvaluatorContext(constants={'x': -0.0}))
+        for exp in ['x + 0', '0 + x']:
+            node = self._optimize(exp)
+            self.assertIsInstance(node, BinaryOpNode)
+            self.assertEqual(math.copysign(1, negative_zero.evaluate(node)), 1.0, exp)
+
+        # function results may be complex, which binary operations reject
+        node = self._optimize('rand() + 0')
+        self.assertIsInstance(node, BinaryOpNode)
+
+        node = self._optimize('-(-x) - 0')
+        self.assertTrue(self.node_comparator.compare(node, NameConstantNode('x', pos=3)))
+
+        # float literals may change result type and are left alone
+        node = self._optimize('x + 0.0')
+        self.assertIsInstance(node, BinaryOpNode)
+
+        node = self._optimize('x ^ 2')
+        self.assertEqual(node.op, '^')
+
+        node = self._optimize('x ^ 2', strength_reduce=True)
+        self.assertTrue(self.node_comparator.compare(
+            node, BinaryOpNode('×', NameConstantNode('x', pos=0), NameConstantNode('x', pos=0), pos=2)
+        ))
+
+    def test_error_preserved(self):
+        for exp in ['1 + 1 ÷ 0', '(0 - 3)! × 0', '(-1) ^ 0.5 + 0', 'x × 1', 'sin(1, 2) - 0']:
+            node = parser.parse_expression(exp)
+            optimized = optimize(node, self._context, pure_functions=['sin'])
+
+            with self.assertRaises(EvaluationException) as cm:
+                self._evaluator.evaluate(node)
+
+            with self.assertRaises(EvaluationException) as cm_optimized:
+                self._evaluator.evaluate(optimized)
+
+            self.assertEqual(cm.exception.args, cm_optimized.exception.args, exp)
+
+    def test_budget(self):
+        budget = EvaluationBudget(max_digits=100)
+
+        node = self._optimize('2 ^ 10 + 10!', budget=budget)
+        self.assertTrue(self.node_comparator.compare(node, NumberNode(1024 + 3628800, pos=7)))
+
+        # huge results are left for evaluation to reject
+        for exp in ['9 ^ (9 ^ 9)', '1000!', '(10 ^ 60) × (10 ^ 60)']:
+            node = self._optimize(exp, budget=budget)
+            self.assertIsNot(node.__class__, NumberNode, exp)
+
+    def test_registered_pure_functions(self):
+        context = EvaluatorContext(functions={'cos': math.cos})
+        context.register_function('sin', math.sin, pure=True)
+
+        node = optimize(parser.parse_expression('sin(0) + cos(0)'), context)
+        self.assertTrue(self.node_comparator.compare(
+            node, BinaryOpNode('+', NumberNode(0.0, pos=0), FuncCallNode('cos', [NumberNode(0, pos=13)], pos=9), pos=7)
+        ))
+
+    def test_tree_not_modified(self):
+        node = parser.parse_expression('(1 + 2) × rand()')
+        optimize(node, self._context)
+
+        ref_node = BinaryOpNode(
+            '×',
+            BinaryOpNode('+', NumberNode(1, pos=1), NumberNode(2, pos=5), pos=3),
+            FuncCallNode('rand', [], pos=10),
+            pos=8
+        )
+
+        self.assertTrue(self.node_comparator.compare(node, ref_node))
@@ -0,0 +1,44 @@
+import unittest
+import os
+import tempfile
+
+from calculator.core.reader import read_records, byte_ranges
+
+
+class ReaderTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write(self, data: bytes) -> str:
+        path = os.path.join(self._tmp.name, 'input.txt')
+        with open(path, 'wb') as outf:
+            outf.write(data)
+
+        return path
+
+    def test_records(self):
+        path = self._write('1 + 2\r\n\r\n2 × π\nsqrt(4)'.encode('utf-8'))
+        self.assertEqual(list(read_records(path)), ['1 + 2', '', '2 × π', 'sqrt(4)'])
+
+        path = self._write(b'1\n2\n')
+        self.assertEqual(list(read_records(path)), ['1', '2'])
+
+        path = self._write(b'')
+        self.assertEqual(list(read_records(path)), [])
+
+    def test_ranges(self):
+        lines = [f'{i} × π + {"1" * (i % 7)}' for i in range(200)]
+        path = self._write('\n'.join(lines).encode('utf-8'))
+
+        # every chunk size, including ones splitting multi-byte characters, covers each record once
+        for chunk_bytes in (1, 2, 3, 7, 64, 1000, 1 << 20):
+            records = []
+            for (start, end) in byte_ranges(path, chunk_bytes):
+                records.extend(read_records(path, start, end))
+
+            self.assertEqual(records, lines)
+
+        self.assertRaises(ValueError, byte_ranges, path, 0)
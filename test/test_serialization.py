@@ -0,0 +1,193 @@
+import unittest
+import os
+import pickle
+import struct
+import tempfile
+
+import calculator.core.parser as parser
+import calculator.core.vm as vm
+import calculator.core.serialization as serialization
+from array import array
+from calculator.core.flat import FlatAST, evaluate_flat
+from calculator.core.nodes import NumberNode
+from calculator.core.functions import proContext
+from calculator.core.evaluator import Evaluator
+from calculator.core.exception import EvaluationException
+
+from _util import NodeComparator
+
+
+class SerializationTest(unittest.TestCase):
+    EXPRESSIONS = [
+        '1 + 2 × 3 - 4 ÷ 5',
+        '2 ^ 3 ^ 2 + 1.0',
+        '-(2 + 3)! × +4 % 3',
+        'cos(0) + sin(π ÷ 2) + sqrt(16) × e',
+        '123456789012345678901234567890 - 0.1',
+        'abs(1 - 99999999999 × 2)'
+    ]
+
+    def setUp(self):
+        self.node_comparator = NodeComparator()
+        self._context = proContext()
+
+    def test_tree(self):
+        for exp in self.EXPRESSIONS:
+            tree = parser.parse_expression(exp)
+            decoded = serialization.loads(serialization.dumps(tree), validate=True)
+            self.assertTrue(self.node_comparator.compare(decoded, tree), exp)
+
+        # int and float literals are kept apart, large ints are exact
+        for num in [1, 1.0, -7, 2 ** 100, -(2 ** 100), 0.1, 255, -128]:
+            decoded = serialization.loads(serialization.dumps(NumberNode(num, pos=3)))
+            self.assertIs(decoded.num.__class__, num.__class__)
+            self.assertEqual(decoded.num, num)
+            self.assertEqual(decoded.pos, 3)
+
+    def test_flat(self):
+        ast = FlatAST()
+        for exp in self.EXPRESSIONS:
+            ast.append(exp)
+
+        data = serialization.dumps(ast)
+        decoded = serialization.loads(bytearray(data), validate=True)
+
+        # columns are views into the buffer
+        self.assertIsInstance(decoded.kind, memoryview)
+        self.assertEqual(decoded.node_count, ast.node_count)
+        self.assertEqual(decoded.literals, ast.literals)
+        self.assertEqual(decoded.names, ast.names)
+        for i in range(len(ast)):
+            self.assertTrue(self.node_comparator.compare(decoded.to_node(i), ast.to_node(i)))
+            self.assertEqual(evaluate_flat(decoded, i, self._context), evaluate_flat(ast, i, self._context))
+
+        self.assertTrue(decoded.readonly)
+        with self.assertRaises(TypeError):
+            decoded.append('1 + 2')
+
+        # pickled copies are regular flat ASTs
+        copy = pickle.loads(pickle.dumps(decoded))
+        self.assertFalse(copy.readonly)
+        index = copy.append('1 + cos(0) + 1.0')
+        self.assertEqual(evaluate_flat(copy, index, self._context), 3.0)
+        self.assertEqual(copy.literals, ast.literals)
+        self.assertEqual(serialization.dumps(pickle.loads(pickle.dumps(decoded))), data)
+
+    def test_program(self):
+        for exp in self.EXPRESSIONS + ['unknown(1)', 'x + 1']:
+            program = vm.assemble(parser.parse_expression(exp))
+            decoded = serialization.loads(serialization.dumps(program), validate=True)
+
+            self.assertEqual(vm.disassemble(decoded), vm.disassemble(program), exp)
+            self.assertEqual(vm.disassemble(pickle.loads(pickle.dumps(decoded))), vm.disassemble(program), exp)
+
+        program = vm.assemble(parser.parse_expression(self.EXPRESSIONS[3]))
+        decoded = serialization.loads(serialization.dumps(program))
+        self.assertEqual(vm.execute(decoded, self._context), vm.execute(program, self._context))
+
+    def test_file(self):
+        ast = FlatAST()
+        for exp in self.EXPRESSIONS:
+            ast.append(exp)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'corpus.bin')
+            serialization.dump(ast, path)
+            self.assertEqual(os.listdir(tmp), ['corpus.bin'])
+
+            decoded = serialization.load(path, validate=True)
+            self.assertEqual(len(decoded), len(ast))
+            self.assertEqual(evaluate_flat(decoded, 1, self._context), evaluate_flat(ast, 1, self._context))
+            del decoded
+
+            open(path, 'wb').close()
+            with self.assertRaises(ValueError):
+                serialization.load(path)
+
+    def test_invalid_data(self):
+        data = serialization.dumps(parser.parse_expression('1 + cos(2)'))
+
+        cases = [
+            b'',
+            b'JUNK' + data[4:],
+            data[:4] + struct.pack('<H', serialization.FORMAT_VERSION + 1) + data[6:],
+            data[:6] + b'\x09' + data[7:],
+            data[:-1],
+            data + b'\x00'
+        ]
+        for case in cases:
+            with self.assertRaises(ValueError):
+                serialization.loads(case)
+
+        with self.assertRaises(ValueError):
+            serialization.dumps('1 + 2')
+
+        # malformed references are only detected with validation
+        ast = FlatAST()
+        ast.append('1 + 2')
+        ast.left[2] = 2
+        with self.assertRaises(ValueError):
+            serialization.loads(serialization.dumps(ast), validate=True)
+
+        ast.left[2] = 7
+        with self.assertRaises(ValueError):
+            serialization.loads(serialization.dumps(ast), validate=True)
+
+        program = vm.assemble(parser.parse_expression('1 + 2'))
+        program.code[1] = 5
+        with self.assertRaises(ValueError):
+            serialization.loads(serialization.dumps(program), validate=True)
+
+        # programs must keep their stack balanced and enclose calls with a matching check
+        programs = [
+            [vm.OP_ADD, 0],
+            [],
+            [vm.OP_CONST, 0, vm.OP_CONST, 0],
+            [vm.OP_CONST, 0, vm.OP_CALL, 0],
+            [vm.OP_CHECK_CALL, 0, vm.OP_CONST, 0, vm.OP_CONST, 0, vm.OP_CALL, 0],
+            [vm.OP_CHECK_CALL, 0, vm.OP_CONST, 0]
+        ]
+        for code in programs:
+            program = vm.Program(array('i', code), (1,), (), (('cos', 1),), ())
+            with self.assertRaises(ValueError, msg=code):
+                serialization.loads(serialization.dumps(program), validate=True)
+
+    def _check_mutations(self, data: bytes):
+        """
+        decode every single-byte mutation of the data with validation, which either fails with ValueError
+        or gives an object whose evaluation returns a result or fails with EvaluationException
+        """
+
+        evaluator = Evaluator(self._context)
+
+        def run(obj):
+            if isinstance(obj, FlatAST):
+                for i in range(len(obj)):
+                    evaluate_flat(obj, i, self._context)
+            else:
+                evaluator.evaluate(obj)
+
+        for i in range(len(data)):
+            for delta in (1, 0x80, 0xff):
+                mutated = bytearray(data)
+                mutated[i] = (mutated[i] + delta) & 0xff
+
+                try:
+                    obj = serialization.loads(mutated, validate=True)
+                except ValueError:
+                    continue
+
+                try:
+                    run(obj)
+                except EvaluationException:
+                    pass
+
+    def test_mutations(self):
+        for exp in ['1.5 + 2', 'cos(-x) × 3!']:
+            tree = parser.parse_expression(exp)
+            ast = FlatAST()
+            ast.append_node(tree)
+
+            self._check_mutations(serialization.dumps(tree))
+            self._check_mutations(serialization.dumps(ast))
+            self._check_mutations(serialization.dumps(vm.assemble(tree)))
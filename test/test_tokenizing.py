@@ -1,6 +1,7 @@
 import unittest
 
 import calculator.core.parser as parser
+import calculator.core.tokens as tokens
 from calculator.core.tokens import *
 from calculator.core.exception import ParsingException
 
@@ -92,3 +93,37 @@ class TokenizingTest(unittest.TestCase):
 
         self.assertIn('a', cm.exception.args[0])
         self.assertEqual(cm.exception.pos, 6)
+
+    def test_legacy_equivalence(self):
+        def describe(exp, legacy):
+            try:
+                return [str(t) for t in parser.tokenize(exp, legacy=legacy)]
+            except ParsingException as err:
+                return (err.args, err.pos)
+
+        expressions = [
+            '1+2 × 2.2 - 10', '100 × (200 + 10)', '1 + .2', '1 + 3.1e-5', '2E+3 ÷ 4',
+            'sin(2 × π) + a_0', '4! % 3 ^ 2', 'log(1, 3 × -1.4)',
+            '1 + 0a - 1', '1.2.3', '1e5e', '1e)', '1e', '2 $ 3'
+        ]
+
+        for exp in expressions:
+            self.assertEqual(describe(exp, False), describe(exp, True), exp)
+
+    def test_token_validation(self):
+        # arguments are only validated in debug mode, which CALCULATOR_DEBUG may have turned on
+        self.addCleanup(setattr, tokens, 'DEBUG', tokens.DEBUG)
+        tokens.DEBUG = False
+
+        self.assertFalse(hasattr(TokenName('a'), '__dict__'))
+        self.assertEqual(TokenName('').name, '')
+
+        tokens.DEBUG = True
+
+        with self.assertRaises(ValueError):
+            TokenName('')
+        with self.assertRaises(TypeError):
+            TokenNumber('1')
+        with self.assertRaises(TypeError):
+            TokenSymbol(None)
+        self.assertEqual(TokenOpenBracket(3).symbol, '(')
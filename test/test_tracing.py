@@ -0,0 +1,92 @@
+import unittest
+import math
+import json
+import os
+import tempfile
+
+import calculator.core.parser as parser
+from calculator.core.exception import EvaluationException
+from calculator.core.evaluator import *
+from calculator.core.tracing import EvaluationTracer
+
+
+class _RecordingTracer(EvaluationTracer):
+    def __init__(self):
+        self.calls = []
+
+    def enter(self, node):
+        self.calls.append(('enter', node.pos))
+
+    def exit(self, node, value, error):
+        self.calls.append(('exit', node.pos, value, error is not None))
+
+
+class TracingTest(unittest.TestCase):
+    def setUp(self):
+        self._context = EvaluatorContext(constants={'x': 3}, functions={'cos': math.cos, 'sqrt': math.sqrt})
+        self._ref_evaluator = Evaluator(self._context)
+
+    def test_hooks(self):
+        tracer = _RecordingTracer()
+        evaluator = Evaluator(self._context, tracer=tracer)
+
+        self.assertEqual(evaluator.evaluate('1 + x'), 4)
+        self.assertEqual(tracer.calls, [
+            ('enter', 2), ('enter', 0), ('exit', 0, 1, False), ('enter', 4), ('exit', 4, 3, False), ('exit', 2, 4, False)
+        ])
+
+        # nodes are exited with the error when evaluation fails
+        tracer.calls.clear()
+        with self.assertRaises(EvaluationException) as cm:
+            evaluator.evaluate('2 + 1 ÷ 0')
+        self.assertEqual(cm.exception.args[0], "zero division")
+        self.assertEqual(tracer.calls[-2:], [('exit', 6, None, True), ('exit', 2, None, True)])
+
+    def test_same_results(self):
+        evaluator = Evaluator(self._context, tracer=Profiler())
+        for exp in ['(1 + x) × 2 ^ 3', 'sqrt(x × 3) - cos(0)', '5!', '-x + 7 % 4']:
+            self.assertEqual(evaluator.evaluate(exp), self._ref_evaluator.evaluate(exp), exp)
+
+        for exp in ['y + 1', 'tan(1)', 'cos(1, 2)', '(-8) ^ 0.5', 'sqrt(-1)']:
+            with self.assertRaises(EvaluationException) as cm:
+                evaluator.evaluate(exp)
+            with self.assertRaises(EvaluationException) as ref:
+                self._ref_evaluator.evaluate(exp)
+            self.assertEqual(cm.exception.args[0], ref.exception.args[0], exp)
+
+    def test_profiler(self):
+        profiler = Profiler(record_events=True)
+        evaluator = Evaluator(self._context, tracer=profiler)
+        tree = parser.parse_expression('sqrt(x) + cos(0)')
+        for _ in range(3):
+            evaluator.evaluate(tree)
+
+        self.assertEqual(len(profiler.nodes), 5)
+        root = profiler.nodes[tree.pos]
+        self.assertEqual(root.label, '+')
+        self.assertEqual(root.calls, 3)
+        self.assertGreaterEqual(root.total_time, root.self_time)
+        self.assertEqual(profiler.functions['sqrt'].calls, 3)
+        self.assertEqual(profiler.functions['cos'].calls, 3)
+
+        # rows are sorted by measured time, only the root enclosing all other nodes has a fixed place
+        lines = profiler.report()
+        rows = [line.split() for line in lines[1:6]]
+        self.assertEqual(rows[0][:3], [str(tree.pos), '+', '3'])
+        self.assertEqual(sorted(row[1] for row in rows), sorted(['+', 'sqrt()', 'x', 'cos()', '0']))
+        self.assertEqual(sorted(line.split()[0] for line in lines[8:]), ['cos', 'sqrt'])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'trace.json')
+            profiler.write_chrome_trace(path)
+            with open(path, encoding='utf-8') as f:
+                trace = json.load(f)
+
+        events = trace['traceEvents']
+        self.assertEqual(len(events), 15)
+        self.assertTrue(all(e['ph'] == 'X' for e in events))
+
+        profiler.reset()
+        self.assertEqual(profiler.nodes, {})
+        with self.assertRaises(ValueError):
+            Profiler().chrome_trace()
@@ -0,0 +1,122 @@
+import unittest
+import math
+
+from calculator.core.exception import EvaluationException
+from calculator.core.evaluator import *
+from calculator.core.functions import proContext
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class VectorizedTest(unittest.TestCase):
+    def setUp(self):
+        functions = {
+            'sin': math.sin,
+            'sqrt': math.sqrt,
+            'ln': math.log,
+            'sind': lambda d: math.sin(math.radians(d)),
+            'invert': lambda a: 1 / a
+        }
+
+        context = EvaluatorContext(functions=functions)
+        context.register_function('ln', math.log, arity=1)
+        self._evaluator = Evaluator(context)
+
+    def _check(self, exp, xs):
+        result = self._evaluator.evaluate_vectorized(exp, {'x': xs})
+        self.assertEqual(result.shape, (len(xs),))
+
+        for (x, value) in zip(xs, result):
+            prepared = self._evaluator.prepare(exp, params=['x'])
+            try:
+                expected = prepared(x)
+            except EvaluationException:
+                self.assertTrue(math.isnan(value), f'{exp} at x={x}')
+            else:
+                self.assertAlmostEqual(value, expected, msg=f'{exp} at x={x}')
+
+    def test_vector_operations(self):
+        xs = [-2.0, -0.5, 0.0, 1.0, 3.0]
+
+        self._check('2 × x ^ 2 - 3 × x + 1', xs)
+        self._check('1 ÷ x + x % 2', xs)
+        self._check('x ^ 0.5', xs)
+        self._check('(x + 2)! - -x', [-5, -1, 0, 4])
+
+        # factorials beyond float range are infinite without being computed
+        result = self._evaluator.evaluate_vectorized('x!', {'x': [170, 1e5, 2e5, 0.5]})
+        self.assertEqual(result[0], float(math.factorial(170)))
+        self.assertEqual(result[1:3].tolist(), [math.inf, math.inf])
+        self.assertTrue(math.isnan(result[3]))
+
+        # integer literals beyond float range
+        huge = '1' + '0' * 400
+        self.assertEqual(self._evaluator.evaluate_vectorized(f'x - {huge}', {'x': [1, 2]}).tolist(), [-math.inf] * 2)
+
+    def test_vector_functions(self):
+        xs = [-1.0, 0.0, 0.5, 2.0, 90.0]
+
+        self._check('sin(x) + sqrt(x)', xs)
+        self._check('ln(x) × π', xs)
+        self._check('sind(x) + invert(x)', xs)
+
+    def test_broadcast_and_errors(self):
+        result = self._evaluator.evaluate_vectorized('x + y', {'x': [1, 2, 3], 'y': 10})
+        self.assertEqual(result.tolist(), [11.0, 12.0, 13.0])
+
+        with self.assertRaises(EvaluationException):
+            self._evaluator.evaluate_vectorized('x + z', {'x': [1, 2]})
+
+        with self.assertRaises(EvaluationException):
+            self._evaluator.evaluate_vectorized('sqrt(x, 2)', {'x': [1, 2]})
+
+    def test_registered_vector_form(self):
+        calls = []
+
+        def scalar(a):
+            calls.append(a)
+            return a * 2
+
+        context = EvaluatorContext()
+        context.register_function('double', scalar, vector=lambda a: a * 2)
+        evaluator = Evaluator(context)
+
+        result = evaluator.evaluate_vectorized('double(x) + 1', {'x': [1, 2, 3]})
+        self.assertEqual(result.tolist(), [3.0, 5.0, 7.0])
+        self.assertEqual(calls, [])
+
+        # memoized functions keep the vector form of the wrapped math function
+        context.register_function('root', math.sqrt, memo_size=8)
+        result = evaluator.evaluate_vectorized('root(x)', {'x': [4, 9]})
+        self.assertEqual(result.tolist(), [2.0, 3.0])
+
+    def test_library_vector_forms(self):
+        context = proContext()
+        evaluator = Evaluator(context)
+        xs = [-90.0, 0.0, 0.5, 30.0, 90.0, 180.0]
+
+        for name in ['sind', 'cosd', 'tand', 'square', 'cube', 'invert']:
+            self.assertIsNotNone(context.get_function_info(name).vector, name)
+
+            exp = f'{name}(x)'
+            result = evaluator.evaluate_vectorized(exp, {'x': xs})
+            prepared = evaluator.prepare(exp, params=['x'])
+            for (x, value) in zip(xs, result):
+                try:
+                    expected = prepared(x)
+                except EvaluationException:
+                    self.assertTrue(math.isnan(value), f'{exp} at x={x}')
+                else:
+                    self.assertAlmostEqual(value, expected, msg=f'{exp} at x={x}')
+
+    def test_function_without_arguments(self):
+        context = EvaluatorContext(functions={'rand': lambda: 4, 'fail': lambda: 1 / 0})
+        evaluator = Evaluator(context)
+
+        self.assertEqual(evaluator.evaluate_vectorized('rand() + x', {'x': [1, 2]}).tolist(), [5.0, 6.0])
+        self.assertEqual(evaluator.evaluate_vectorized('rand()', {'x': [1, 2]}).tolist(), 4.0)
+        self.assertTrue(all(math.isnan(v) for v in evaluator.evaluate_vectorized('fail() × x', {'x': [1, 2]})))